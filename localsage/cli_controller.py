@@ -5,16 +5,14 @@ import os
 import re
 import sys
 import textwrap
+from typing import TYPE_CHECKING
 
-import pyperclip
-from keyring import set_password
-from keyring.errors import KeyringError
-from openai import OpenAI
 from prompt_toolkit import prompt
-from prompt_toolkit.completion import PathCompleter
+from prompt_toolkit.completion import PathCompleter, WordCompleter
 from prompt_toolkit.formatted_text import HTML
 from prompt_toolkit.history import InMemoryHistory
 
+from localsage.compactor import COMPACTION_MODES
 from localsage.globals import (
     COMPLETER_STYLER,
     CONSOLE,
@@ -23,6 +21,11 @@ from localsage.globals import (
     retrieve_key,
 )
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+RETRIEVAL_MODES = ("off", "bm25", "semantic")
+
 
 class CLIController:
     """Handles and supports all command input"""
@@ -34,8 +37,10 @@ class CLIController:
         filemanager,
         panel,
         ui,
+        registry,
     ):
         self.config = config
+        self.registry = registry
         self.ui = ui
         self.session = session
         self.filemanager = filemanager
@@ -56,10 +61,14 @@ class CLIController:
             "!attachments": self.list_attachments,
             "!purge": self.purge_attachment,
             "!purge all": self.purge_all_attachments,
+            "!refresh": self.refresh_attachments,
+            "!compact": self.set_compaction,
+            "!tokenizer": self.set_tokenizer,
             "!consume": self.toggle_consume,
             "!sessions": self.list_sessions,
             "!delete": self.delete_session,
             "!reset": self.reset_session,
+            "!retrieval": self.set_retrieval_mode,
             "!sum": self.summarize_session,
             "!summary": self.summarize_session,
             "!config": self.spawn_settings_chart,
@@ -68,6 +77,8 @@ class CLIController:
             "!profile add": self.add_model,
             "!profile remove": self.remove_model,
             "!profile switch": self.switch_model,
+            "!pool": self.show_pool,
+            "!hedge": self.set_hedging,
             "!q": sys.exit,
             "!quit": sys.exit,
             "!ctx": self.set_context_length,
@@ -99,6 +110,24 @@ class CLIController:
             CONSOLE.print(f"[dim]{cancel_msg}[/dim]\n")
             return None
 
+    def _prompt_read_strategy(self) -> str | None:
+        """Asks how an oversized attachment should be cut down or compacted. None means cancel."""
+        choice = self._prompt_wrapper(
+            HTML(
+                "Read the (<seagreen>h</seagreen>)ead, (<seagreen>t</seagreen>)ail, "
+                "(<seagreen>m</seagreen>)iddle, (<seagreen>o</seagreen>)utline, "
+                "(<ansiyellow>f</ansiyellow>)ull file, or (<ansired>c</ansired>)ancel: "
+            )
+        )
+        strategies = {
+            "h": "head",
+            "t": "tail",
+            "m": "middle",
+            "o": "outline",
+            "f": "full",
+        }
+        return strategies.get(choice.lower()[0]) if choice else None
+
     def _handle_summary_completion(self, summary_text: str):
         """Callback executed by Chat after streaming finishes successfully."""
         # Reset session, apply summary
@@ -112,7 +141,7 @@ class CLIController:
         CONSOLE.print("[green]Summarization complete! New session primed.[/green]")
         self.panel.spawn_status_panel(toks=False)
 
-    def handle_input(self, user_input: str) -> bool | None | OpenAI:
+    def handle_input(self, user_input: str) -> "bool | None | OpenAI":
         """Parse user input for a command & handle it"""
         cmd = user_input.lower()
         if cmd in self.commands:
@@ -167,12 +196,26 @@ class CLIController:
         CONSOLE.print()
 
     def set_context_length(self):
-        """Sets a new persistent context length"""
+        """Sets a new persistent context length, or hands it back to auto-discovery"""
+        limits = self.config.limits
+        if limits and limits.context_length:
+            CONSOLE.print(
+                f"[dim]The endpoint reports[/dim] {limits.context_length} "
+                f"[dim]tokens. Enter[/dim] auto [dim]to follow it.[/dim]"
+            )
         ctx = self._prompt_wrapper(
             HTML("Enter a max context length<seagreen>:</seagreen> ")
         )
         if not ctx:
             return
+        if ctx.strip().lower() == "auto":
+            self.config.auto_context = True
+            self.config.save()
+            CONSOLE.print(
+                f"[green]Context length follows the endpoint:[/green] "
+                f"{self.config.effective_context}\n"
+            )
+            return
         try:
             value = int(ctx)
             if value <= 0:
@@ -184,11 +227,15 @@ class CLIController:
             return
 
         self.config.context_length = value
+        self.config.auto_context = False
         self.config.save()
         CONSOLE.print(f"[green]Context length set to:[/green] {value}\n")
 
-    def set_api_key(self) -> OpenAI | None:
+    def set_api_key(self) -> "OpenAI | None":
         """Allows the user to set an API key. SAFELY stores the user's API key with keyring"""
+        from keyring import set_password
+        from keyring.errors import KeyringError
+
         new_key = self._prompt_wrapper(HTML("Enter an API key<seagreen>:</seagreen> "))
         if not new_key:
             return
@@ -201,7 +248,7 @@ class CLIController:
                 "KEYRING ERROR",
                 f"Could not save to your OS keychain: {e}\nUsing key for this session only.",
             )
-        return OpenAI(base_url=self.config.endpoint, api_key=new_key)
+        return self.registry.get(self.config.endpoint, new_key)
 
     def set_refresh_rate(self):
         """Set a new custom refresh rate"""
@@ -234,6 +281,124 @@ class CLIController:
         self.config.save()
         CONSOLE.print(f"[green]Your theme has been set to: [/green]{theme}\n")
 
+    def set_retrieval_mode(self):
+        """Sets how !attach ingests files: whole into history, or into a retrieval index"""
+        CONSOLE.print(
+            "[cyan]Retrieval modes:[/cyan]\n"
+            "• off  → attachments are pasted whole into the session\n"
+            "• bm25 → attachments are chunked into a local keyword index, "
+            "only relevant chunks are sent each turn\n"
+            "• semantic → like bm25, but chunks are ranked by meaning using "
+            "your endpoint's /v1/embeddings"
+        )
+        mode = self._prompt_wrapper(
+            HTML("Enter a retrieval mode<seagreen>:</seagreen> "),
+            completer=WordCompleter(list(RETRIEVAL_MODES)),
+            style=COMPLETER_STYLER,
+        )
+        if not mode:
+            return
+        mode = mode.lower()
+        if mode not in RETRIEVAL_MODES:
+            CONSOLE.print(f"[dim]Unknown retrieval mode[/dim] '{mode}'.\n")
+            return
+        previous = self.config.retrieval_mode
+        if mode != "off":
+            # get_index() picks its backend from the config, so set the mode first
+            self.config.retrieval_mode = mode
+            try:
+                self.filemanager.get_index()
+            except ImportError as e:
+                self.panel.spawn_error_panel("MISSING DEPENDENCY", f"{e}")
+                self.config.retrieval_mode = previous
+                return
+            except Exception as e:
+                log_exception(e, "Error in get_index()")
+                self.panel.spawn_error_panel("RETRIEVAL ERROR", f"{e}")
+                self.config.retrieval_mode = previous
+                return
+        self.config.retrieval_mode = mode
+        self.config.save()
+        CONSOLE.print(f"[green]Retrieval mode set to:[/green] {mode}\n")
+
+    def set_compaction(self):
+        """Sets how much attached files are compacted before they enter the session"""
+        CONSOLE.print(
+            "[cyan]Compaction modes:[/cyan]\n"
+            "• off     → attachments are sent verbatim\n"
+            "• strip   → comments, license headers & blank-line runs are removed\n"
+            "• outline → only imports, signatures, docstrings & constants are kept\n"
+            "[dim]Lockfiles and minified bundles are skipped in both strip and outline.[/dim]"
+        )
+        mode = self._prompt_wrapper(
+            HTML("Enter a compaction mode<seagreen>:</seagreen> "),
+            completer=WordCompleter(list(COMPACTION_MODES)),
+            style=COMPLETER_STYLER,
+        )
+        if not mode:
+            return
+        mode = mode.lower()
+        if mode not in COMPACTION_MODES:
+            CONSOLE.print(f"[dim]Unknown compaction mode[/dim] '{mode}'.\n")
+            return
+        self.config.compaction = mode
+        self.config.save()
+        CONSOLE.print(f"[green]Compaction set to:[/green] {mode}\n")
+
+    def set_tokenizer(self):
+        """Sets the tokenizer the active profile counts tokens with"""
+        counter = self.session.counter
+        CONSOLE.print(
+            f"[cyan]Tokenizer:[/cyan] {counter.name} "
+            f"[dim]({counter.hits} cached, {counter.misses} counted)[/dim]\n"
+            "• tiktoken[:encoding]      → OpenAI encodings, o200k_base by default\n"
+            "• hf:/path/tokenizer.json → a Hugging Face tokenizer (pip install tokenizers)\n"
+            "• server                   → the endpoint's /tokenize (llama.cpp, vLLM)\n"
+            "• estimate                 → characters / 4\n"
+            "• auto                     → the model the endpoint reports, else tiktoken"
+        )
+        spec = self._prompt_wrapper(
+            HTML("Enter a tokenizer<seagreen>:</seagreen> "),
+            completer=WordCompleter(
+                [
+                    "auto",
+                    "tiktoken",
+                    "tiktoken:cl100k_base",
+                    "hf:",
+                    "server",
+                    "estimate",
+                ]
+            ),
+            style=COMPLETER_STYLER,
+        )
+        if not spec:
+            return
+        spec = spec.strip()
+        if spec.split(":")[0].lower() not in (
+            "auto",
+            "tiktoken",
+            "hf",
+            "server",
+            "estimate",
+        ):
+            CONSOLE.print(f"[dim]Unknown tokenizer[/dim] '{spec}'.\n")
+            return
+        if spec.lower() == "auto":
+            spec = "auto"
+        if spec.lower().startswith("hf:"):
+            path = os.path.abspath(os.path.expanduser(spec[3:]))
+            if not os.path.isfile(path):
+                CONSOLE.print(f"[dim]No tokenizer file at[/dim] '{spec[3:]}'.\n")
+                return
+            spec = f"hf:{path}"
+        self.config.active()["tokenizer"] = spec
+        self.config.save()
+        self.session.load_tokenizer()
+        CONSOLE.print(
+            f"[green]Tokenizer set to:[/green] {self.session.counter.name} "
+            f"[dim]for profile[/dim] {self.config.alias_name}\n"
+        )
+
     def toggle_consume(self):
         "Toggles reasoning panel consumption on or off"
         self.config.reasoning_panel_consume = not self.config.reasoning_panel_consume
@@ -250,7 +415,9 @@ class CLIController:
         CONSOLE.print("[cyan]Configured profiles:[/cyan]")
         for m in self.config.models:
             tag = "(active)" if m["alias"] == self.config.active_model else ""
-            CONSOLE.print(f"• {m['alias']} → {m['name']} [{m['endpoint']}] {tag}")
+            extra = len(m.get("endpoints") or [m["endpoint"]]) - 1
+            pool = f" +{extra} (pool)" if extra > 0 else ""
+            CONSOLE.print(f"• {m['alias']} → {m['name']} [{m['endpoint']}]{pool} {tag}")
         CONSOLE.print()
 
     def add_model(self):
@@ -261,23 +428,30 @@ class CLIController:
         name = self._prompt_wrapper(HTML("Model name<seagreen>:</seagreen> "))
         if not name:
             return
-        CONSOLE.print("[yellow]Format:[/yellow] http://ipaddress:port/v1")
+        CONSOLE.print(
+            "[yellow]Format:[/yellow] http://ipaddress:port/v1\n"
+            "[dim]Separate several endpoints with commas to load balance across them.[/dim]"
+        )
         endpoint = self._prompt_wrapper(HTML("API endpoint<seagreen>:</seagreen> "))
-        if not endpoint:
+        endpoints = list(
+            dict.fromkeys(e.strip() for e in (endpoint or "").split(",") if e.strip())
+        )
+        if not endpoints:
             return
 
         if any(m["alias"] == alias for m in self.config.models):
             CONSOLE.print(f"[dim]Profile[/dim] '{alias}' [dim]already exists.[/dim]\n")
             return
 
-        self.config.models.append(
-            {
-                "alias": alias,
-                "name": name,
-                "endpoint": endpoint,
-                "api_key": "stored",
-            }
-        )
+        profile = {
+            "alias": alias,
+            "name": name,
+            "endpoint": endpoints[0],
+            "api_key": "stored",
+        }
+        if len(endpoints) > 1:  # Pool profile
+            profile["endpoints"] = endpoints
+        self.config.models.append(profile)
         self.config.save()
         CONSOLE.print(f"[green]Profile[/green] '{alias}' [green]added.[/green]\n")
 
@@ -302,7 +476,69 @@ class CLIController:
         else:
             CONSOLE.print(f"[dim]No profile found under alias[/dim] '{alias}'.\n")
 
-    def switch_model(self) -> tuple[OpenAI, str] | None:
+    def show_pool(self):
+        """Shows the live measurements of the active pool profile's endpoints"""
+        pool = self.interface.api.pool if self.interface else None
+        if not pool:
+            CONSOLE.print(
+                "[dim]The active profile is not a pool. Add one with[/dim] !profile add "
+                "[dim]and several comma-separated endpoints.[/dim]\n"
+            )
+            return
+
+        def fmt(value, spec):
+            return "—" if value is None else format(value, spec)
+
+        CONSOLE.print(f"[cyan]Pool:[/cyan] {self.config.alias_name}")
+        for url in pool.ranked():
+            s = pool.stats[url]
+            state = "[green]up[/green]" if s.healthy else "[red]down[/red]"
+            CONSOLE.print(
+                f"• {url} {state} [dim]TTFT[/dim] {fmt(s.ttft, '.2f')}s "
+                f"[dim]rate[/dim] {fmt(s.rate, '.1f')} tok/s "
+                f"[dim]in flight[/dim] {s.in_flight} [dim]requests[/dim] {s.requests}"
+            )
+        CONSOLE.print()
+
+    def set_hedging(self):
+        """Shows hedged request statistics and sets the hedge delay"""
+        stats = self.interface.api.hedge_stats if self.interface else None
+        if stats and stats.races:
+            p50, p95 = stats.percentile(0.5), stats.percentile(0.95)
+            CONSOLE.print(
+                f"[cyan]Hedging:[/cyan] {stats.races} requests, {stats.hedged} hedged\n"
+                f"• Wins: {stats.primary_wins} first endpoint, {stats.backup_wins} backup\n"
+                f"• TTFT: p50 {p50:.2f}s, p95 {p95:.2f}s\n"
+                f"• Wasted: {stats.wasted_requests} cancelled requests, "
+                f"{stats.wasted_chunks} streamed chunks, {stats.wasted_seconds:.1f}s of server time\n"
+                "[dim]A delay near the p95 TTFT hedges only the slow tail.[/dim]"
+            )
+        else:
+            CONSOLE.print("[dim]No hedged requests yet.[/dim]")
+        CONSOLE.print(
+            f"[dim]Current delay:[/dim] {self.config.hedge_delay}s "
+            "[dim](0 disables hedging, pool profiles only)[/dim]"
+        )
+        delay = self._prompt_wrapper(
+            HTML("Enter a hedge delay in seconds<seagreen>:</seagreen> ")
+        )
+        if not delay:
+            return
+        try:
+            value = float(delay)
+            if value < 0:
+                raise ValueError
+        except ValueError:
+            self.panel.spawn_error_panel(
+                "VALUE ERROR", "Please enter a number of seconds ≥ 0."
+            )
+            return
+
+        self.config.hedge_delay = value
+        self.config.save()
+        CONSOLE.print(f"[green]Hedge delay set to:[/green] {value}s\n")
+
+    def switch_model(self) -> "tuple[OpenAI, str] | None":
         """Switch active model profile by alias."""
         self.list_models()
         alias = self._prompt_wrapper(
@@ -322,10 +558,10 @@ class CLIController:
             f"[green]Switched to:[/green] {match['name']} "
             f"[dim]{match['endpoint']}[/dim]\n"
         )
-        return (
-            OpenAI(base_url=match["endpoint"], api_key=retrieve_key()),
-            match["name"],
-        )
+        # Clients are cached per endpoint and share one pool, switching back is free
+        client = self.registry.get(match["endpoint"], retrieve_key())
+        self.registry.warm(client)
+        return client, match["name"]
 
     # <~~SESSION MANAGEMENT~~>
     def save_session(self):
@@ -460,26 +696,43 @@ class CLIController:
         if not path:
             return
 
+        if self.config.retrieval_mode != "off":
+            self.index_file(path)
+            return
+
         try:
-            size = round(self.filemanager.process_file_size(path) / 1024**2, 1)
-            if size >= 1:
-                CONSOLE.print(
-                    f"[yellow]Warning: Large payload detected ({size}MB).[/yellow]"
+            strategy = None
+            compaction = None
+            # Pre-flight: byte counts & calibrated ratios only, nothing is read yet
+            estimate = self.filemanager.estimate_tokens(path)
+            budget = self.session.context_budget()
+            if estimate > budget:
+                predicted = (
+                    (self.session.used_tokens() + estimate)
+                    / self.config.effective_context
+                    * 100
                 )
-                confirm = self._prompt_wrapper(
-                    HTML("Continue? (<seagreen>y</seagreen>/<ansired>N</ansired>): ")
+                CONSOLE.print(
+                    f"[yellow]Warning: This attachment is ~{estimate} tokens, "
+                    f"which would bring the session to ~{predicted:.0f}% of its context. "
+                    f"Only {budget} tokens remain.[/yellow]"
                 )
-                if not confirm or not confirm.lower().startswith("y"):
+                strategy = self._prompt_read_strategy()
+                if not strategy:
                     return
+                if strategy == "outline":
+                    strategy, compaction = None, "outline"
+                if strategy == "full":
+                    strategy = None
 
-            file = self.filemanager.process_file(path)
+            file = self.filemanager.process_file(path, strategy, compaction)
             if not file:
                 CONSOLE.print(
                     "[dim]Skipped: Source is empty, binary, or restricted.[/dim]\n"
                 )
                 return
             is_update = file[0]
-            consumption = (file[1] / self.config.context_length) * 100
+            consumption = (file[1] / self.config.effective_context) * 100
             filename = file[2] or os.path.basename(path)
             if is_update:
                 CONSOLE.print(
@@ -489,6 +742,12 @@ class CLIController:
                 CONSOLE.print(
                     f"{filename} [green]attached successfully.[/green]\n[yellow]Context size:[/yellow] {file[1]}, {consumption:.1f}%"
                 )
+            if file[3] != file[1]:
+                saved = file[3] - file[1]
+                CONSOLE.print(
+                    f"[yellow]Compacted ({compaction or self.config.compaction}):[/yellow] {file[3]} → {file[1]} tokens "
+                    f"[dim](-{saved}, {saved / max(file[3], 1) * 100:.0f}%)[/dim]"
+                )
             if consumption > 50:
                 CONSOLE.print(
                     "[dim]Large payload attached! Use [cyan]!purge[/cyan], if needed, to recover context.[/dim]"
@@ -501,9 +760,43 @@ class CLIController:
             self.panel.spawn_error_panel("ERROR READING FILE", f"{e}")
             return
 
+    def index_file(self, path: str):
+        """Adds a file or directory to the retrieval index"""
+        try:
+            with CONSOLE.status(
+                "[bold medium_orchid]Indexing...[/bold medium_orchid]", spinner="moon"
+            ):
+                indexed = self.filemanager.index_path(path)
+        except PermissionError as e:
+            CONSOLE.print(f"[dim]{e}[/dim]\n")
+            return
+        except Exception as e:
+            log_exception(e, "Error in index_path()")
+            self.panel.spawn_error_panel("ERROR INDEXING FILE", f"{e}")
+            return
+        if not indexed:
+            CONSOLE.print(
+                "[dim]Skipped: Source is empty, binary, or restricted.[/dim]\n"
+            )
+            return
+        chunks, names = indexed
+        CONSOLE.print(
+            f"{names} [green]indexed successfully.[/green]\n[yellow]Chunks:[/yellow] {chunks} "
+            f"[dim](retrieved on demand, no context consumed)[/dim]\n"
+        )
+
     def list_attachments(self):
         """List attachments"""
         attachments = self.filemanager.get_attachments()
+        indexed = self.filemanager.indexed_sources()
+        if indexed:
+            CONSOLE.print(
+                f"[cyan]Indexed for retrieval:[/cyan] {', '.join(indexed)}",
+                highlight=False,
+            )
+            if not attachments:
+                CONSOLE.print()
+                return
         if not attachments:
             CONSOLE.print("[dim]No attachments found.[/dim]\n")
             return
@@ -554,7 +847,13 @@ class CLIController:
             CONSOLE.print(f"[dim]Entry {value} does not exist.[/dim]\n")
 
     def purge_all_attachments(self):
-        """Removes all attachments from the active session."""
+        """Removes all attachments from the active session, and clears the retrieval index."""
+        if self.filemanager.indexed_sources():
+            self.filemanager.clear_index()
+            CONSOLE.print("[cyan]Retrieval index cleared.")
+            if not self.filemanager.get_attachments():
+                CONSOLE.print()
+                return
         if not self.filemanager.get_attachments():
             CONSOLE.print("[dim]No attachments found.[/dim]\n")
             return
@@ -569,6 +868,35 @@ class CLIController:
             return
         self.panel.spawn_status_panel(toks=False)
 
+    def refresh_attachments(self):
+        """Re-ingests attached files that changed on disk"""
+        if not self.filemanager.sources:
+            CONSOLE.print("[dim]No file attachments to refresh.[/dim]\n")
+            return
+        try:
+            results = self.filemanager.refresh_attachments()
+        except Exception as e:
+            log_exception(e, "Error in refresh_attachments()")
+            self.panel.spawn_error_panel("ERROR REFRESHING ATTACHMENTS", f"{e}")
+            return
+        if not results:
+            CONSOLE.print("[dim]All attachments are up to date.[/dim]\n")
+            return
+
+        delta = 0
+        for name, status, tokens in results:
+            if status == "updated":
+                delta += tokens
+                CONSOLE.print(
+                    f"{name} [green]refreshed.[/green] [dim]({tokens:+})[/dim]"
+                )
+            elif status == "missing":
+                CONSOLE.print(f"{name} [yellow]no longer exists on disk.[/yellow]")
+            else:
+                CONSOLE.print(f"{name} [yellow]could not be read.[/yellow]")
+        CONSOLE.print(f"[yellow]Context change:[/yellow] {delta:+} tokens")
+        self.panel.spawn_status_panel(toks=False)
+
     def change_working_directory(self):
         """Sets a new working directory"""
         path = self._prompt_wrapper(
@@ -614,6 +942,8 @@ class CLIController:
         code = "\n\n".join(textwrap.dedent(b) for b in blocks).strip()
 
         try:
+            import pyperclip
+
             pyperclip.copy(code)
             self.panel.spawn_copy_panel(code)
         except Exception as e:
@@ -623,22 +953,82 @@ class CLIController:
             )
 
     def read_webpage(self):
-        """Scrapes a web page and appends the contents to history."""
-        url = self._prompt_wrapper(
-            HTML("Enter a URL<seagreen>:</seagreen> "),
+        """Scrapes one or more web pages and appends the contents to history."""
+        target = self._prompt_wrapper(
+            HTML("Enter URLs, or a file of URLs<seagreen>:</seagreen> "),
         )
-        if not url:
+        if not target:
             return
+        try:
+            urls = self.filemanager.parse_urls(target)
+        except (OSError, UnicodeDecodeError) as e:
+            self.panel.spawn_error_panel("ERROR READING FILE", f"{e}")
+            return
+        if not urls:
+            CONSOLE.print("[dim]No URLs found.[/dim]\n")
+            return
+
+        label = urls[0] if len(urls) == 1 else f"{len(urls)} pages"
+        done = 0
+
+        def progress(url: str, outcome: str | Exception):
+            nonlocal done
+            done += 1
+            status.update(
+                f"[bold medium_orchid]Reading {label}... {done}/{len(urls)}[/bold medium_orchid]"
+            )
+            if len(urls) == 1:
+                return
+            if isinstance(outcome, Exception):
+                CONSOLE.print(
+                    f"[red]✗[/red] {url} [dim]{outcome}[/dim]", highlight=False
+                )
+            else:
+                CONSOLE.print(f"[green]✓[/green] {url}", highlight=False)
+
         with CONSOLE.status(
-            f"[bold medium_orchid]Reading {url}...[/bold medium_orchid]", spinner="moon"
-        ):
+            f"[bold medium_orchid]Reading {label}...[/bold medium_orchid]",
+            spinner="moon",
+        ) as status:
             try:
-                site = self.filemanager.process_website(url)
-                consumption = (site / self.config.context_length) * 100
+                results = self.filemanager.fetch_websites(urls, progress)
             except Exception as e:
-                self.panel.spawn_error_panel("FAILED TO FETCH URL", f"{e}")
+                log_exception(e, "Error in fetch_websites()")
+                self.panel.spawn_error_panel("WEB ERROR", f"{e}")
+                return
+
+        pages = [(u, c) for u, c in results if not isinstance(c, Exception)]
+        if not pages:
+            error = (
+                results[0][1]
+                if len(results) == 1
+                else "None of the pages could be read."
+            )
+            self.panel.spawn_error_panel("FAILED TO FETCH URL", f"{error}")
+            return
+
+        if self.config.retrieval_mode != "off":
+            try:
+                chunks = self.filemanager.index_websites(pages)
+            except Exception as e:
+                log_exception(e, "Error in index_websites()")
+                self.panel.spawn_error_panel("RETRIEVAL ERROR", f"{e}")
                 return
             CONSOLE.print(
-                f"[green]Successfully ingested[/green] {url}\n[yellow]Context size:[/yellow] {site}, {consumption:.1f}%"
+                f"{', '.join(u for u, _ in pages)} [green]indexed successfully.[/green]\n"
+                f"[yellow]Chunks:[/yellow] {chunks} "
+                f"[dim](retrieved on demand, no context consumed)[/dim]\n",
+                highlight=False,
             )
-            self.panel.spawn_status_panel(toks=False)
+            return
+
+        # Appended on this thread, in the order the URLs were given
+        site = sum(self.filemanager.attach_website(u, c) for u, c in pages)
+        consumption = (site / self.config.effective_context) * 100
+        ingested = (
+            label if len(pages) == len(urls) else f"{len(pages)}/{len(urls)} pages"
+        )
+        CONSOLE.print(
+            f"[green]Successfully ingested[/green] {ingested}\n[yellow]Context size:[/yellow] {site}, {consumption:.1f}%"
+        )
+        self.panel.spawn_status_panel(toks=False)
@@ -0,0 +1,88 @@
+"""Shared HTTP transport and per-endpoint OpenAI clients."""
+
+# Every OpenAI client is built on one tuned httpx client, so keep-alive connections and TLS
+# sessions survive profile switches and key changes. httpx pools connections per origin.
+# openai & httpx take a while to import, so nothing is built until the first client is needed.
+
+import importlib.util
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI
+
+# Connection pool limits. Idle connections are kept far longer than the httpx default (5s),
+# so a connection warmed at startup is still there when the first prompt is sent.
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE = 16
+KEEPALIVE_EXPIRY = 300.0
+
+# Connect fast, but give long prefills plenty of time before the first byte
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 600.0
+WARM_TIMEOUT = 5.0
+
+
+class ClientRegistry:
+    """Hands out one cached OpenAI client per (endpoint, API key), all sharing one connection pool"""
+
+    def __init__(self, http2: bool = False):
+        # HTTP/2 needs the optional h2 package (pip install 'httpx[http2]')
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self._http_client: httpx.Client | None = None
+        self.clients: dict[tuple[str, str], OpenAI] = {}
+        self.lock = threading.RLock()
+
+    @property
+    def http_client(self) -> "httpx.Client":
+        """The shared transport, built on first use"""
+        with self.lock:
+            if self._http_client is None:
+                import httpx
+                from openai import DefaultHttpxClient
+
+                self._http_client = DefaultHttpxClient(
+                    http2=self.http2,
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_KEEPALIVE,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                )
+            return self._http_client
+
+    def get(self, endpoint: str, api_key: str) -> "OpenAI":
+        """Returns the client for an endpoint, creating it on first use"""
+        key = (endpoint.rstrip("/"), api_key)
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                from openai import OpenAI
+
+                client = OpenAI(
+                    base_url=key[0], api_key=api_key, http_client=self.http_client
+                )
+                self.clients[key] = client
+            return client
+
+    def warm(self, client: "OpenAI") -> threading.Thread:
+        """
+        Opens a connection to an endpoint in the background.\n
+        The first real request then skips the TCP & TLS handshakes. Failures are ignored.
+        """
+
+        def _warm():
+            try:
+                client.with_options(timeout=WARM_TIMEOUT, max_retries=0).models.list()
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=_warm, daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        if self._http_client is not None:
+            self._http_client.close()
@@ -0,0 +1,244 @@
+"""Attachment compaction. Trades source fidelity for fewer prompt tokens."""
+
+# Modes:
+#   off     → attachments are sent verbatim
+#   strip   → comments, license headers & blank-line runs are removed
+#   outline → only the structure is kept: imports, signatures, docstrings & constants
+# Lockfiles and minified bundles are replaced by a one-line note in both active modes.
+
+import ast
+import io
+import os
+import re
+import tokenize
+
+COMPACTION_MODES = ("off", "strip", "outline")
+
+LOCKFILES = frozenset(
+    {
+        "package-lock.json",
+        "npm-shrinkwrap.json",
+        "yarn.lock",
+        "pnpm-lock.yaml",
+        "bun.lock",
+        "cargo.lock",
+        "poetry.lock",
+        "pipfile.lock",
+        "uv.lock",
+        "composer.lock",
+        "gemfile.lock",
+        "go.sum",
+        "flake.lock",
+    }
+)
+
+# Comment syntax per extension: line comment prefix, block comment delimiters, string literal pattern
+_DQ = r'"(?:\\.|[^"\\\n])*"'
+_SQ = r"'(?:\\.|[^'\\\n])*'"
+_BT = r"`(?:\\.|[^`\\])*`"
+_C_STYLE = ("//", ("/*", "*/"), f"{_DQ}|{_SQ}")
+_SYNTAX: dict[str, tuple[str | None, tuple[str, str] | None, str]] = {
+    **dict.fromkeys(
+        (".c", ".h", ".cpp", ".hpp", ".cc", ".cxx", ".cs", ".java", ".kt", ".kts"),
+        _C_STYLE,
+    ),
+    **dict.fromkeys((".scala", ".swift", ".dart", ".php"), _C_STYLE),
+    **dict.fromkeys(
+        (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".go"),
+        ("//", ("/*", "*/"), f"{_DQ}|{_SQ}|{_BT}"),
+    ),
+    # Rust lifetimes ('a) look like unterminated char literals
+    ".rs": ("//", ("/*", "*/"), _DQ),
+    **dict.fromkeys((".css", ".scss", ".less", ".sass"), (None, ("/*", "*/"), _DQ)),
+    **dict.fromkeys(
+        (".sh", ".bash", ".zsh", ".fish", ".rb", ".pl", ".r", ".ps1", ".nix"),
+        ("#", None, f"{_DQ}|{_SQ}"),
+    ),
+    **dict.fromkeys(
+        (".yaml", ".yml", ".toml", ".cfg", ".conf", ".ini", ".cmake", ".mk"),
+        ("#", None, f"{_DQ}|{_SQ}"),
+    ),
+    **dict.fromkeys((".sql", ".lua", ".hs"), ("--", None, f"{_DQ}|{_SQ}")),
+    **dict.fromkeys(
+        (".html", ".htm", ".xml", ".svg", ".vue", ".md"),
+        (None, ("<!--", "-->"), r"(?!)"),
+    ),
+}
+_SPECIAL_NAMES = {"dockerfile": ".sh", "makefile": ".mk", "cmakelists.txt": ".cmake"}
+
+# Declarations worth keeping in an outline of a non-Python file
+_DECLARATION = re.compile(
+    r"^\s*(?:(?:export|default|pub(?:\([\w:]+\))?|public|private|protected|internal|static|"
+    r"abstract|final|async|const|extern|inline|virtual|override|unsafe|open|data|sealed)\s+)*"
+    r"(?:function\b|class\b|interface\b|struct\b|enum\b|trait\b|impl\b|fn\b|func\b|def\b|"
+    r"type\b|module\b|namespace\b|package\b|import\b|use\b|from\b|#include\b|#define\b|"
+    r"mod\b|object\b|record\b|protocol\b|extension\b|union\b|typedef\b|let\b|var\b|val\b|"
+    r"[\w<>\[\],:*&\s]+\s+\**\w+\s*\([^;]*\)\s*(?:const\s*)?\{?\s*$)"
+)
+_DOC_COMMENT = re.compile(r"^\s*(?:///|//!|/\*\*|\*(?!/)|\*/|##?\s)")
+_LICENSE = re.compile(
+    r"copyright|licen[cs]e|spdx-license-identifier|all rights reserved|"
+    r"permission is hereby granted|warranty",
+    re.IGNORECASE,
+)
+
+
+def compact(text: str, name: str, mode: str) -> str:
+    """Compacts an attachment's text. Unknown file types only get whitespace collapsed."""
+    if mode not in ("strip", "outline") or not text:
+        return text
+    lowered = name.lower()
+    if lowered in LOCKFILES:
+        return f"[Lockfile omitted by compaction: {text.count(chr(10)) + 1} lines]"
+    if is_minified(text):
+        return f"[Minified file omitted by compaction: {len(text)} characters]"
+
+    ext = _SPECIAL_NAMES.get(lowered) or os.path.splitext(lowered)[1]
+    if ext in (".py", ".pyi"):
+        if mode == "outline":
+            outline = outline_python(text)
+            if outline is not None:
+                return outline
+        return collapse_whitespace(strip_python(text))
+
+    syntax = _SYNTAX.get(ext)
+    if mode == "outline" and syntax and ext not in (".md", ".html", ".htm", ".xml"):
+        return outline_generic(text)
+    return collapse_whitespace(strip_comments(text, *syntax) if syntax else text)
+
+
+def is_minified(text: str) -> bool:
+    """Bundles and minified assets: long, with very few line breaks"""
+    if len(text) < 2000:
+        return False
+    lines = text.count("\n") + 1
+    return len(text) / lines > 500
+
+
+def collapse_whitespace(text: str) -> str:
+    """Strips trailing whitespace and squeezes blank-line runs. Indentation is left alone."""
+    lines = [ln.rstrip() for ln in text.splitlines()]
+    out: list[str] = []
+    for ln in lines:
+        if ln or (out and out[-1]):
+            out.append(ln)
+    return "\n".join(out).strip("\n")
+
+
+def strip_comments(
+    text: str, line: str | None, block: tuple[str, str] | None, strings: str
+) -> str:
+    """Removes comments in a single regex pass. String literals are matched first, so they survive."""
+    parts = [f"(?P<s>{strings})"]
+    if block:
+        parts.append(f"{re.escape(block[0])}[\\s\\S]*?(?:{re.escape(block[1])}|\\Z)")
+    if line:
+        # Hash comments only count at the start of a line or after whitespace (${#x}, $#)
+        prefix = r"(?:(?<=\s)|^)" if line == "#" else ""
+        parts.append(f"{prefix}{re.escape(line)}(?!!)[^\\n]*")
+    pattern = re.compile("|".join(parts), re.MULTILINE)
+    # Block comments leave their line breaks behind, so lines stay aligned with the original
+    stripped = pattern.sub(lambda m: m.group("s") or "\n" * m.group().count("\n"), text)
+    # Lines that held nothing but a comment disappear entirely
+    kept = [
+        ln
+        for ln, orig in zip(stripped.splitlines(), text.splitlines())
+        if ln.strip() or not orig.strip()
+    ]
+    return "\n".join(kept)
+
+
+def strip_python(text: str) -> str:
+    """Removes Python comments with the tokenizer. Docstrings stay."""
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO(text).readline))
+    except (tokenize.TokenError, SyntaxError, IndentationError):
+        return strip_comments(text, "#", None, f"{_DQ}|{_SQ}")
+    lines = text.splitlines()
+    cuts = {
+        tok.start[0] - 1: tok.start[1]
+        for tok in tokens
+        if tok.type == tokenize.COMMENT and not tok.string.startswith("#!")
+    }
+    out = []
+    for i, ln in enumerate(lines):
+        if i in cuts:
+            ln = ln[: cuts[i]].rstrip()
+            if not ln:
+                continue
+        out.append(ln)
+    return "\n".join(out)
+
+
+def outline_python(text: str) -> str | None:
+    """Imports, constants, class & function signatures with their docstrings. None if it won't parse."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+    lines = text.splitlines()
+    out: list[str] = []
+
+    def segment(node: ast.AST) -> list[str]:
+        return lines[node.lineno - 1 : node.end_lineno]  # pyright: ignore
+
+    def visit(body: list[ast.stmt], top: bool = False):
+        for node in body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                out.extend(segment(node))
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                seg = segment(node)
+                out.extend(seg if len(seg) <= 3 else [seg[0], "    ..."])
+            elif isinstance(
+                node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+            ):
+                if top and out:
+                    out.append("")
+                start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+                first = node.body[0]
+                header = lines[start - 1 : max(first.lineno - 1, node.lineno)]
+                # Comments between the signature and the first statement belong to the body
+                while len(header) > 1 and header[-1].strip()[:1] in ("#", ""):
+                    header.pop()
+                out.extend(header)
+                indent = re.match(r"\s*", lines[first.lineno - 1]).group()  # pyright: ignore
+                rest = node.body
+                if ast.get_docstring(node, clean=False) is not None:
+                    out.extend(segment(first))
+                    rest = node.body[1:]
+                if isinstance(node, ast.ClassDef):
+                    visit(rest)
+                elif rest:
+                    out.append(f"{indent}...")
+            elif (
+                isinstance(node, ast.Expr)
+                and isinstance(node.value, ast.Constant)
+                and isinstance(node.value.value, str)
+                and node is body[0]
+            ):
+                out.extend(segment(node))  # Module docstring
+
+    visit(tree.body, top=True)
+    return "\n".join(out)
+
+
+def outline_generic(text: str) -> str:
+    """Heuristic outline for brace languages: declaration lines and the doc comments above them"""
+    lines = text.splitlines()
+    keep = [bool(_DECLARATION.match(ln)) and len(ln) < 300 for ln in lines]
+    # Carry doc comments that sit directly above a kept declaration
+    for i in range(len(lines) - 2, -1, -1):
+        if (
+            keep[i + 1]
+            and _DOC_COMMENT.match(lines[i])
+            and not _LICENSE.search(lines[i])
+        ):
+            keep[i] = True
+    out: list[str] = []
+    for ln, kept in zip(lines, keep):
+        if kept:
+            out.append(ln.rstrip())
+        elif ln.strip() and (not out or out[-1].strip() != "..."):
+            indent = re.match(r"\s*", ln).group()  # pyright: ignore
+            out.append(f"{indent}...")
+    return "\n".join(out)
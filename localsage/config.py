@@ -4,6 +4,7 @@ import json
 import os
 
 from localsage.globals import CONFIG_FILE
+from localsage.model_limits import ModelLimits
 
 
 class Config:
@@ -21,10 +22,45 @@ class Config:
         # Default values
         self.active_model: str = "default"
         self.context_length: int = 131072
+        # Use the context size reported by the endpoint instead of context_length when known
+        self.auto_context: bool = True
+        # Default tokenizer for counting, a profile's "tokenizer" key overrides it.
+        # "auto" uses the model the endpoint reports, see token_counter.auto_tokenizer
+        self.tokenizer: str = "auto"
+        self.limits_ttl: int = 3600
         self.refresh_rate: int = 30
         self.rich_code_theme: str = "monokai"
         self.reasoning_panel_consume: bool = True
         self.system_prompt: str = "You are Sage, a conversational AI assistant."
+        # Retrieval mode for attachments: "off", "bm25" or "semantic"
+        self.retrieval_mode: str = "off"
+        self.retrieval_top_k: int = 8
+        self.retrieval_budget: int = 4096
+        # Model used for /v1/embeddings in semantic mode, blank means the chat model
+        self.embedding_model: str = ""
+        # Attachment compaction: "off", "strip" or "outline"
+        self.compaction: str = "off"
+        # !web cache: seconds before a page is revalidated, and the size cap in MB
+        self.web_cache_ttl: int = 3600
+        self.web_cache_size: int = 64
+        # Rendered history messages: the size cap in MB, and the cap on disk in sessions/.render (0 = memory only)
+        self.render_cache_size: int = 32
+        self.render_cache_disk: int = 0
+        # Negotiate HTTP/2 with the endpoint, needs the h2 package (pip install 'httpx[http2]')
+        self.http2: bool = False
+        # Stream failures: retries, base backoff in seconds, and how a dropped reply is resumed
+        self.retry_attempts: int = 5
+        self.retry_backoff: float = 2.0
+        self.resume_mode: str = "prefix"
+        # Pool profiles: seconds between endpoint health checks, 0 disables them
+        self.pool_health_interval: int = 15
+        # Hedged requests: seconds without a token before a backup endpoint is raced (0 = off),
+        # and the most endpoints racing at once
+        self.hedge_delay: float = 0.0
+        self.hedge_max: int = 2
+
+        # Runtime state, never written to the config file
+        self._limits: ModelLimits | None = None
 
     def active(self) -> dict:
         """Return the currently active model profile."""
@@ -36,7 +72,11 @@ class Config:
     def save(self):
         """Saves any config changes to the config file."""
         with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.__dict__, f, indent=2)
+            json.dump(
+                {k: v for k, v in self.__dict__.items() if not k.startswith("_")},
+                f,
+                indent=2,
+            )
 
     def load(self):
         """Loads the config file."""
@@ -46,6 +86,33 @@ class Config:
             data = json.load(f)
         for key, val in data.items():
             setattr(self, key, val)
+        # Configs from before auto_context keep the context length the user set
+        if "auto_context" not in data:
+            self.auto_context = False
+
+    def set_limits(self, limits: ModelLimits | None):
+        """Stores the limits discovered for the active profile"""
+        self._limits = limits
+
+    @property
+    def limits(self) -> ModelLimits | None:
+        return self._limits
+
+    @property
+    def effective_context(self) -> int:
+        """Context window used for trimming & budgets: the server's own when known"""
+        if self.auto_context and self._limits and self._limits.context_length:
+            return self._limits.context_length
+        return self.context_length
+
+    @property
+    def prompt_limit(self) -> int:
+        """Tokens history may use: 95% of the context, less the reply the server allows"""
+        context = self.effective_context
+        max_output = self._limits.max_output if self._limits else None
+        # Some providers allow the whole window as output, never reserve more than half
+        reserve = min(max_output or 0, context // 2)
+        return int((context - reserve) * 0.95)
 
     @property
     def endpoint(self) -> str:
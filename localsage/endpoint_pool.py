@@ -0,0 +1,137 @@
+"""Load balancing for pool profiles: several endpoints serving the same model."""
+
+# Each endpoint keeps an EWMA of time-to-first-token and generation rate, a count of
+# in-flight streams, and a cooldown after failures. Requests go to the least loaded
+# healthy endpoint, then the fastest to first token. A background thread probes every
+# endpoint so a dead server is skipped before a prompt ever waits on it.
+
+import threading
+import time
+from dataclasses import dataclass
+
+# Weight of the newest measurement in every moving average
+_ALPHA = 0.3
+# Cooldown after consecutive failures: 2s, 4s, 8s ... capped
+_COOLDOWN_BASE = 2.0
+_COOLDOWN_MAX = 60.0
+
+
+@dataclass
+class EndpointStats:
+    """Live measurements for one endpoint"""
+
+    url: str
+    ttft: float | None = None  # Seconds to first token
+    rate: float | None = None  # Chunks (≈ tokens) per second
+    latency: float | None = None  # Health probe round trip
+    in_flight: int = 0
+    failures: int = 0
+    down_until: float = 0.0
+    requests: int = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+
+def _ewma(prior: float | None, value: float) -> float:
+    return value if prior is None else prior + _ALPHA * (value - prior)
+
+
+class EndpointPool:
+    """Ranks a pool profile's endpoints and records how each one performs"""
+
+    def __init__(self, endpoints: list[str]):
+        self.stats = {url: EndpointStats(url) for url in dict.fromkeys(endpoints)}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._checker: threading.Thread | None = None
+
+    def ranked(self) -> list[str]:
+        """
+        Endpoints in the order they should be tried.\n
+        Healthy ones first: least loaded, then fastest to first token (unmeasured ones are tried
+        early), then fastest generation. Endpoints in cooldown follow, soonest recovery first.
+        """
+        with self.lock:
+            stats = list(self.stats.values())
+        healthy = sorted(
+            (s for s in stats if s.healthy),
+            key=lambda s: (
+                s.in_flight,
+                s.ttft or 0.0,
+                -(s.rate or 0.0),
+                s.latency or 0.0,
+            ),
+        )
+        down = sorted((s for s in stats if not s.healthy), key=lambda s: s.down_until)
+        return [s.url for s in healthy + down]
+
+    def select(self) -> str:
+        return self.ranked()[0]
+
+    def begin(self, url: str):
+        with self.lock:
+            self.stats[url].in_flight += 1
+            self.stats[url].requests += 1
+
+    def end(self, url: str):
+        with self.lock:
+            self.stats[url].in_flight = max(0, self.stats[url].in_flight - 1)
+
+    def record_ttft(self, url: str, seconds: float):
+        with self.lock:
+            s = self.stats[url]
+            s.ttft = _ewma(s.ttft, seconds)
+
+    def record_rate(self, url: str, chunks: int, seconds: float):
+        if chunks < 2 or seconds <= 0:
+            return
+        with self.lock:
+            s = self.stats[url]
+            s.rate = _ewma(s.rate, chunks / seconds)
+
+    def mark_success(self, url: str, latency: float | None = None):
+        with self.lock:
+            s = self.stats[url]
+            s.failures, s.down_until = 0, 0.0
+            if latency is not None:
+                s.latency = _ewma(s.latency, latency)
+
+    def mark_failure(self, url: str):
+        """Takes an endpoint out of rotation, for longer after each consecutive failure"""
+        with self.lock:
+            s = self.stats[url]
+            s.failures += 1
+            cooldown = min(_COOLDOWN_MAX, _COOLDOWN_BASE * 2 ** (s.failures - 1))
+            s.down_until = time.monotonic() + cooldown
+
+    def check(self, probe):
+        """Probes every endpoint once. `probe(url)` raises if the endpoint is unusable."""
+        for url in list(self.stats):
+            start = time.perf_counter()
+            try:
+                probe(url)
+            except Exception:
+                self.mark_failure(url)
+            else:
+                self.mark_success(url, time.perf_counter() - start)
+
+    def start_health_checks(self, probe, interval: float):
+        """Runs check() on a daemon thread every `interval` seconds until stop()"""
+        if self._checker or interval <= 0:
+            return
+
+        stop = self._stop = threading.Event()
+
+        def _loop():
+            while not stop.is_set():
+                self.check(probe)
+                stop.wait(interval)
+
+        self._checker = threading.Thread(target=_loop, daemon=True)
+        self._checker.start()
+
+    def stop(self):
+        self._stop.set()
+        self._checker = None
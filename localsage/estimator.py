@@ -0,0 +1,81 @@
+"""Pre-flight token estimates for attachments, made from byte counts before anything is read."""
+
+# Each extension gets its own bytes-per-token ratio. Ratios start from rough defaults and are
+# calibrated with an exponentially weighted moving average every time a file is really encoded.
+
+import json
+import math
+import os
+
+from localsage.globals import CONFIG_DIR
+
+CALIBRATION_FILE = os.path.join(CONFIG_DIR, "calibration.json")
+
+# Rough average for English text & source code, used for anything unseen
+BYTES_PER_TOKEN = 4.0
+
+# Starting points until real attachments have been measured
+_DEFAULT_RATIOS = {
+    **dict.fromkeys((".md", ".txt", ".rst", ".adoc"), 4.2),
+    **dict.fromkeys((".py", ".rb", ".go", ".java", ".kt", ".cs", ".swift"), 3.8),
+    **dict.fromkeys((".js", ".ts", ".jsx", ".tsx", ".c", ".h", ".cpp", ".rs"), 3.5),
+    **dict.fromkeys((".html", ".xml", ".svg", ".css", ".scss"), 3.2),
+    **dict.fromkeys((".json", ".yaml", ".yml", ".toml", ".lock"), 3.0),
+    **dict.fromkeys((".csv", ".tsv", ".log"), 2.8),
+}
+
+# Weight of the newest measurement once an extension has a few samples
+_ALPHA = 0.3
+# Files this small are dominated by noise, they never move a ratio
+_MIN_SAMPLE_BYTES = 256
+
+
+class TokenEstimator:
+    """Per-extension bytes-per-token ratios, persisted to CONFIG_DIR/calibration.json"""
+
+    def __init__(self, path: str = CALIBRATION_FILE):
+        self.path = path
+        self.ratios: dict[str, float] = {}
+        self.samples: dict[str, int] = {}
+        self.load()
+
+    @staticmethod
+    def key(name: str) -> str:
+        """Lowercased extension, or the whole name for files like Makefile"""
+        base = os.path.basename(name).lower()
+        return os.path.splitext(base)[1] or base
+
+    def ratio(self, name: str) -> float:
+        key = self.key(name)
+        return self.ratios.get(key) or _DEFAULT_RATIOS.get(key, BYTES_PER_TOKEN)
+
+    def estimate(self, name: str, size: int) -> int:
+        """Predicted token count of `size` bytes of this file type"""
+        return math.ceil(size / self.ratio(name))
+
+    def observe(self, name: str, size: int, tokens: int):
+        """
+        Folds a measured file into its extension's ratio.\n
+        Early samples carry more weight (1/n), so the defaults are quickly replaced by real data.
+        """
+        if size < _MIN_SAMPLE_BYTES or tokens <= 0:
+            return
+        key = self.key(name)
+        n = self.samples.get(key, 0) + 1
+        alpha = max(_ALPHA, 1 / n)
+        prior = self.ratio(name)
+        self.ratios[key] = prior + alpha * (size / tokens - prior)
+        self.samples[key] = n
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"ratios": self.ratios, "samples": self.samples}, f, indent=2)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.ratios = dict(data.get("ratios", {}))
+            self.samples = dict(data.get("samples", {}))
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            self.ratios, self.samples = {}, {}
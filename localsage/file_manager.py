@@ -2,8 +2,10 @@
 
 # Custom validators and word completers live here as well.
 
+import hashlib
 import os
 import re
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from urllib.parse import urlparse
 
 from prompt_toolkit.completion import (
@@ -11,14 +13,26 @@ from prompt_toolkit.completion import (
 )
 from prompt_toolkit.validation import Validator
 
+from localsage import __version__
+from localsage.compactor import compact
+from localsage.estimator import TokenEstimator
+from localsage.file_reader import is_binary, read_partial, read_text
 from localsage.globals import (
-    FILE_PATTERN,
     RESTRICTED_FILES,
     SESSIONS_DIR,
-    SITE_PATTERN,
     SPECIAL_FILES,
     WEB_FILES,
+    log_exception,
 )
+from localsage.html_cleaner import FetchError, extract_text
+from localsage.retrieval import BM25Index, VectorIndex, format_context
+from localsage.session_manager import index_dir
+from localsage.web_cache import WebCache
+from localsage.workers import worker_pool
+
+# Concurrent !web downloads overall, and open connections per host
+FETCH_WORKERS = 16
+HOST_CONNECTIONS = 4
 
 
 class FileManager:
@@ -26,6 +40,17 @@ class FileManager:
 
     def __init__(self, session):
         self.session = session
+        # Per-extension bytes-per-token ratios, for estimates made before reading
+        self.estimator = TokenEstimator()
+        # Attachment name -> source path, mtime, size, content digest, read strategy & compaction
+        self.sources: dict[str, dict] = {}
+        # Retrieval index, loaded the first time retrieval mode needs it
+        self.index = None
+        # Embedding callable for semantic retrieval, injected by the API
+        self.embedder = None
+        # !web cache and HTTP connection pool, both created on first use
+        self.web_cache: WebCache | None = None
+        self.http = None
 
     def session_completer(self) -> WordCompleter:
         """Session completion helper for the session manager"""
@@ -35,31 +60,49 @@ class FileManager:
             sentence=True,
         )
 
-    def process_file(self, path: str) -> tuple[bool, int, str] | None:
-        """Processes a file or directory for attachment"""
+    def process_file(
+        self, path: str, strategy: str | None = None, compaction: str | None = None
+    ) -> tuple[bool, int, str, int] | None:
+        """
+        Processes a file or directory for attachment.\n
+        With a read strategy (head, tail, middle), files are cut down to the remaining context budget.
+        With a compaction mode (strip, outline), files are compacted before they are wrapped.
+        Returns (replaced an existing attachment, tokens, file names, tokens before compaction).
+        """
 
         def remove_existing(name: str) -> bool:
-            attachments = self.get_attachments()
-            existing = [(i, t, n) for i, t, n in attachments if n == name]
-            if existing:
-                self.session.remove_history(existing[-1][0])
+            index = self.session.attachments.find(name)
+            if index is not None:
+                self.session.remove_history(index)
                 return True
             return False
 
-        def read_file(src: str) -> str:
-            try:
-                with open(src, "r", encoding="utf-8") as f:
-                    return f.read().replace("```", "'''")
-            except UnicodeDecodeError:
-                with open(src, "r", encoding="latin-1") as f:
-                    return f.read().replace("```", "'''")
-
-        def file_wrapper(name: str, path: str) -> str:
-            return f"---\nFile: `{name}`\n```\n{path}\n```\n---"
+        def attach(name: str, src: str, stat: os.stat_result) -> int:
+            nonlocal uncompacted
+            raw = self._read_attachment(src, stat.st_size, strategy, budget)
+            wrapped = self._file_wrapper(name, compact(raw, name, mode))
+            tokens = self.session.encode(wrapped)
+            raw_tokens = (
+                tokens
+                if mode == "off"
+                else self.session.encode(self._file_wrapper(name, raw))
+            )
+            uncompacted += raw_tokens
+            if not self._is_partial(name, stat.st_size, strategy, budget):
+                overhead = self.session.encode(self._file_wrapper(name, ""))
+                self.estimator.observe(name, stat.st_size, raw_tokens - overhead)
+            nonlocal existing
+            existing = remove_existing(name)
+            self.session.append_message("user", wrapped)
+            self._record_source(name, src, stat, wrapped, strategy, mode)
+            return tokens
 
         consumption: int = 0
+        uncompacted: int = 0
         filelist: list[str] = []
         existing: bool = False
+        budget: int = self.session.context_budget() if strategy else 0
+        mode: str = compaction or self.session.config.compaction
 
         path = os.path.abspath(os.path.expanduser(path))
         basename = os.path.basename(path)
@@ -67,16 +110,19 @@ class FileManager:
         if os.path.isdir(path):
             with os.scandir(path) as entries:
                 for file in entries:
+                    if strategy and budget <= 0:
+                        break
                     if (
                         file.is_file()
                         and not file.name.startswith(".")
                         and not file.name.endswith(RESTRICTED_FILES)
                     ):
                         try:
-                            wrapped = file_wrapper(file.name, read_file(file.path))
-                            existing = remove_existing(file.name)
-                            self.session.append_message("user", wrapped)
-                            consumption += self.session.encode(wrapped)
+                            if is_binary(file.path):
+                                continue
+                            tokens = attach(file.name, file.path, file.stat())
+                            consumption += tokens
+                            budget -= tokens
                             filelist.append(file.name)
                         except (PermissionError, FileNotFoundError):
                             continue
@@ -86,136 +132,428 @@ class FileManager:
 
         elif os.path.isfile(path) and not path.endswith(RESTRICTED_FILES):
             formatted = ""
+            if strategy and budget <= 0:
+                return
             try:
-                wrapped = file_wrapper(basename, read_file(path))
-                existing = remove_existing(basename)
-                self.session.append_message("user", wrapped)
-                consumption = self.session.encode(wrapped)
+                if is_binary(path):
+                    return
+                consumption = attach(basename, path, os.stat(path))
             except PermissionError:
                 raise PermissionError(f"Permission Denied: {path}")
 
         else:
             return
 
-        return existing, consumption, formatted
+        self.estimator.save()
+        return existing, consumption, formatted, uncompacted
+
+    def refresh_attachments(self) -> list[tuple[str, str, int]]:
+        """
+        Re-ingests file attachments whose source changed on disk.\n
+        Changed entries are replaced in place, so everything else keeps its position in history.
+        Returns (name, status, token delta) for every attachment that was not left untouched.
+        """
+        results: list[tuple[str, str, int]] = []
+        for name, source in list(self.sources.items()):
+            index = self.session.attachments.find(name)
+            # Purged, trimmed, or replaced by a loaded session. Forget it.
+            if (
+                index is None
+                or self._digest(self.session.history[index]["content"])
+                != source["digest"]
+            ):
+                del self.sources[name]
+                continue
 
-    def process_website(self, url: str) -> int:
-        """Processes a website for attachment (uses trafilatura)"""
-        import trafilatura
-
-        def normalize_url(url: str) -> str:
-            """Converts a github, gitlab, or pastebin URL to it's raw alternative"""
-            parsed = urlparse(url.strip())
-            u = url.strip()
-            if parsed.netloc == "github.com" and "/blob/" in parsed.path:
-                return u.replace("github.com", "raw.githubusercontent.com").replace(
-                    "/blob/", "/", 1
+            try:
+                stat = os.stat(source["path"])
+            except FileNotFoundError:
+                results.append((name, "missing", 0))
+                continue
+            except PermissionError:
+                results.append((name, "denied", 0))
+                continue
+            if stat.st_mtime_ns == source["mtime"] and stat.st_size == source["size"]:
+                continue
+
+            old_tokens = self.session.message_tokens(index)
+            budget = self.session.context_budget() + old_tokens
+            try:
+                content = self._read_attachment(
+                    source["path"], stat.st_size, source["strategy"], budget
                 )
-            if parsed.netloc == "gitlab.com" and "/blob/" in parsed.path:
-                return u.replace("/blob/", "/raw/", 1)
-            if parsed.netloc == "pastebin.com" and not parsed.path.startswith("/raw/"):
-                paste_id = parsed.path.strip("/").split("/")[-1]
-                return f"https://pastebin.com/raw/{paste_id}"
-            return u
-
-        def scrub_content(content: str) -> str:
-            """Scrubs junk out of received web content"""
-            # Regex to detect junk HTML noise for disposal
-            tags_to_nuke = (
-                r"<(script|style|svg|noscript|iframe|form)\b[^>]*>([\s\S]*?)<\/\1>"
-            )
-            comments = r"<!--[\s\S]*?-->"
-            content = re.sub(tags_to_nuke, "", content, flags=re.IGNORECASE)
-            content = re.sub(comments, "", content, flags=re.IGNORECASE)
-            return content.strip()
-
-        original_url = url
-        url = normalize_url(url)
-        downloaded = trafilatura.fetch_url(url)
-        if not downloaded:
-            raise Exception("The website blocked the request or returned no data.")
-        parsed = urlparse(url)
-
-        is_html = not (
-            parsed.netloc == "raw.githubusercontent.com"
-            or "/raw/" in parsed.path
-            or url.lower().endswith(WEB_FILES)
-            or url.lower().split("/")[-1] in SPECIAL_FILES
-        )
+            except PermissionError:
+                results.append((name, "denied", 0))
+                continue
+            content = compact(content, name, source["compaction"])
+            wrapped = self._file_wrapper(name, content)
+            if self._digest(wrapped) == source["digest"]:
+                # Touched but not changed
+                source["mtime"], source["size"] = stat.st_mtime_ns, stat.st_size
+                continue
 
-        if is_html:
-            cleaned_html = scrub_content(downloaded)
-            content = trafilatura.extract(
-                cleaned_html,
-                include_comments=False,
-                deduplicate=True,
+            self.session.replace_message(index, wrapped)
+            self._record_source(
+                name,
+                source["path"],
+                stat,
+                wrapped,
+                source["strategy"],
+                source["compaction"],
             )
-            if not content:
-                content = trafilatura.html2txt(cleaned_html)
+            results.append((name, "updated", self.session.encode(wrapped) - old_tokens))
+        return results
+
+    def set_embedder(self, embed):
+        """Setter to inject the embeddings call used by semantic retrieval."""
+        self.embedder = embed
+
+    def get_index(self):
+        """Returns the current session's retrieval index for the configured mode, loading it on first use"""
+        config = self.session.config
+        mode = config.retrieval_mode if config.retrieval_mode != "off" else "bm25"
+        model = config.embedding_model or config.model_name
+        directory = index_dir(self.session.active_session)
+        if (
+            self.index is not None
+            and self.index.name == mode
+            and self.index.directory == directory
+            and getattr(self.index, "model", model) == model
+        ):
+            return self.index
+        if mode == "semantic":
+            if self.embedder is None:
+                raise RuntimeError("Semantic retrieval needs an embeddings endpoint.")
+            self.index = VectorIndex(self.embedder, model, directory)
         else:
-            content = downloaded
+            self.index = BM25Index(directory)
+        return self.index
+
+    def index_path(self, path: str) -> tuple[int, str] | None:
+        """Chunks a file or directory into the retrieval index instead of the session history"""
+        index = self.get_index()
+        chunks: int = 0
+        names: list[str] = []
+        for name, src in self._attachable_files(path):
+            try:
+                if is_binary(src):
+                    continue
+                chunks += index.add(name, read_text(src))
+                names.append(name)
+            except (PermissionError, FileNotFoundError):
+                continue
+        if not names:
+            return None
+        index.save()
+        return chunks, ", ".join(names)
+
+    def index_websites(self, pages: list[tuple[str, str]]) -> int:
+        """Chunks fetched (url, content) pages into the retrieval index. Returns the chunk count."""
+        index = self.get_index()
+        chunks = sum(index.add(url, content) for url, content in pages)
+        index.save()
+        return chunks
+
+    def indexed_sources(self) -> list[str]:
+        """Names of every source in the retrieval index. Never loads the index just to ask."""
+        if self.index is None and self.session.config.retrieval_mode == "off":
+            return []
+        try:
+            return self.get_index().sources()
+        except (ImportError, RuntimeError):
+            return []
+
+    def clear_index(self):
+        """Empties the retrieval index on disk"""
+        index = self.get_index()
+        index.clear()
+        index.save()
+
+    def retrieve(self, query: str) -> str:
+        """Returns the indexed chunks most relevant to a query, packed within the retrieval budget"""
+        config = self.session.config
+        if config.retrieval_mode == "off":
+            return ""
+        try:
+            hits = self.get_index().search(query, config.retrieval_top_k)
+        except Exception as e:
+            log_exception(e, "Error in retrieve()")
+            return ""
+        return format_context(hits, config.retrieval_budget, self.session.encode)
+
+    def _attachable_files(self, path: str) -> list[tuple[str, str]]:
+        """Lists (name, path) for a file, or for every attachable file in a directory"""
+        path = os.path.abspath(os.path.expanduser(path))
+        if os.path.isdir(path):
+            with os.scandir(path) as entries:
+                return [
+                    (file.name, file.path)
+                    for file in entries
+                    if file.is_file()
+                    and not file.name.startswith(".")
+                    and not file.name.endswith(RESTRICTED_FILES)
+                ]
+        if os.path.isfile(path) and not path.endswith(RESTRICTED_FILES):
+            return [(os.path.basename(path), path)]
+        return []
+
+    def _read_attachment(
+        self, path: str, size: int, strategy: str | None, budget: int
+    ) -> str:
+        """Reads a file whole, or through a partial read strategy if it exceeds the budget"""
+        if strategy and self._is_partial(path, size, strategy, budget):
+            return self.read_budgeted(path, budget, strategy)
+        return read_text(path).replace("```", "'''")
+
+    def _is_partial(
+        self, name: str, size: int, strategy: str | None, budget: int
+    ) -> bool:
+        """True when a read strategy will cut this file down to the budget"""
+        return bool(strategy) and self.estimator.estimate(name, size) > budget
+
+    def _file_wrapper(self, name: str, content: str) -> str:
+        return f"---\nFile: `{name}`\n```\n{content}\n```\n---"
+
+    def _digest(self, content) -> str:
+        return hashlib.blake2b(str(content).encode(), digest_size=16).hexdigest()
+
+    def _record_source(
+        self,
+        name: str,
+        path: str,
+        stat: os.stat_result,
+        wrapped: str,
+        strategy: str | None,
+        compaction: str = "off",
+    ):
+        """Remembers where an attachment came from, and how it was read, for !refresh"""
+        self.sources[name] = {
+            "path": os.path.abspath(path),
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "digest": self._digest(wrapped),
+            "strategy": strategy,
+            "compaction": compaction,
+        }
+
+    def read_budgeted(self, path: str, budget: int, strategy: str) -> str:
+        """
+        Reads only as much of a file as fits within a token budget.\n
+        The byte estimate is corrected against the real token count, at most a few times.
+        """
+        max_bytes = int(budget * self.estimator.ratio(path))
+        content = ""
+        for _ in range(3):
+            content = read_partial(path, max_bytes, strategy).replace("```", "'''")
+            tokens = self.session.encode(content)
+            if tokens <= budget:
+                break
+            max_bytes = int(max_bytes * (budget / tokens) * 0.95)
+        return content
 
-        # Dip out if no site content was found
-        if not content or not content.strip():
-            raise Exception("Could not find any readable text on this page.")
+    def process_website(self, url: str) -> int:
+        """Processes a website for attachment"""
+        return self.attach_website(url, self.fetch_website(url))
 
-        im_a_wrapper = f"---\nWebsite: `{original_url}`\n{content}\n---"
+    def attach_website(self, url: str, content: str) -> int:
+        """Appends fetched website content to history. Returns its token count."""
+        im_a_wrapper = f"---\nWebsite: `{url}`\n{content}\n---"
         consumption = self.session.encode(im_a_wrapper)
         self.session.append_message("user", im_a_wrapper)
         return consumption
 
-    def process_file_size(self, path: str) -> int:
-        size: int = 0
-        if os.path.isfile(path) and not path.endswith(RESTRICTED_FILES):
+    def get_web_cache(self) -> WebCache:
+        """Returns the !web cache, opened on first use"""
+        if self.web_cache is None:
+            config = self.session.config
+            self.web_cache = WebCache(
+                ttl=config.web_cache_ttl,
+                max_bytes=config.web_cache_size * 1024 * 1024,
+            )
+        return self.web_cache
+
+    def fetch_website(self, url: str) -> str:
+        """
+        Downloads a website and extracts its readable text (uses trafilatura).\n
+        Cached pages are reused within the TTL, revalidated with a conditional request after it,
+        and served stale when the site cannot be reached.
+        """
+        url = self._normalize_url(url)
+        cached, body, headers = self._download(url)
+        if cached is not None:
+            return cached
+        content = extract_text(body, is_html_url(url))
+        self._cache_page(url, body, headers, content)
+        return content
+
+    def fetch_websites(
+        self, urls: list[str], progress=None
+    ) -> list[tuple[str, str | FetchError]]:
+        """
+        Fetches many websites concurrently. Returns (url, content or FetchError) in input order.\n
+        Downloads share one keep-alive pool, and each page is handed to an extraction worker
+        the moment it arrives. `progress(url, outcome)` is called on this thread as pages finish.
+        Any other exception is a bug and is raised.
+        """
+        results: dict[int, str | FetchError] = {}
+
+        def finish(i: int, outcome: str | FetchError):
+            results[i] = outcome
+            if progress:
+                progress(urls[i], outcome)
+
+        if len(urls) == 1:
             try:
-                size = os.path.getsize(path)
-            except PermissionError:
-                raise PermissionError(f"Permission Denied: {path}")
-        elif os.path.isdir(path):
-            with os.scandir(path) as entries:
-                for file in entries:
+                finish(0, self.fetch_website(urls[0]))
+            except FetchError as e:
+                finish(0, e)
+            return [(urls[0], results[0])]
+
+        self._http_pool()  # Created up front, never raced for by the fetch threads
+        with (
+            worker_pool(len(urls)) as extractors,
+            ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(urls))) as fetchers,
+        ):
+            # Future -> (url index, the downloaded page an extraction is working on)
+            pending: dict[Future, tuple[int, tuple | None]] = {
+                fetchers.submit(self._download, self._normalize_url(u)): (i, None)
+                for i, u in enumerate(urls)
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, page = pending.pop(future)
                     try:
-                        if (
-                            file.is_file()
-                            and not file.name.startswith(".")
-                            and not file.name.endswith(RESTRICTED_FILES)
-                        ):
-                            size += file.stat().st_size
-                    except (PermissionError, FileNotFoundError):
+                        result = future.result()
+                    except FetchError as e:
+                        finish(i, e)
+                        continue
+                    if page:  # Extracted
+                        self._cache_page(*page, result)
+                        finish(i, result)
+                        continue
+                    cached, body, headers = result
+                    if cached is not None:
+                        finish(i, cached)
                         continue
-        return size
+                    url = self._normalize_url(urls[i])
+                    job = extractors.submit(extract_text, body, is_html_url(url))
+                    pending[job] = (i, (url, body, headers))
+        return [(u, results[i]) for i, u in enumerate(urls)]
+
+    def parse_urls(self, target: str) -> list[str]:
+        """
+        Reads URLs from user input: a file with one URL per line, or a comma/space separated list.\n
+        Blank lines, # comments, and duplicates are skipped.
+        """
+        path = os.path.abspath(os.path.expanduser(target.strip()))
+        if os.path.isfile(path):
+            text = read_text(path)
+            lines = [ln.split("#", 1)[0] for ln in text.splitlines()]
+        else:
+            lines = [target]
+        urls = [u for ln in lines for u in re.split(r"[\s,]+", ln) if u]
+        return list(dict.fromkeys(urls))
+
+    def _download(self, url: str) -> tuple[str | None, bytes, dict]:
+        """
+        Fetches a page through the cache.\n
+        Returns (cached text, b"", {}) when the cache can answer, or (None, body, headers) for a fresh download.
+        """
+        from urllib3.exceptions import HTTPError
+
+        cache = self.get_web_cache()
+        entry = cache.get(url)
+        if entry and cache.is_fresh(entry):
+            return cache.text(entry), b"", {}
+
+        try:
+            status, body, headers = self._http_get(url, cache.validators(entry))
+        except HTTPError as e:
+            if entry:
+                return cache.text(entry), b"", {}  # Offline, stale beats nothing
+            raise FetchError(f"Could not reach the website: {e}")
+
+        if status == 304 and entry:
+            cache.touch(url)
+            return cache.text(entry), b"", {}
+        if status >= 400 or not body:
+            raise FetchError("The website blocked the request or returned no data.")
+        return None, body, headers
+
+    def _cache_page(self, url: str, body: bytes, headers: dict, content: str):
+        self.get_web_cache().put(
+            url, body, content, headers.get("ETag"), headers.get("Last-Modified")
+        )
+
+    def _http_pool(self):
+        """
+        Shared keep-alive connection pool, created on first use.\n
+        block=True caps concurrent connections per host at HOST_CONNECTIONS, extra requests wait their turn.
+        """
+        import urllib3
+
+        if self.http is None:
+            self.http = urllib3.PoolManager(
+                num_pools=32,
+                maxsize=HOST_CONNECTIONS,
+                block=True,
+                headers={"User-Agent": f"localsage/{__version__}"},
+                # total=None, so the redirect count isn't capped by the retry count
+                retries=urllib3.Retry(
+                    total=None, connect=2, read=2, redirect=5, backoff_factor=0.3
+                ),
+                timeout=urllib3.Timeout(connect=10, read=30),
+            )
+        return self.http
+
+    def _http_get(self, url: str, headers: dict) -> tuple[int, bytes, dict]:
+        """GET over the shared connection pool"""
+        response = self._http_pool().request("GET", url, headers=headers)
+        return response.status, response.data, dict(response.headers)
+
+    def _normalize_url(self, url: str) -> str:
+        """Converts a github, gitlab, or pastebin URL to it's raw alternative"""
+        parsed = urlparse(url.strip())
+        u = url.strip()
+        if parsed.netloc == "github.com" and "/blob/" in parsed.path:
+            return u.replace("github.com", "raw.githubusercontent.com").replace(
+                "/blob/", "/", 1
+            )
+        if parsed.netloc == "gitlab.com" and "/blob/" in parsed.path:
+            return u.replace("/blob/", "/raw/", 1)
+        if parsed.netloc == "pastebin.com" and not parsed.path.startswith("/raw/"):
+            paste_id = parsed.path.strip("/").split("/")[-1]
+            return f"https://pastebin.com/raw/{paste_id}"
+        return u
+
+    def estimate_tokens(self, path: str) -> int:
+        """Predicts the token cost of a file or directory from byte counts alone. Nothing is read."""
+        total = 0
+        for name, src in self._attachable_files(path):
+            try:
+                total += self.estimator.estimate(name, os.path.getsize(src))
+            except OSError:
+                continue
+        return total
 
     def remove_attachment(self, target: int | str) -> str | None:
         """Removes an attachment by index."""
-        attachments = self.get_attachments()
-        purge: bool = True
-        for i, kind, _ in reversed(attachments):
-            if target == "[all]":
-                purge = self.session.remove_history(i)
-                if not purge:
-                    return None
-                continue
-            if target == i:
-                purge = self.session.remove_history(i)
-                if not purge:
+        if target == "[all]":
+            for i, _, _ in reversed(self.get_attachments()):
+                if not self.session.remove_history(i):
                     return None
-                return kind  # For the UI to catch
-        return "pass"
+            return "pass"
+        entry = self.session.attachments.entries.get(target)
+        if entry is None:
+            return None
+        if not self.session.remove_history(target):
+            return None
+        return entry[0]  # For the UI to catch
 
     def get_attachments(self) -> list[tuple[int, str, str]]:
-        """Retrieves a list of all attachments by utilizing regex."""
-        attachments: list[tuple[int, str, str]] = []
-        # Iterate through all messages in the conversation history
-        for i, msg in enumerate(self.session.history):
-            content = msg.get("content")
-            if isinstance(content, str):
-                match1 = FILE_PATTERN.match(content)
-                match2 = SITE_PATTERN.match(content)
-                if match1:
-                    attachments.append((i, "file", match1.group(1)))
-                if match2:
-                    attachments.append((i, "website", match2.group(1)))
-        return attachments
+        """Retrieves a list of all attachments from the session's attachment index."""
+        return self.session.attachments.items()
 
     def path_validator(self) -> Validator:
         """Prompt_toolkit file validator"""
@@ -244,3 +582,14 @@ class FileManager:
             error_message="Invalid directory.",
             move_cursor_to_end=True,
         )
+
+
+def is_html_url(url: str) -> bool:
+    """False for raw files (GitHub raw, pastebin raw, known text extensions), which skip extraction"""
+    parsed = urlparse(url)
+    return not (
+        parsed.netloc == "raw.githubusercontent.com"
+        or "/raw/" in parsed.path
+        or url.lower().endswith(WEB_FILES)
+        or url.lower().split("/")[-1] in SPECIAL_FILES
+    )
@@ -0,0 +1,169 @@
+"""Low-level file reading for attachments. Binary sniffing and single-pass decoding."""
+
+import codecs
+import mmap
+import os
+
+# Bytes inspected before a file is accepted as text
+SNIFF_SIZE = 8192
+# Read size used while decoding
+CHUNK_SIZE = 1024 * 1024
+
+# Byte order marks, checked before anything else. UTF-16/32 text is full of NUL bytes.
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Signatures of common binary formats that can slip past the NUL byte check
+_MAGIC_NUMBERS = (
+    b"\x7fELF",  # Linux executables & shared objects
+    b"\xcf\xfa\xed\xfe",  # Mach-O 64-bit
+    b"\xce\xfa\xed\xfe",  # Mach-O 32-bit
+    b"\xca\xfe\xba\xbe",  # Mach-O fat binary & Java class files
+    b"\x00asm",  # WebAssembly
+    b"%PDF-",
+    b"\x89PNG\r\n\x1a\n",
+    b"GIF87a",
+    b"GIF89a",
+    b"\xff\xd8\xff",  # JPEG
+    b"PK\x03\x04",  # Zip, jar, docx, epub...
+    b"\x1f\x8b",  # Gzip
+    b"\xfd7zXZ\x00",  # XZ
+    b"7z\xbc\xaf\x27\x1c",  # 7-Zip
+    b"Rar!\x1a\x07",
+    b"\x28\xb5\x2f\xfd",  # Zstandard
+    b"\x04\x22\x4d\x18",  # LZ4
+    b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",  # Legacy Office documents
+    b"SQLite format 3\x00",
+    b"\x93NUMPY",
+    b"ARROW1",
+    b"PAR1",  # Parquet
+)
+
+# Control characters that show up in real text files (tab, newlines, form feed, escape...)
+_TEXT_CONTROLS = {7, 8, 9, 10, 12, 13, 27}
+_CONTROL_BYTES = bytes(b for b in range(32) if b not in _TEXT_CONTROLS) + b"\x7f"
+
+# Share of control bytes above which a sample is considered binary
+_CONTROL_RATIO = 0.10
+
+# Partial read strategies, and the marker left where content was skipped
+READ_STRATEGIES = ("head", "tail", "middle")
+_ELISION = "\n[... {0} bytes elided ...]\n"
+# How far a partial read may look for a line break to cut on
+_LINE_SEARCH = 4096
+
+
+def _bom_encoding(sample: bytes) -> str | None:
+    """Returns the encoding announced by a byte order mark, if any"""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    return None
+
+
+def looks_binary(sample: bytes) -> bool:
+    """Decides whether a leading sample of a file is binary data"""
+    if not sample or _bom_encoding(sample):
+        return False
+    if sample.startswith(_MAGIC_NUMBERS) or b"\x00" in sample:
+        return True
+    # bytes.translate with a delete table strips every control byte in C
+    controls = len(sample) - len(sample.translate(None, _CONTROL_BYTES))
+    return controls / len(sample) > _CONTROL_RATIO
+
+
+def is_binary(path: str) -> bool:
+    """Sniffs the first few KB of a file. Never reads the whole file."""
+    with open(path, "rb") as f:
+        return looks_binary(f.read(SNIFF_SIZE))
+
+
+class FallbackDecoder:
+    """
+    Incremental decoder that switches to latin-1 the moment the input stops being valid.\n
+    Text decoded before the switch is kept, so the file never has to be read twice.
+    """
+
+    def __init__(self, encoding: str = "utf-8"):
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.fallback: bool = False
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        # Partial multi-byte sequences carried over from the previous chunk
+        pending = self.decoder.getstate()[0]
+        try:
+            return self.decoder.decode(data, final)
+        except UnicodeDecodeError:
+            self.fallback = True
+            self.decoder = codecs.getincrementaldecoder("latin-1")()
+            return self.decoder.decode(pending + data, final)
+
+
+def read_text(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """Reads and decodes a text file in a single pass"""
+    parts: list[str] = []
+    with open(path, "rb") as f:
+        chunk = f.read(chunk_size)
+        decoder = FallbackDecoder(_bom_encoding(chunk) or "utf-8")
+        while chunk:
+            parts.append(decoder.decode(chunk))
+            chunk = f.read(chunk_size)
+        parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+def _line_end(mm: mmap.mmap, limit: int) -> int:
+    """Pulls a cut point back to the nearest preceding line break"""
+    pos = mm.rfind(b"\n", max(0, limit - _LINE_SEARCH), limit)
+    return pos + 1 if pos != -1 else limit
+
+
+def _line_start(mm: mmap.mmap, start: int, size: int) -> int:
+    """Pushes a cut point forward to the next line, never mid-character"""
+    pos = mm.find(b"\n", start, min(size, start + _LINE_SEARCH))
+    if pos != -1:
+        return pos + 1
+    # No line break nearby, skip UTF-8 continuation bytes instead
+    while start < size and 0x80 <= mm[start] < 0xC0:
+        start += 1
+    return start
+
+
+def read_partial(path: str, max_bytes: int, strategy: str = "head") -> str:
+    """
+    Reads at most max_bytes of a file through a memory map.\n
+    Only the selected slices are ever paged in, skipped content is replaced with a marker.
+    """
+    size = os.path.getsize(path)
+    if size <= max_bytes:
+        return read_text(path)
+    if max_bytes <= 0:
+        return _ELISION.format(size)
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        encoding = _bom_encoding(mm[:4]) or "utf-8"
+
+        def decode(start: int, end: int) -> str:
+            # Not final, a multi-byte character cut at the end is dropped
+            return FallbackDecoder(encoding).decode(mm[start:end])
+
+        if strategy == "tail":
+            start = _line_start(mm, size - max_bytes, size)
+            return _ELISION.format(start).lstrip() + decode(start, size)
+
+        if strategy == "middle":
+            head_end = _line_end(mm, max_bytes // 2)
+            tail_start = max(_line_start(mm, size - max_bytes // 2, size), head_end)
+            return (
+                decode(0, head_end)
+                + _ELISION.format(tail_start - head_end)
+                + decode(tail_start, size)
+            )
+
+        head_end = _line_end(mm, max_bytes)
+        return decode(0, head_end) + _ELISION.format(size - head_end).rstrip()
@@ -7,9 +7,6 @@ import re
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 
-import keyring
-from keyring import get_password
-from keyring.backends import null
 from platformdirs import user_data_dir
 from prompt_toolkit import prompt
 from prompt_toolkit.completion import (
@@ -26,12 +23,16 @@ APP_DIR = user_data_dir("LocalSage")
 CONFIG_DIR = os.path.join(APP_DIR, "config")
 SESSIONS_DIR = os.path.join(APP_DIR, "sessions")
 LOG_DIR = os.path.join(APP_DIR, "logs")
+INDEX_DIR = os.path.join(APP_DIR, "index")
+WEB_CACHE_DIR = os.path.join(APP_DIR, "web_cache")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "settings.json")
 USER_NAME = getpass.getuser()
 
 os.makedirs(SESSIONS_DIR, exist_ok=True)
 os.makedirs(CONFIG_DIR, exist_ok=True)
 os.makedirs(LOG_DIR, exist_ok=True)
+os.makedirs(INDEX_DIR, exist_ok=True)
+os.makedirs(WEB_CACHE_DIR, exist_ok=True)
 
 # Compiled regex used in the context management system
 # Alternative, allows whitespace: ^---\s*File:\s*(.+?)
@@ -277,15 +278,18 @@ COMMAND_COMPLETER = WordCompleter(
         "!cd",
         "!clear",
         "!config",
+        "!compact",
         "!consume",
         "!cp",
         "!ctx",
         "!delete",
         "!h",
+        "!hedge",
         "!help",
         "!key",
         "!l",
         "!load",
+        "!pool",
         "!profile add",
         "!profile list",
         "!profile remove",
@@ -296,13 +300,16 @@ COMMAND_COMPLETER = WordCompleter(
         "!q",
         "!quit",
         "!rate",
+        "!refresh",
         "!reset",
+        "!retrieval",
         "!s",
         "!save",
         "!sessions",
         "!sum",
         "!summary",
         "!theme",
+        "!tokenizer",
         "!web",
     ],
     match_middle=True,
@@ -342,7 +349,13 @@ def log_exception(e: Exception, context: str = ""):
 
 
 def setup_keyring_backend():
-    """Safely detects a keyring backend."""
+    """
+    Safely detects a keyring backend.\n
+    Detection is slow on some systems, App runs it in the background at startup.
+    """
+    import keyring
+    from keyring.backends import null
+
     try:
         keyring.get_keyring()
     except Exception as e:
@@ -364,6 +377,8 @@ def retrieve_key() -> str:
         pass
     if not api_key:
         try:
+            from keyring import get_password
+
             api_key = get_password("LocalSageAPI", USER_NAME)
         except Exception:
             pass
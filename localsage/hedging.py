@@ -0,0 +1,200 @@
+"""Hedged requests for pool profiles: race several endpoints, keep the first to produce a token."""
+
+# The request goes to the best endpoint first. If no token arrives within the hedge delay,
+# the same request is sent to the next endpoint, and so on up to hedge_max racers. The first
+# racer to produce a token wins and streams; the others are cancelled by closing their
+# connections, which makes llama.cpp & vLLM abort the work. Every race is recorded, so the
+# delay can be tuned against the real TTFT distribution and the work it wastes.
+
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+
+from localsage.endpoint_pool import EndpointPool
+from localsage.retry import is_retryable
+
+_DONE = object()
+
+
+@dataclass
+class HedgeStats:
+    """Race outcomes since startup"""
+
+    races: int = 0
+    hedged: int = 0  # Races that sent at least one backup request
+    primary_wins: int = 0
+    backup_wins: int = 0
+    wasted_requests: int = 0  # Racers cancelled after the winner was picked
+    wasted_chunks: int = 0  # Chunks the losers produced before they were cancelled
+    wasted_seconds: float = 0.0  # Time the losers kept a server busy
+    ttfts: deque = field(default_factory=lambda: deque(maxlen=200))  # Winning TTFTs
+
+    def percentile(self, q: float) -> float | None:
+        if not self.ttfts:
+            return None
+        ordered = sorted(self.ttfts)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def has_token(chunk) -> bool:
+    """True once a chunk carries generated text. Role-only preamble chunks don't count."""
+    if not chunk.choices:
+        return False
+    delta = chunk.choices[0].delta
+    return bool(
+        getattr(delta, "content", None)
+        or getattr(delta, "reasoning_content", None)
+        or getattr(delta, "reasoning", None)
+        or getattr(delta, "thinking", None)
+    )
+
+
+class _Racer:
+    """One endpoint's attempt, streamed on a daemon thread into the shared queue"""
+
+    def __init__(self, url: str, open_stream: Callable, results: queue.Queue):
+        self.url = url
+        self.open_stream = open_stream
+        self.results = results
+        self.stream = None
+        self.chunks = 0
+        self.cancelled = False
+        self.start = time.perf_counter()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        try:
+            self.stream = self.open_stream()
+            if self.cancelled:
+                return
+            for chunk in self.stream:
+                if self.cancelled:
+                    return
+                self.chunks += 1
+                self.results.put((self, chunk))
+            self.results.put((self, _DONE))
+        except Exception as e:
+            if not self.cancelled:
+                self.results.put((self, e))
+        finally:
+            self._close()
+
+    def _close(self):
+        try:
+            if self.stream is not None:
+                self.stream.close()
+        except Exception:
+            pass
+
+    def cancel(self):
+        """Stops the racer. Closing its connection also aborts the generation server-side."""
+        self.cancelled = True
+        self._close()
+
+
+def hedged_stream(
+    targets: list[tuple[str, Callable]],
+    delay: float,
+    hedge_max: int,
+    stats: HedgeStats,
+    pool: EndpointPool | None = None,
+) -> Iterator:
+    """
+    Races `targets` (url, stream opener) and yields the winner's chunks.\n
+    A backup is launched every `delay` seconds without a token, at most `hedge_max` at once.
+    A racer that fails before winning is replaced right away by the next target.
+    """
+    results: queue.Queue = queue.Queue()
+    pending = list(targets)
+    racers: list[_Racer] = []
+    buffered: dict[_Racer, list] = {}
+    winner: _Racer | None = None
+    finished = hedged = False
+    first = 0.0
+    stats.races += 1
+
+    def launch():
+        url, open_stream = pending.pop(0)
+        if pool:
+            pool.begin(url)
+        racer = _Racer(url, open_stream, results)
+        racers.append(racer)
+        buffered[racer] = []
+
+    def retire(racer: _Racer):
+        racers.remove(racer)
+        if pool:
+            pool.end(racer.url)
+
+    try:
+        launch()
+        deadline = time.monotonic() + delay
+        while winner is None:
+            can_hedge = bool(pending) and len(racers) < hedge_max
+            timeout = max(0.0, deadline - time.monotonic()) if can_hedge else None
+            try:
+                racer, item = results.get(timeout=timeout)
+            except queue.Empty:
+                launch()
+                hedged = True
+                deadline = time.monotonic() + delay
+                continue
+            if racer not in racers:
+                continue
+            if isinstance(item, Exception):
+                retire(racer)
+                if pool and is_retryable(item):
+                    pool.mark_failure(racer.url)
+                if not is_retryable(item) or (not racers and not pending):
+                    raise item
+                if pending and len(racers) < hedge_max:
+                    launch()  # Failover, no need to wait out the delay
+                    deadline = time.monotonic() + delay
+                continue
+            if item is _DONE or has_token(item):
+                winner = racer
+                finished = item is _DONE
+                first = time.perf_counter()
+            if item is not _DONE:
+                buffered[racer].append(item)
+        stats.hedged += hedged
+
+        # Cancel the losers and account for the work they did
+        for racer in [r for r in racers if r is not winner]:
+            racer.cancel()
+            stats.wasted_requests += 1
+            stats.wasted_chunks += racer.chunks
+            stats.wasted_seconds += time.perf_counter() - racer.start
+            retire(racer)
+        ttft = first - winner.start
+        stats.ttfts.append(ttft)
+        if winner.url == targets[0][0]:
+            stats.primary_wins += 1
+        else:
+            stats.backup_wins += 1
+        if pool:
+            pool.record_ttft(winner.url, ttft)
+
+        yield from buffered.pop(winner)
+        while not finished:
+            racer, item = results.get()
+            if racer is not winner:
+                continue
+            if item is _DONE:
+                finished = True
+            elif isinstance(item, Exception):
+                if pool and is_retryable(item):
+                    pool.mark_failure(winner.url)
+                raise item
+            else:
+                yield item
+        if pool:
+            pool.record_rate(winner.url, winner.chunks, time.perf_counter() - first)
+            pool.mark_success(winner.url)
+    finally:
+        for racer in list(racers):
+            racer.cancel()
+            retire(racer)
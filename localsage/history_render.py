@@ -0,0 +1,172 @@
+"""Replays a loaded session's history. Long histories are rendered in worker processes."""
+
+# Sanitizing and laying out Markdown is most of the cost of !load, and it is the same
+# work for every message. Messages are rendered to ANSI text at the console's width &
+# color system, by workers in batches when there are enough of them. The main thread
+# only writes finished messages, in order, as soon as they arrive. The text is kept in
+# a RenderCache, so a message that hasn't changed is never rendered twice.
+#
+# Workers start fresh (see workers.py), which costs their startup and the LaTeX fragment
+# cache: each one converts every formula again, however warm the app's cache is. Both
+# only apply to long histories the RenderCache hasn't seen. Shorter ones, under
+# PARALLEL_MIN_CHARS, render in place and share the app's fragment cache.
+
+import io
+import os
+from itertools import repeat
+
+from rich.console import Console
+
+from localsage.globals import log_exception
+from localsage.math_sanitizer import load_latex
+from localsage.render_cache import RenderCache, render_key
+from localsage.ui import assistant_panel, user_panel
+from localsage.workers import worker_pool
+
+# Characters of history below which rendering in place beats starting workers
+PARALLEL_MIN_CHARS = 40_000
+# Batches per worker, so one long reply doesn't leave the other workers idle
+BATCHES_PER_WORKER = 4
+
+
+def print_message(console: Console, role: str, content: str, code_theme: str):
+    """Prints a history message, user panels framed by blank lines"""
+    if role == "user":
+        console.print()
+        console.print(user_panel(content))
+        console.print()
+    else:
+        console.print(assistant_panel(content, code_theme))
+
+
+def render_batch(
+    messages: list[tuple[str, str]],
+    width: int,
+    code_theme: str,
+    color_system: str | None,
+    terminal: bool,
+) -> list[str]:
+    """Renders each message to ANSI text, as the main console would print it. Runs in a worker."""
+    buffer = io.StringIO()
+    console = Console(
+        file=buffer,
+        width=width,
+        color_system=color_system,  # pyright: ignore
+        force_terminal=terminal,
+        legacy_windows=False,
+    )
+    rendered = []
+    for role, content in messages:
+        print_message(console, role, content, code_theme)
+        rendered.append(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+    return rendered
+
+
+def history_messages(history: list) -> list[tuple[str, str]]:
+    """(role, content) of every user & assistant message with content"""
+    messages = []
+    for msg in history:
+        role = msg.get("role", "unknown")
+        content = (msg.get("content") or "").strip()
+        if content and role in ("user", "assistant"):
+            messages.append((role, content))
+    return messages
+
+
+def can_prerender(console: Console) -> bool:
+    """
+    False when ANSI text can't stand in for printing to the console.\n
+    The legacy Windows console is styled through its API, and box characters depend on the encoding.
+    """
+    return not console.legacy_windows and console.encoding.startswith("utf")
+
+
+def replay_workers(messages: list[tuple[str, str]]) -> int:
+    """Worker processes worth starting to render these messages, 1 renders in place"""
+    if sum(len(content) for _, content in messages) < PARALLEL_MIN_CHARS:
+        return 1
+    return min(os.cpu_count() or 1, len(messages))
+
+
+def _batches(
+    indexes: list[int], messages: list[tuple[str, str]], count: int
+) -> list[list[int]]:
+    """Splits message indexes, in order, into about `count` batches of similar length"""
+    target = sum(len(messages[i][1]) for i in indexes) / count
+    batches, batch, size = [], [], 0
+    for i in indexes:
+        batch.append(i)
+        size += len(messages[i][1])
+        if size >= target:
+            batches.append(batch)
+            batch, size = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def replay_history(
+    history: list,
+    console: Console,
+    code_theme: str,
+    workers: int | None = None,
+    cache: RenderCache | None = None,
+):
+    """
+    Prints a history's user & assistant messages, in order.\n
+    Cached messages are written as they are. The rest are rendered by `workers` processes
+    (default: replay_workers()), or in place if there's 1 or the workers fail, then cached.
+    """
+    messages = history_messages(history)
+    if not can_prerender(console):
+        for role, content in messages:
+            print_message(console, role, content, code_theme)
+        return
+
+    settings = (console.width, code_theme, console.color_system, console.is_terminal)
+    keys = [render_key(role, content, *settings) for role, content in messages]
+    rendered = [cache.get(key) if cache else None for key in keys]
+    missing = [i for i, text in enumerate(rendered) if text is None]
+    written = 0
+
+    def write_ready():
+        """Writes every message that's ready, in order"""
+        nonlocal written
+        while written < len(rendered) and rendered[written] is not None:
+            console.file.write(rendered[written])  # pyright: ignore
+            rendered[written] = ""  # Written, only the slot is needed
+            written += 1
+        console.file.flush()
+
+    def finish(i: int, text: str):
+        rendered[i] = text
+        if cache:
+            cache.put(keys[i], text)
+        write_ready()
+
+    write_ready()  # Cached messages ahead of the first miss
+    workers = workers or replay_workers([messages[i] for i in missing])
+    if workers > 1 and missing:
+        batches = _batches(missing, messages, workers * BATCHES_PER_WORKER)
+        pool = None
+        try:
+            pool = worker_pool(workers, initializer=load_latex)
+            results = pool.map(
+                render_batch,
+                ([messages[i] for i in batch] for batch in batches),
+                *(repeat(setting) for setting in settings),
+            )
+            for batch, texts in zip(batches, results):
+                for i, text in zip(batch, texts):
+                    finish(i, text)
+        except Exception as e:
+            log_exception(e, "Error in replay_history(), rendering the rest in place")
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+    for i in missing:
+        if rendered[i] is None:
+            finish(i, render_batch([messages[i]], *settings)[0])
@@ -0,0 +1,113 @@
+"""Streaming HTML pre-cleaner for !web, and the page extraction built on it."""
+
+# Built on lxml's tokenizer (the same parser trafilatura uses) through its parser-target
+# interface, so the markup is read in one linear pass without ever building a tree.
+
+from html import escape
+
+
+class FetchError(Exception):
+    """A page that couldn't be downloaded or held no readable text"""
+
+
+# Elements whose whole subtree is noise for text extraction
+NOISE_TAGS = frozenset({"script", "style", "svg", "noscript", "iframe", "form"})
+
+# Elements that never take an end tag
+_VOID_TAGS = frozenset(
+    {
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "source",
+        "track",
+        "wbr",
+    }
+)
+
+
+class HTMLCleaner:
+    """
+    lxml parser target that re-serializes everything except comments and NOISE_TAGS subtrees.\n
+    Feed it markup in any number of pieces through clean_html() or an lxml HTMLParser.
+    """
+
+    def __init__(self, noise: frozenset[str] = NOISE_TAGS):
+        self.noise = noise
+        self.out: list[str] = []
+        self.skip: int = 0  # Depth inside a noise subtree, 0 while emitting
+
+    def start(self, tag, attrib):
+        if self.skip or tag in self.noise:
+            self.skip += 1
+            return
+        if attrib:
+            attrs = "".join(f' {k}="{escape(v)}"' for k, v in attrib.items())
+            self.out.append(f"<{tag}{attrs}>")
+        else:
+            self.out.append(f"<{tag}>")
+
+    def end(self, tag):
+        if self.skip:
+            self.skip -= 1
+        elif tag not in _VOID_TAGS:
+            self.out.append(f"</{tag}>")
+
+    def data(self, data):
+        if not self.skip:
+            self.out.append(escape(data, quote=False))
+
+    def doctype(self, name, pubid, system):
+        self.out.append(f"<!DOCTYPE {name or 'html'}>")
+
+    def comment(self, text):
+        pass
+
+    def close(self) -> str:
+        return "".join(self.out)
+
+
+def clean_html(html: str, chunk_size: int = 64 * 1024) -> str:
+    """Strips comments and noise elements (scripts, styles, SVG sprites, forms) from a page"""
+    from lxml import etree
+
+    if not html.strip():
+        return ""
+    parser = etree.HTMLParser(target=HTMLCleaner(), huge_tree=True)
+    for i in range(0, len(html), chunk_size):
+        parser.feed(html[i : i + chunk_size])
+    return parser.close().strip()
+
+
+def extract_text(body: bytes, is_html: bool) -> str:
+    """
+    Pulls the readable text out of a downloaded page (uses trafilatura).\n
+    Runs in an extraction worker, which only imports this module.
+    """
+    import trafilatura
+    from trafilatura.utils import decode_file
+
+    downloaded = decode_file(body)
+    if is_html:
+        cleaned_html = clean_html(downloaded)
+        content = trafilatura.extract(
+            cleaned_html,
+            include_comments=False,
+            deduplicate=True,
+        )
+        if not content:
+            content = trafilatura.html2txt(cleaned_html)
+    else:
+        content = downloaded
+
+    # Dip out if no site content was found
+    if not content or not content.strip():
+        raise FetchError("Could not find any readable text on this page.")
+    return content
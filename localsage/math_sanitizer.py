@@ -4,6 +4,7 @@ LaTeX-to-Unicode/ASCII math sanitizer for live Markdown.
 - Detects and converts LaTeX formatted math while preserving Markdown formatting.
 - Skips fenced code and inline code spans.
 - Skips incomplete LaTeX mid-stream (no pylatexenc warnings)
+- Converts common commands from a precomputed table, pylatexenc handles the rest
 
 REMINDER: The math sanitizer can only work properly on valid formatting!
 - If an LLM hallucinates or butchers it's LaTeX or Markdown formatting,
@@ -18,11 +19,13 @@ REMINDER: The math sanitizer can only work properly on valid formatting!
 
 from __future__ import annotations
 
+import bisect
+import functools
 import html
+import itertools
 import logging
 import re
-
-from pylatexenc.latex2text import LatexNodes2Text, get_default_latex_context_db
+import threading
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Normalization prefilter: cleans model output quirks before Markdown parsing.
@@ -45,6 +48,22 @@ _UNICODE_FIXES = str.maketrans(
     }
 )
 
+# Smart quotes and apostrophes to plain ASCII, zero-width spaces and direction marks dropped
+_QUOTE_FIXES = {
+    ord("“"): '"',
+    ord("”"): '"',
+    ord("„"): '"',
+    ord("‟"): '"',
+    ord("‘"): "'",
+    ord("’"): "'",
+    ord("‚"): "'",
+    ord("‛"): "'",
+    **dict.fromkeys(range(0x200B, 0x2010)),
+    **dict.fromkeys(range(0x202A, 0x202F)),
+    0x2060: None,
+}
+_ALL_FIXES = {**_UNICODE_FIXES, **_QUOTE_FIXES}
+
 
 def _normalize_pre(text: str) -> str:
     """
@@ -56,72 +75,328 @@ def _normalize_pre(text: str) -> str:
     if not text:
         return text
 
+    # Without entities every fix is a character swap, so one translate does it all
+    if "&" not in text:
+        return text.translate(_ALL_FIXES)
+
     # Normalize certain Unicode variants to ASCII for consistency
     text = text.translate(_UNICODE_FIXES)
 
     # Decode HTML entities (e.g., &lt; to <)
-    if "&" in text:
-        text = html.unescape(text)
-
-    # Replace smart quotes and apostrophes with straight ASCII versions
-    text = text.translate(
-        {
-            ord("“"): '"',
-            ord("”"): '"',
-            ord("„"): '"',
-            ord("‟"): '"',
-            ord("‘"): "'",
-            ord("’"): "'",
-            ord("‚"): "'",
-            ord("‛"): "'",
-        }
-    )
+    text = html.unescape(text)
 
     # Space normalization, disabled for visual fidelity, made math look odd
     # text = text.replace("\u00A0", " ")   # NBSP
     # text = text.replace("\u202F", " ")   # narrow NBSP
     # text = text.replace("\u2009", " ")   # thin space
 
-    # Remove zero-width spaces and direction marks. Future-proofs the stream against invisible corruption.
-    # I haven't noticed any difference in testing.
-    text = re.sub(r"[\u200B-\u200F\u202A-\u202E\u2060]", "", text)
-
-    return text
+    # Replace smart quotes with straight ASCII versions, remove zero-width spaces and
+    # direction marks. Future-proofs the stream against invisible corruption.
+    return text.translate(_QUOTE_FIXES)
 
 
 # ────────────────────────────────────────────────────────────────────────────────
 
-# Setup for pylatexenc
+# Setup for pylatexenc, built on first use (or by App's startup warm-up)
 logging.getLogger("pylatexenc").setLevel(logging.ERROR)
-ctx = get_default_latex_context_db()
-_L2T = LatexNodes2Text(math_mode="text", latex_context=ctx).latex_to_text
-
-# LaTeX math delims
-_MATH_DELIMS = (
-    re.compile(r"\$(.+?)\$", re.DOTALL),
-    re.compile(r"\\\((.+?)\\\)", re.DOTALL),
-    re.compile(r"\\\[(.+?)\\\]", re.DOTALL),
-)
+_L2T = None
+_L2T_LOCK = threading.Lock()
+
+
+def load_latex():
+    """Builds the pylatexenc converter once, returns its latex_to_text"""
+    global _L2T
+    with _L2T_LOCK:
+        if _L2T is None:
+            from pylatexenc.latex2text import (
+                LatexNodes2Text,
+                get_default_latex_context_db,
+            )
+
+            ctx = get_default_latex_context_db()
+            _L2T = LatexNodes2Text(math_mode="text", latex_context=ctx).latex_to_text
+    return _L2T
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Fast path: fragments made only of common commands never reach pylatexenc.
+# Outputs match pylatexenc exactly, tests/test_sage_math_sanitizer.py holds them together.
+
+# Command name -> text. Named commands eat the whitespace after them, symbols don't.
+_FAST_SYMBOLS = {
+    # Greek letters
+    "alpha": "α",
+    "beta": "β",
+    "gamma": "γ",
+    "delta": "δ",
+    "epsilon": "ϵ",
+    "varepsilon": "ε",
+    "zeta": "ζ",
+    "eta": "η",
+    "theta": "θ",
+    "vartheta": "ϑ",
+    "iota": "ι",
+    "kappa": "κ",
+    "lambda": "λ",
+    "mu": "μ",
+    "nu": "ν",
+    "xi": "ξ",
+    "pi": "π",
+    "varpi": "ϖ",
+    "rho": "ρ",
+    "varrho": "ϱ",
+    "sigma": "σ",
+    "varsigma": "ς",
+    "tau": "τ",
+    "upsilon": "υ",
+    "phi": "ϕ",
+    "varphi": "φ",
+    "chi": "χ",
+    "psi": "ψ",
+    "omega": "ω",
+    "Gamma": "Γ",
+    "Delta": "Δ",
+    "Theta": "Θ",
+    "Lambda": "Λ",
+    "Xi": "Ξ",
+    "Pi": "Π",
+    "Sigma": "Σ",
+    "Upsilon": "Υ",
+    "Phi": "Φ",
+    "Psi": "Ψ",
+    "Omega": "Ω",
+    # Binary operators
+    "pm": "±",
+    "mp": "∓",
+    "times": "×",
+    "div": "÷",
+    "cdot": "·",
+    "ast": "∗",
+    "star": "⋆",
+    "circ": "∘",
+    "bullet": "∙",
+    "oplus": "⊕",
+    "ominus": "⊖",
+    "otimes": "⊗",
+    "odot": "⊙",
+    "wedge": "∧",
+    "vee": "∨",
+    "cap": "∩",
+    "cup": "∪",
+    "setminus": "∖",
+    # Relations
+    "leq": "≤",
+    "geq": "≥",
+    "le": "≤",
+    "ge": "≥",
+    "neq": "≠",
+    "approx": "≈",
+    "equiv": "≡",
+    "sim": "∼",
+    "simeq": "≃",
+    "cong": "≅",
+    "propto": "∝",
+    "ll": "≪",
+    "gg": "≫",
+    "subset": "⊂",
+    "supset": "⊃",
+    "subseteq": "⊆",
+    "supseteq": "⊇",
+    "in": "∈",
+    "notin": "∉",
+    "ni": "∋",
+    "perp": "⊥",
+    "parallel": "∥",
+    "mid": "|",
+    # Arrows
+    "to": "→",
+    "rightarrow": "→",
+    "leftarrow": "←",
+    "Rightarrow": "⇒",
+    "Leftarrow": "⇐",
+    "leftrightarrow": "↔",
+    "Leftrightarrow": "⇔",
+    "longrightarrow": "⟶",
+    "Longrightarrow": "⟹",
+    "mapsto": "↦",
+    "uparrow": "↑",
+    "downarrow": "↓",
+    # Large operators and limits
+    "sum": "∑",
+    "prod": "∏",
+    "int": "∫",
+    "iint": "∬",
+    "oint": "∮",
+    "coprod": "∐",
+    "lim": "lim",
+    "max": "max",
+    "min": "min",
+    "sup": "sup",
+    "inf": "inf",
+    # Named functions
+    "sin": "sin",
+    "cos": "cos",
+    "tan": "tan",
+    "arcsin": "arcsin",
+    "arccos": "arccos",
+    "arctan": "arctan",
+    "sinh": "sinh",
+    "cosh": "cosh",
+    "tanh": "tanh",
+    "log": "log",
+    "ln": "ln",
+    "exp": "exp",
+    # Delimiters
+    "langle": "⟨",
+    "rangle": "⟩",
+    "lvert": "|",
+    "rvert": "|",
+    "lVert": "‖",
+    "rVert": "‖",
+    "lfloor": "⌊",
+    "rfloor": "⌋",
+    "lceil": "⌈",
+    "rceil": "⌉",
+    # Symbols
+    "infty": "∞",
+    "partial": "∂",
+    "nabla": "∇",
+    "forall": "∀",
+    "exists": "∃",
+    "nexists": "∄",
+    "emptyset": "∅",
+    "varnothing": "∅",
+    "ldots": "…",
+    "cdots": "⋯",
+    "dots": "…",
+    "vdots": "⋮",
+    "ddots": "⋱",
+    "ell": "ℓ",
+    "hbar": "ħ",
+    "aleph": "ℵ",
+    "angle": "∠",
+    "prime": "'",
+    "lnot": "¬",
+    "because": "∵",
+    "therefore": "∴",
+    "top": "⊤",
+    "square": "□",
+    # Spacing
+    "quad": "  ",
+    "qquad": "    ",
+    ",": " ",
+    ";": " ",
+    ":": " ",
+    " ": " ",
+    # Escaped characters
+    "{": "{",
+    "}": "}",
+    "_": "_",
+    "&": "&",
+    "#": "#",
+    "$": "$",
+    "%": "%",
+}
+
+# Commands that print their one argument as-is
+_FAST_TEXT = frozenset({"text", "textrm", "mathrm", "operatorname"})
+
+# Comments, alignment, ties and the quote/dash ligatures all need the full parser
+_FAST_BAIL = re.compile(r"[%&~#$`]|--|''")
+_FAST_PLAIN = re.compile(r"[^\\{}]+")
+_FAST_NAME = re.compile(r"[^\W\d_]+|.", re.DOTALL)
+_FAST_SPACE = re.compile(r"\s*")
+
+
+class _Unsupported(Exception):
+    """Raised when a fragment needs the full parser"""
+
+
+def _fast_group(fragment: str, i: int, nested: bool) -> tuple[str, int]:
+    """Converts up to the closing brace (or the end), returns the text and where it stopped"""
+    out = []
+    end = len(fragment)
+    while i < end:
+        char = fragment[i]
+        if char == "\\":
+            text, i = _fast_command(fragment, i + 1)
+            out.append(text)
+        elif char == "{":
+            text, i = _fast_group(fragment, i + 1, True)
+            out.append(text)
+        elif char == "}":
+            if not nested:
+                raise _Unsupported
+            return "".join(out), i + 1
+        else:
+            run = _FAST_PLAIN.match(fragment, i).group()  # pyright: ignore
+            if _FAST_BAIL.search(run):
+                raise _Unsupported
+            out.append(run)
+            i += len(run)
+    if nested:
+        raise _Unsupported
+    return "".join(out), i
+
+
+def _fast_command(fragment: str, i: int) -> tuple[str, int]:
+    """Converts the command whose name starts at i"""
+    match = _FAST_NAME.match(fragment, i)
+    if not match:
+        raise _Unsupported
+    name, i = match.group(), match.end()
+    if name[0].isalpha():
+        # Named commands swallow the spaces after them, up to a blank line
+        space = _FAST_SPACE.match(fragment, i).end()  # pyright: ignore
+        if fragment.count("\n", i, space) > 1:
+            raise _Unsupported
+        i = space
+    symbol = _FAST_SYMBOLS.get(name)
+    if symbol is not None:
+        return symbol, i
+    if name == "frac":
+        num, i = _fast_argument(fragment, i)
+        den, i = _fast_argument(fragment, i)
+        return f"{num}/{den}", i
+    if name == "sqrt":
+        root, i = _fast_argument(fragment, i)
+        return f"√({root})", i
+    if name in _FAST_TEXT:
+        return _fast_argument(fragment, i)
+    raise _Unsupported
+
+
+def _fast_argument(fragment: str, i: int) -> tuple[str, int]:
+    """Converts a braced argument, the only form the fast path accepts"""
+    i = _FAST_SPACE.match(fragment, i).end()  # pyright: ignore
+    if not fragment.startswith("{", i):
+        raise _Unsupported
+    return _fast_group(fragment, i + 1, True)
+
+
+def _fast_latex(fragment: str) -> str | None:
+    """Converts a fragment without pylatexenc, or returns None if it needs the full parser"""
+    try:
+        return _fast_group(fragment, 0, False)[0]
+    except (_Unsupported, RecursionError):
+        return None
+
+
+# Math delimiters: opener -> closer. The content between them is at least one character.
+_DELIMS = {"$": "$", "\\(": "\\)", "\\[": "\\]"}
 
 # Orphan LaTeX commands like \log_b, \frac{...}{...}, \sqrt{x}, etc.
 # Old regex: \\[A-Za-z]+(?:_[A-Za-z0-9]+)?(?:\{[^{}]*\})*(?:\{[^{}]*\})*
 _ORPHAN = re.compile(
     r"\\[A-Za-z]+(?![a-zA-Z])(?:_[A-Za-z0-9]+(?![A-Za-z0-9]))?(?:\{[^{}]*\})*(?!\{)"
 )
-
-# Orphan dollar cleanup
-# Old regex: (?m)(?<![`$])\$(?=(?:[^$\n])*?(?:[\^_\\]))(?=(?:[^$\n])*$)
-_ORPHAN_DOLLAR_LEADING = re.compile(r"(?m)(?<![`$])\$(?=(?:[^$\n]*[\^_\\])[^$\n]*$)")
-# Old regex: (?m)(?<!\$)\$\s*$
-_ORPHAN_DOLLAR_TRAILING = re.compile(r"(?m)(?<!\$)\$(?=\s*$)")
+_COMMAND_NAME = re.compile(r"\\[A-Za-z]+")
 
 # Fenced code blocks (```…```) or inline code (`…`)
 _CODE_BLOCKS = re.compile(r"(```.*?```|`[^`]+`)", re.DOTALL)
 
-# Placeholder restore for codeblocks
-_CODEPH_RE = re.compile(r"\{CODEBLOCK_(\d+)\}")
-
-_CODEPH_ANY_RE = re.compile(r"(?:\{CODEBLOCK_(\d+)\}|CODEBLOCK_(\d+))")
+# Everything the scanner acts on starts with one of these, the rest is copied as-is
+_SPECIAL = re.compile(r"[`$\\]")
 
 # Logic operators to Unicode (handled outside code, before LaTeX conversion)
 _LOGIC_OPS = {
@@ -146,52 +421,192 @@ _RE_LOGIC_OPS = re.compile(
 )
 
 
+def _replace_logic(fragment: str) -> str:
+    if "\\" not in fragment:
+        return fragment
+    return _RE_LOGIC_OPS.sub(lambda m: _LOGIC_OPS[m.group(0)[1:]], fragment)
+
+
+# Converted fragments kept across frames and turns. Live rendering and history
+# replays share it, so a formula is converted once however often it is redrawn.
+FRAGMENT_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
 def _convert_safe(fragment: str) -> str:
-    # Runner for pylatexenc
+    # Runner for the fast path, then pylatexenc. Logic operators go first, as they
+    # do outside math.
+    fragment = _replace_logic(fragment)
+    text = _fast_latex(fragment)
+    if text is not None:
+        return text
     try:
-        return _L2T(fragment)
+        return (_L2T or load_latex())(fragment)
     except Exception:
         return fragment
 
 
+def fragment_cache_stats() -> dict[str, float]:
+    """Hits, misses, size and hit rate of the fragment cache"""
+    info = _convert_safe.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
+
+
 def _balanced(fragment: str) -> bool:
     # Braces only. Cheap, streaming safe
     return fragment.count("{") == fragment.count("}")
 
 
-# Robust placeholder markers for Markdown separators
-_MDSEP_TOKEN_FMT = "⟦MDSEP_{i}⟧"
-_MDSEP_ANY_RE = re.compile(r"(?:\{MDSEP_(\d+)\}|⟦MDSEP_(\d+)⟧|MDSEP_(\d+))")
-
 # Lines that are horizontal rules: --- *** ___ (with optional surrounding spaces)
 _SEPARATOR_RE = re.compile(r"^(?:\s*)([-*_])\1\1(?:\s*)$", re.MULTILINE)
 
 
-def _preserve_md_separators(text: str) -> tuple[str, list[str]]:
-    """Protect Markdown separators (---, ***, ___) from LaTeX parsing/normalization."""
-    seps: list[str] = []
-
-    def _sep_repl(m: re.Match[str]) -> str:
-        seps.append(m.group(0))
-        return _MDSEP_TOKEN_FMT.format(i=len(seps) - 1)
-
-    return _SEPARATOR_RE.sub(_sep_repl, text), seps
-
-
-def _restore_md_separators(text: str, seps: list[str]) -> str:
-    """Restore separators even if placeholder lost braces or different wrapper."""
-    if not seps:
-        return text
-
-    def _restore(m: re.Match[str]) -> str:
-        # Figure out which capturing group matched (1, 2, or 3)
-        for g in (1, 2, 3):
-            if m.group(g) is not None:
-                idx = int(m.group(g))
-                return seps[idx] if 0 <= idx < len(seps) else m.group(0)
-        return m.group(0)
+class _Closers:
+    """
+    Finds math closers in one text, stepping over code spans.\n
+    Positions are indexed on first use and dead ends are remembered, so a run of
+    unclosed openers costs a lookup each instead of a rescan.
+    """
 
-    return _MDSEP_ANY_RE.sub(_restore, text)
+    def __init__(self, text: str):
+        self.text = text
+        self.index: dict[str, list[int]] = {}
+        self.code: dict[int, re.Match | None] = {}
+        self.dead: dict[str, set[int]] = {}  # Backticks past which no closer is found
+
+    def _next(self, needle: str, pos: int) -> int:
+        found = self.index.get(needle)
+        if found is None:
+            found = [m.start() for m in re.finditer(re.escape(needle), self.text)]
+            self.index[needle] = found
+        n = bisect.bisect_left(found, pos)
+        return found[n] if n < len(found) else -1
+
+    def _code(self, tick: int) -> re.Match | None:
+        if tick not in self.code:
+            self.code[tick] = _CODE_BLOCKS.match(self.text, tick)
+        return self.code[tick]
+
+    def find(self, closer: str, start: int) -> tuple[int, list[re.Match]]:
+        """
+        Finds the closer for content starting at start.\n
+        Returns its index (-1 if the math is still open) and the code spans inside.
+        """
+        dead = self.dead.setdefault(closer, set())
+        spans, ticks = [], []
+        i = start
+        while True:
+            close = self._next(closer, max(i, start + 1))
+            if close == -1:
+                break
+            tick = self._next("`", i)
+            if tick == -1 or tick > close:
+                return close, spans
+            if tick in dead:
+                break
+            ticks.append(tick)
+            code = self._code(tick)
+            if code:
+                spans.append(code)
+                i = code.end()
+            else:
+                i = tick + 1
+        # Every walk through these backticks ends the same way
+        dead.update(ticks)
+        return -1, spans
+
+
+def _has_rule(text: str, start: int, end: int) -> bool:
+    """True if a Markdown separator line sits between start and end"""
+    math = text[start:end]
+    if "\n" not in math or not ("---" in math or "***" in math or "___" in math):
+        return False
+    # Searched in place, a rule is only a rule if it fills its whole line
+    eol = text.find("\n", end)
+    rule = _SEPARATOR_RE.search(text, start, eol if eol != -1 else len(text))
+    return rule is not None and rule.start() < end
+
+
+def _convert_math(
+    text: str, start: int, end: int, spans: list[re.Match]
+) -> list[str] | None:
+    """
+    Converts the math between start and end, code spans inside it stay verbatim.\n
+    Returns None for math that must be left alone: unbalanced, or running over a separator.
+    """
+    if not spans:
+        math = text[start:end]
+        if not _balanced(math) or _has_rule(text, start, end):
+            return None
+        return [_convert_safe(math)]
+    bounds = [start, *(i for code in spans for i in code.span()), end]
+    pieces = [text[a:b] for a, b in zip(bounds, bounds[1:])]
+    maths = pieces[::2]
+    if not _balanced("".join(maths)):
+        return None
+    if any(_has_rule(text, a, b) for a, b in zip(bounds[::2], bounds[1::2])):
+        return None
+    pieces[::2] = [_convert_safe(math) if math else "" for math in maths]
+    return pieces
+
+
+def _clean_dollars(out: list[str], code: set[int]) -> list[str]:
+    """
+    Drops dangling math '$' outside code, and never touches shell/currency.\n
+    A '$' goes when the rest of its line is math with no closer, or when it ends the line.
+    """
+    # Each code span reads as one opaque character, its '$', '_' and newlines don't count
+    masked = out.copy()
+    for n in code:
+        masked[n] = "\0"
+    text = "".join(masked)
+
+    def rest_of_line(i: int) -> str:
+        eol = text.find("\n", i + 1)
+        return text[i + 1 : eol if eol != -1 else len(text)]
+
+    # Only the last '$' on a line can dangle, an earlier one has a '$' after it
+    dollars = []
+    i = text.rfind("$")
+    while i != -1:
+        dollars.append(i)
+        i = text.rfind("$", 0, text.rfind("\n", 0, i) + 1)
+    dollars.reverse()
+    # Leading orphan '$' on a line that clearly starts math and has no closer
+    leading = set()
+    for i in dollars:
+        if i and text[i - 1] in "`$":
+            continue
+        rest = rest_of_line(i)
+        if "^" in rest or "_" in rest or "\\" in rest:
+            leading.add(i)
+    # Trailing orphan '$' at end of line (rare but can happen), seen after the leading pass
+    dropped = set(leading)
+    for i in dollars:
+        if i in leading or rest_of_line(i).strip():
+            continue
+        before = i - 1
+        while before in leading:
+            before -= 1
+        if before < 0 or text[before] != "$":
+            dropped.add(i)
+    if not dropped:
+        return out
+
+    # Back to pieces, last cut first so earlier offsets hold
+    ends = list(itertools.accumulate(map(len, masked)))
+    cleaned = out.copy()
+    for i in sorted(dropped, reverse=True):
+        n = bisect.bisect_right(ends, i)
+        cut = i - ends[n] + len(masked[n])
+        cleaned[n] = cleaned[n][:cut] + cleaned[n][cut + 1 :]
+    return cleaned
 
 
 def sanitize_math_safe(text: str) -> str:
@@ -207,70 +622,87 @@ def sanitize_math_safe(text: str) -> str:
     if ("\\" not in text) and ("$" not in text):
         return text
 
-    # 0) Preserve Markdown separators *before* any LaTeX-related work
-    text, seps = _preserve_md_separators(text)
-
-    # 1) Extract and protect code spans
-    code_spans: list[str] = []
-
-    def _code_preserve(m: re.Match[str]) -> str:
-        code = m.group(0)
-        code_spans.append(code)
-        return f"{{CODEBLOCK_{len(code_spans) - 1}}}"
-
-    text = _CODE_BLOCKS.sub(_code_preserve, text)
-
-    # 1.5) Logic operators outside code
-    if "\\" in text:
-
-        def _logic_repl(m: re.Match[str]) -> str:
-            name = m.group(0)[1:]  # drop backslash
-            return _LOGIC_OPS.get(name, m.group(0))
-
-        text = _RE_LOGIC_OPS.sub(_logic_repl, text)
-
-    # 2) Convert math outside code but skip if an MDSEP token is inside the match
-    if "$" in text or "\\" in text:
-        for pat in _MATH_DELIMS:
-            text = pat.sub(
-                lambda m: (
-                    m.group(0)  # leave as-is if placeholder present
-                    if "MDSEP_" in m.group(1)
-                    else (
-                        _convert_safe(m.group(1))
-                        if _balanced(m.group(1))
-                        else m.group(0)
-                    )
-                ),
-                text,
-            )
-
-        text = _ORPHAN.sub(
-            lambda m: _convert_safe(m.group(0))
-            if _balanced(m.group(0))
-            else m.group(0),
-            text,
-        )
-
-    # 2.5) Clean up true dangling math '$' and never touch shell/currency
-    # Leading orphan '$' on a line that clearly starts math and has no closer
-    text = _ORPHAN_DOLLAR_LEADING.sub("", text)
-    # Trailing orphan '$' at end of line (rare but can happen)
-    text = _ORPHAN_DOLLAR_TRAILING.sub("", text)
-
-    # 3) Restore protected code spans
-    if code_spans:
-
-        def _restore_codeph(m: re.Match[str]) -> str:
-            for g in (1, 2):
-                if m.group(g) is not None:
-                    idx = int(m.group(g))
-                    return code_spans[idx] if 0 <= idx < len(code_spans) else m.group(0)
-            return m.group(0)
-
-        text = _CODEPH_ANY_RE.sub(_restore_codeph, text)
-
-    # 4) Restore Markdown separators (handles {MDSEP_n}, ⟦MDSEP_n⟧, or bare MDSEP_n)
-    text = _restore_md_separators(text, seps)
-
-    return text
+    # One pass, left to right: code is copied verbatim, math is converted in place
+    out: list[str] = []
+    code: set[int] = set()  # Indexes of verbatim code in out, for the dollar cleanup
+    # Math left alone is still scanned for other math and commands, but its
+    # closer may not open a new span of the same kind
+    barrier = {opener: -1 for opener in _DELIMS}
+    closers = _Closers(text)
+    dollars = False
+    pos = 0
+    while True:
+        special = _SPECIAL.search(text, pos)
+        if not special:
+            out.append(text[pos:])
+            break
+        i = special.start()
+        if i > pos:
+            out.append(text[pos:i])
+        char = text[i]
+
+        # 1) Code spans
+        if char == "`":
+            span = _CODE_BLOCKS.match(text, i)
+            if span:
+                code.add(len(out))
+                out.append(span.group(0))
+                pos = span.end()
+            else:
+                out.append(char)
+                pos = i + 1
+            continue
+
+        # 2) Math delimiters
+        opener = char if char == "$" else text[i : i + 2]
+        if opener in _DELIMS:
+            start = i + len(opener)
+            if i > barrier[opener]:
+                closer = _DELIMS[opener]
+                end, spans = closers.find(closer, start)
+                if end != -1:
+                    pieces = _convert_math(text, start, end, spans)
+                    if pieces is not None:
+                        for n, piece in enumerate(pieces):
+                            if n % 2:
+                                code.add(len(out))
+                            elif "$" in piece:
+                                dollars = True
+                            out.append(piece)
+                        pos = end + len(closer)
+                        continue
+                    barrier[opener] = end
+            out.append(opener)
+            dollars = dollars or char == "$"
+            pos = start
+            continue
+
+        # 3) Logic operators, then orphan commands
+        logic = _RE_LOGIC_OPS.match(text, i)
+        if logic:
+            out.append(_LOGIC_OPS[logic.group(0)[1:]])
+            pos = logic.end()
+            continue
+        orphan = _ORPHAN.match(text, i)
+        if orphan:
+            command = orphan.group(0)
+            # Code that starts inside the braces wins, the command stays as written
+            tick = command.find("`")
+            while tick != -1 and not _CODE_BLOCKS.match(text, i + tick):
+                tick = command.find("`", tick + 1)
+            if tick == -1:
+                converted = _convert_safe(command) if _balanced(command) else command
+                dollars = dollars or "$" in converted
+                out.append(converted)
+                pos = orphan.end()
+                continue
+            pos = _COMMAND_NAME.match(text, i).end()  # pyright: ignore
+            out.append(text[i:pos])
+            continue
+        out.append(char)
+        pos = i + 1
+
+    # 4) Clean up true dangling math '$', only if the scan left any behind
+    if dollars:
+        out = _clean_dollars(out, code)
+    return "".join(out)
@@ -0,0 +1,158 @@
+"""Model limits discovered from the endpoint: context size, output cap and tokenizer identity."""
+
+# Sources, most specific first:
+#   llama.cpp /props   → default_generation_settings.n_ctx, the context the server really runs
+#   /v1/models         → max_model_len (vLLM), context_length (OpenRouter, LM Studio),
+#                        meta.n_ctx_train (llama.cpp, the trained context)
+# Results are cached per endpoint & model in CONFIG_DIR/limits.json for limits_ttl seconds.
+
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from localsage.globals import CONFIG_DIR
+
+if TYPE_CHECKING:
+    import httpx
+
+LIMITS_FILE = os.path.join(CONFIG_DIR, "limits.json")
+
+DISCOVERY_TIMEOUT = 5.0
+
+
+@dataclass
+class ModelLimits:
+    """What an endpoint reported about a model. Unknown values stay None."""
+
+    context_length: int | None = None
+    max_output: int | None = None
+    # Model id, HF repo or GGUF path, for picking a tokenizer
+    tokenizer: str | None = None
+    source: str = ""  # Which lookup filled context_length
+    fetched: float = field(default_factory=time.time)
+
+
+def _positive(value) -> int | None:
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def server_root(endpoint: str) -> str:
+    """http://host:8080/v1 → http://host:8080, where llama.cpp serves /props"""
+    root = endpoint.rstrip("/")
+    return root[:-3] if root.endswith("/v1") else root
+
+
+def parse_models(data: dict, model: str) -> ModelLimits:
+    """Reads limits from a /v1/models response, from the entry whose id matches `model`"""
+    entries = [e for e in data.get("data") or [] if isinstance(e, dict)]
+    entry = next((e for e in entries if e.get("id") == model), None)
+    if entry is None:
+        # Another model's limits are worse than none
+        return ModelLimits()
+    meta = entry.get("meta") or {}
+    provider = entry.get("top_provider") or {}
+    context = (
+        _positive(entry.get("max_model_len"))
+        or _positive(entry.get("context_length"))
+        or _positive(entry.get("max_context_length"))
+        or _positive(provider.get("context_length"))
+        or _positive(meta.get("n_ctx_train"))
+    )
+    return ModelLimits(
+        context_length=context,
+        max_output=_positive(provider.get("max_completion_tokens"))
+        or _positive(entry.get("max_output_tokens")),
+        tokenizer=entry.get("root") or entry.get("id"),
+        source="models" if context else "",
+    )
+
+
+def parse_props(data: dict) -> ModelLimits:
+    """Reads limits from a llama.cpp /props response"""
+    settings = data.get("default_generation_settings") or {}
+    params = settings.get("params") or {}
+    context = _positive(settings.get("n_ctx"))
+    return ModelLimits(
+        context_length=context,
+        max_output=_positive(params.get("n_predict") or settings.get("n_predict")),
+        tokenizer=data.get("model_path") or None,
+        source="props" if context else "",
+    )
+
+
+def discover(
+    endpoint: str, model: str, api_key: str, http: "httpx.Client"
+) -> ModelLimits:
+    """Queries an endpoint for its limits. Each lookup that fails is skipped."""
+    import httpx
+
+    headers = {"Authorization": f"Bearer {api_key}"}
+    found = ModelLimits()
+    lookups = (
+        (f"{server_root(endpoint)}/props", parse_props),
+        (f"{endpoint.rstrip('/')}/models", lambda d: parse_models(d, model)),
+    )
+    for url, parse in lookups:
+        try:
+            response = http.get(url, headers=headers, timeout=DISCOVERY_TIMEOUT)
+            response.raise_for_status()
+            limits = parse(response.json())
+        except (httpx.HTTPError, ValueError, AttributeError, TypeError):
+            continue
+        # Earlier lookups win, later ones only fill the gaps
+        if not found.context_length and limits.context_length:
+            found.context_length, found.source = limits.context_length, limits.source
+        found.max_output = found.max_output or limits.max_output
+        found.tokenizer = found.tokenizer or limits.tokenizer
+    return found
+
+
+class LimitsCache:
+    """Discovered limits keyed by endpoint & model, persisted to CONFIG_DIR/limits.json"""
+
+    def __init__(self, path: str = LIMITS_FILE, ttl: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        self.entries: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def key(endpoint: str, model: str) -> str:
+        return f"{endpoint.rstrip('/')}#{model}"
+
+    def get(self, endpoint: str, model: str) -> ModelLimits | None:
+        """Cached limits, or None if they are missing or older than the TTL"""
+        with self.lock:
+            entry = self.entries.get(self.key(endpoint, model))
+        if not entry or time.time() - entry.get("fetched", 0) > self.ttl:
+            return None
+        try:
+            return ModelLimits(**entry)
+        except TypeError:
+            return None
+
+    def put(self, endpoint: str, model: str, limits: ModelLimits):
+        with self.lock:
+            self.entries[self.key(endpoint, model)] = asdict(limits)
+            self._save()
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = dict(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError, ValueError):
+            self.entries = {}
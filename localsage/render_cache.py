@@ -0,0 +1,175 @@
+"""Cache of rendered history messages, keyed by content digest, terminal width & code theme."""
+
+# History replay renders each message to ANSI text, see history_render.py. The same
+# message at the same width & theme always renders the same, so the text is kept in a
+# size-capped LRU, and optionally on disk in SESSIONS_DIR/.render so it survives restarts.
+# The key also covers the Local Sage and rich versions, so an upgrade never replays stale text.
+
+import functools
+import hashlib
+import os
+from collections import OrderedDict
+
+from localsage import __version__
+from localsage.globals import SESSIONS_DIR
+
+RENDER_CACHE_DIR = os.path.join(SESSIONS_DIR, ".render")
+
+
+@functools.cache
+def renderer_version() -> str:
+    """Versions of the code that renders history, looked up once since importlib.metadata is slow to import"""
+    from importlib.metadata import version
+
+    return f"localsage {__version__}, rich {version('rich')}"
+
+
+def render_key(
+    role: str,
+    content: str,
+    width: int,
+    code_theme: str,
+    color_system: str | None,
+    terminal: bool,
+) -> str:
+    """Digest of a message and everything its ANSI text depends on, file-safe"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(
+        f"{renderer_version()}\0{role}\0{width}\0{code_theme}\0{color_system}\0{terminal}\0".encode()
+    )
+    digest.update(content.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    Size-capped LRU of rendered messages, optionally backed by a directory of <key>.ansi files.\n
+    ANSI text is mostly ASCII, so sizes are counted in characters.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        directory: str | None = None,
+        max_disk_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.entries: OrderedDict[str, str] = OrderedDict()
+        self.size = 0
+        # Key -> (size, last use) of the files on disk, scanned on first use
+        self.files: dict[str, tuple[int, float]] | None = None
+        self.disk_size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached text for a key and marks it as recently used"""
+        text = self.entries.get(key)
+        if text is not None:
+            self.entries.move_to_end(key)
+        else:
+            text = self._read(key)
+            if text is not None:
+                self._remember(key, text)
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        self._remember(key, text)
+        self._write(key, text)
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+            "size": self.size,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remember(self, key: str, text: str):
+        """Keeps text in memory, then evicts least recently used entries over the cap"""
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        if len(text) > self.max_bytes:
+            return
+        self.entries[key] = text
+        self.size += len(text)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    # <~~DISK~~>
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.ansi")  # pyright: ignore
+
+    def _scan(self) -> dict[str, tuple[int, float]]:
+        if self.files is None:
+            self.files = {}
+            try:
+                with os.scandir(self.directory) as it:  # pyright: ignore
+                    for entry in it:
+                        if entry.name.endswith(".ansi"):
+                            stat = entry.stat()
+                            self.files[entry.name[:-5]] = (stat.st_size, stat.st_mtime)
+            except OSError:
+                pass
+            self.disk_size = sum(size for size, _ in self.files.values())
+        return self.files
+
+    def _track(self, key: str, stat: os.stat_result | None):
+        """Records a file's size & last use, or its removal"""
+        files = self._scan()
+        old = files.pop(key, None)
+        if old:
+            self.disk_size -= old[0]
+        if stat:
+            files[key] = (stat.st_size, stat.st_mtime)
+            self.disk_size += stat.st_size
+
+    def _read(self, key: str) -> str | None:
+        if not self.directory or key not in self._scan():
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                text = f.read()
+            os.utime(path)  # The modification time doubles as the last use
+            self._track(key, os.stat(path))
+        except (OSError, UnicodeDecodeError):
+            self._track(key, None)
+            return None
+        return text
+
+    def _write(self, key: str, text: str):
+        """Writes <key>.ansi atomically, then drops least recently used files over the cap"""
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                f.write(text)
+            os.replace(tmp, path)
+            self._track(key, os.stat(path))
+        except OSError:
+            return
+        if self.disk_size <= self.max_disk_bytes:
+            return
+        files = self._scan()
+        for old in sorted(files, key=lambda k: files[k][1]):
+            if self.disk_size <= self.max_disk_bytes:
+                break
+            self._track(old, None)
+            try:
+                os.remove(self._path(old))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,399 @@
+"""Local retrieval over attached corpora. Chunking, a persistent BM25 index and a semantic vector index."""
+
+# NumPy is an optional dependency (pip install localsage[retrieval]).
+# It is imported lazily so the rest of the CLI never pays for it.
+
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+from localsage.globals import INDEX_DIR
+
+# Target chunk size in characters, and how much trailing context is repeated in the next chunk
+CHUNK_CHARS = 1500
+CHUNK_OVERLAP = 200
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def require_numpy():
+    """Imports NumPy, or explains how to get it"""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "Retrieval mode requires NumPy. Install it with: pip install 'localsage[retrieval]'"
+        )
+    return numpy
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens for keyword matching. snake_case names also yield their parts."""
+    words = _WORD_RE.findall(text.lower())
+    return words + [part for w in words if "_" in w for part in w.split("_") if part]
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS) -> list[str]:
+    """Splits text into line-aligned chunks of roughly `size` characters, with a small overlap"""
+    chunks: list[str] = []
+    current: list[str] = []
+    length = 0
+    for line in text.splitlines(keepends=True):
+        # Minified bundles and other huge lines are cut hard
+        while len(line) > size:
+            chunks.append(line[:size])
+            line = line[size:]
+        if length + len(line) > size and current:
+            chunks.append("".join(current))
+            # Carry the last few lines over so answers spanning a boundary are not lost
+            carried: list[str] = []
+            carried_len = 0
+            for prev in reversed(current):
+                if carried_len + len(prev) > CHUNK_OVERLAP:
+                    break
+                carried.insert(0, prev)
+                carried_len += len(prev)
+            current, length = carried, carried_len
+        current.append(line)
+        length += len(line)
+    if current and "".join(current).strip():
+        chunks.append("".join(current))
+    return [c for c in chunks if c.strip()]
+
+
+class BM25Index:
+    """
+    Okapi BM25 keyword index with NumPy-vectorized scoring.\n
+    Chunks are stored row-major (chunk -> terms) so sources can be replaced or removed,
+    and transposed into per-term postings the first time a query needs them.
+    """
+
+    name = "bm25"
+
+    def __init__(self, directory: str = INDEX_DIR, k1: float = 1.5, b: float = 0.75):
+        self.np = require_numpy()
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.chunks: list[dict] = []  # {"source": name, "text": chunk}
+        self.vocab: dict[str, int] = {}
+        self.rows: list[tuple] = []  # Per chunk: (term ids, term frequencies)
+        self._postings = (
+            None  # Lazily built (indptr, chunk ids, tfs, idf, length norms)
+        )
+        self.load()
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.directory, f"{self.name}.json")
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.directory, f"{self.name}.npz")
+
+    def sources(self) -> list[str]:
+        """Names of every indexed source, in the order they were added"""
+        return list(dict.fromkeys(c["source"] for c in self.chunks))
+
+    def add(self, source: str, text: str) -> int:
+        """Indexes a document, replacing any previous version. Returns the chunk count."""
+        np = self.np
+        self.remove(source)
+        chunks = chunk_text(text)
+        for chunk in chunks:
+            counts = Counter(tokenize(chunk))
+            ids = [self.vocab.setdefault(term, len(self.vocab)) for term in counts]
+            self.rows.append(
+                (
+                    np.array(ids, dtype=np.int32),
+                    np.fromiter(counts.values(), dtype=np.float32, count=len(counts)),
+                )
+            )
+            self.chunks.append({"source": source, "text": chunk})
+        self._postings = None
+        return len(chunks)
+
+    def remove(self, source: str) -> bool:
+        """Drops every chunk that belongs to a source"""
+        keep = [i for i, c in enumerate(self.chunks) if c["source"] != source]
+        if len(keep) == len(self.chunks):
+            return False
+        self.chunks = [self.chunks[i] for i in keep]
+        self.rows = [self.rows[i] for i in keep]
+        self._postings = None
+        return True
+
+    def clear(self):
+        self.chunks, self.rows, self.vocab = [], [], {}
+        self._postings = None
+
+    def _build_postings(self):
+        """Transposes the chunk rows into per-term postings and precomputes idf"""
+        np = self.np
+        lengths = np.array([len(r[0]) for r in self.rows], dtype=np.int64)
+        term_ids = np.concatenate([r[0] for r in self.rows])
+        tfs = np.concatenate([r[1] for r in self.rows])
+        chunk_ids = np.repeat(np.arange(len(self.rows), dtype=np.int32), lengths)
+
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, chunk_ids, tfs = term_ids[order], chunk_ids[order], tfs[order]
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        indptr = np.concatenate(([0], np.cumsum(df)))
+
+        n = len(self.rows)
+        idf = np.log((n - df + 0.5) / (df + 0.5) + 1.0)
+        doc_len = np.array([r[1].sum() for r in self.rows], dtype=np.float32)
+        avgdl = float(doc_len.mean()) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * doc_len / avgdl)
+        self._postings = (indptr, chunk_ids, tfs, idf, norm)
+
+    def search(self, query: str, k: int = 8) -> list[tuple[float, dict]]:
+        """Returns up to k (score, chunk) pairs, best first"""
+        if not self.rows:
+            return []
+        np = self.np
+        if self._postings is None:
+            self._build_postings()
+        indptr, chunk_ids, tfs, idf, norm = self._postings  # pyright: ignore
+
+        scores = np.zeros(len(self.rows), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None or t >= len(idf):
+                continue
+            start, end = indptr[t], indptr[t + 1]
+            if start == end:
+                continue
+            docs = chunk_ids[start:end]
+            tf = tfs[start:end]
+            # A term appears at most once per chunk, so plain fancy-index addition is safe
+            scores[docs] += idf[t] * tf * (self.k1 + 1) / (tf + norm[docs])
+
+        hits = np.flatnonzero(scores)
+        if not hits.size:
+            return []
+        if hits.size > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(float(scores[i]), self.chunks[i]) for i in hits]
+
+    def save(self):
+        """Persists the index in its directory"""
+        np = self.np
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"vocab": self.vocab, "chunks": self.chunks}, f)
+        lengths = [len(r[0]) for r in self.rows]
+        term_ids = [r[0] for r in self.rows] or [np.zeros(0, dtype=np.int32)]
+        tfs = [r[1] for r in self.rows] or [np.zeros(0, dtype=np.float32)]
+        np.savez(
+            self.data_path,
+            indptr=np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))),
+            term_ids=np.concatenate(term_ids),
+            tfs=np.concatenate(tfs),
+        )
+
+    def load(self):
+        """Loads a persisted index, if one exists"""
+        if not (os.path.exists(self.meta_path) and os.path.exists(self.data_path)):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with self.np.load(self.data_path) as data:
+            indptr, term_ids, tfs = data["indptr"], data["term_ids"], data["tfs"]
+        self.vocab = meta["vocab"]
+        self.chunks = meta["chunks"]
+        self.rows = [
+            (term_ids[indptr[i] : indptr[i + 1]], tfs[indptr[i] : indptr[i + 1]])
+            for i in range(len(self.chunks))
+        ]
+        self._postings = None
+
+
+class VectorIndex:
+    """
+    Semantic index backed by an OpenAI-compatible /v1/embeddings endpoint.\n
+    Unit vectors live in a memory-mapped .npy matrix, one row per distinct chunk digest,
+    so unchanged chunks are never embedded twice. Cosine ranking is a single matrix product.
+    """
+
+    name = "semantic"
+    batch_size = 64
+
+    def __init__(self, embed, model: str, directory: str = INDEX_DIR):
+        self.np = require_numpy()
+        self.embed = embed  # list[str] -> list[list[float]]
+        self.model = model
+        self.directory = directory
+        self.chunks: list[dict] = []  # {"source": name, "text": chunk, "digest": key}
+        self.rows: dict[str, int] = {}  # Chunk digest -> matrix row
+        self.count: int = (
+            0  # Rows in use, the matrix is over-allocated to grow in place
+        )
+        self.matrix = None
+        self.load()
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.directory, f"{self.name}.json")
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.directory, f"{self.name}.npy")
+
+    def sources(self) -> list[str]:
+        """Names of every indexed source, in the order they were added"""
+        return list(dict.fromkeys(c["source"] for c in self.chunks))
+
+    def add(self, source: str, text: str) -> int:
+        """Indexes a document, replacing any previous version. Returns the chunk count."""
+        chunks = chunk_text(text)
+        keyed = {_chunk_digest(c): c for c in chunks}
+        missing = [d for d in keyed if d not in self.rows]
+        # Embed first, a failed batch leaves the previous version indexed
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i : i + self.batch_size]
+            self._store(batch, self._embed([keyed[d] for d in batch]))
+        self.remove(source)
+        self.chunks.extend(
+            {"source": source, "text": c, "digest": _chunk_digest(c)} for c in chunks
+        )
+        return len(chunks)
+
+    def remove(self, source: str) -> bool:
+        """Drops every chunk that belongs to a source. Its vectors stay cached until save()."""
+        keep = [c for c in self.chunks if c["source"] != source]
+        if len(keep) == len(self.chunks):
+            return False
+        self.chunks = keep
+        return True
+
+    def clear(self):
+        self.chunks = []
+
+    def _embed(self, texts: list[str]):
+        """Embeds a batch of texts into unit-length float32 rows"""
+        np = self.np
+        vectors = np.asarray(self.embed(texts), dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("The embeddings endpoint returned an unexpected shape.")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _store(self, digests: list[str], vectors):
+        """Appends vectors to the matrix, growing the backing file when it is full"""
+        self._reserve(self.count + len(digests), vectors.shape[1])
+        self.matrix[self.count : self.count + len(digests)] = vectors  # pyright: ignore
+        for digest in digests:
+            self.rows[digest] = self.count
+            self.count += 1
+
+    def _reserve(self, needed: int, dim: int):
+        """Makes room for `needed` rows, doubling the memory-mapped file as required"""
+        if self.matrix is not None and self.matrix.shape[1] != dim:
+            raise ValueError(
+                "Embedding size changed. Clear the index with !purge [all] and re-attach."
+            )
+        capacity = 0 if self.matrix is None else self.matrix.shape[0]
+        if needed <= capacity:
+            return
+        self._rewrite(max(needed, capacity * 2, 256), dim, self.np.arange(self.count))
+
+    def _rewrite(self, capacity: int, dim: int, keep):
+        """Copies the rows in `keep` into a fresh file of the given capacity"""
+        np = self.np
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.data_path + ".tmp"
+        fresh = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=np.float32, shape=(capacity, dim)
+        )
+        if self.matrix is not None and len(keep):
+            fresh[: len(keep)] = self.matrix[keep]
+        fresh.flush()
+        # Drop both maps before swapping files, Windows refuses to replace a mapped file
+        del fresh
+        self.matrix = None
+        os.replace(tmp, self.data_path)
+        self.matrix = np.lib.format.open_memmap(self.data_path, mode="r+")
+
+    def _compact(self):
+        """Forgets cached vectors that no chunk refers to any more, once they are the majority"""
+        live = dict.fromkeys(c["digest"] for c in self.chunks)
+        if self.matrix is None or len(live) * 2 >= self.count:
+            return
+        keep = self.np.array([self.rows[d] for d in live], dtype=self.np.int64)
+        self._rewrite(max(len(live), 256), self.matrix.shape[1], keep)
+        self.rows = {d: i for i, d in enumerate(live)}
+        self.count = len(live)
+
+    def search(self, query: str, k: int = 8) -> list[tuple[float, dict]]:
+        """Returns up to k (score, chunk) pairs, best first"""
+        if not self.chunks or self.matrix is None:
+            return []
+        np = self.np
+        q = self._embed([query])[0]
+        rows = np.fromiter(
+            (self.rows[c["digest"]] for c in self.chunks),
+            dtype=np.int64,
+            count=len(self.chunks),
+        )
+        scores = self.matrix[rows] @ q
+        hits = np.arange(len(scores))
+        if hits.size > k:
+            hits = np.argpartition(-scores, k - 1)[:k]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(float(scores[i]), self.chunks[i]) for i in hits]
+
+    def save(self):
+        """Persists the index in its directory"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._compact()
+        if self.matrix is not None:
+            self.matrix.flush()
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "model": self.model,
+                    "count": self.count,
+                    "rows": self.rows,
+                    "chunks": self.chunks,
+                },
+                f,
+            )
+
+    def load(self):
+        """Loads a persisted index, if one exists for the same embedding model"""
+        if not (os.path.exists(self.meta_path) and os.path.exists(self.data_path)):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        # Vectors from another model live in a different space, start over
+        if meta.get("model") != self.model:
+            return
+        self.chunks = meta["chunks"]
+        self.rows = meta["rows"]
+        self.count = meta["count"]
+        self.matrix = self.np.lib.format.open_memmap(self.data_path, mode="r+")
+
+
+def _chunk_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def format_context(hits: list[tuple[float, dict]], budget: int, encode) -> str:
+    """Packs retrieved chunks into a context block without exceeding a token budget"""
+    blocks: list[str] = []
+    used = 0
+    for _, chunk in hits:
+        block = f"--- Source: `{chunk['source']}`\n{chunk['text'].strip()}"
+        cost = encode(block)
+        if used + cost > budget:
+            continue
+        blocks.append(block)
+        used += cost
+    if not blocks:
+        return ""
+    return "[RETRIEVED CONTEXT]\n" + "\n\n".join(blocks) + "\n[END RETRIEVED CONTEXT]"
@@ -0,0 +1,71 @@
+"""Retry policy for streamed completions. Decides what to retry, how long to wait and how to resume."""
+
+# Connection-level failures are retried with exponential backoff and jitter. A stream that drops
+# after text was generated is resumed instead of restarted:
+#   prefix → the partial reply is sent back as the final assistant message, the server continues it
+#   prompt → the partial reply is followed by a user message asking the model to continue
+
+import random
+
+RESUME_MODES = ("prefix", "prompt")
+
+# Longest single wait, a restarting server usually needs a while to reload its model
+MAX_BACKOFF = 60.0
+
+CONTINUE_PROMPT = (
+    "Your previous reply was cut off by a connection error. Continue it exactly where it "
+    "stopped, without repeating anything or adding any preamble."
+)
+
+# Statuses worth another try: timeouts, conflicts, rate limits & overloaded servers
+_RETRY_STATUSES = frozenset({408, 409, 429})
+
+
+def is_retryable(e: BaseException) -> bool:
+    """True for dropped or refused connections and transient server errors"""
+    import httpx
+    import openai
+
+    if isinstance(e, openai.APIConnectionError):
+        return True
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code in _RETRY_STATUSES or e.status_code >= 500
+    # Mid-stream drops surface as raw httpx errors (RemoteProtocolError, ReadError, ReadTimeout)
+    return isinstance(e, httpx.TransportError)
+
+
+def backoff_delay(attempt: int, base: float, e: BaseException | None = None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (1-based).\n
+    Exponential with equal jitter: half the step is fixed, half is random, capped at MAX_BACKOFF.
+    A server's Retry-After header is honored when it asks for longer.
+    """
+    step = min(MAX_BACKOFF, base * 2 ** (attempt - 1))
+    delay = step / 2 + random.uniform(0, step / 2)
+    response = getattr(e, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, min(MAX_BACKOFF, float(response.headers["retry-after"])))
+        except (KeyError, ValueError):
+            pass
+    return delay
+
+
+def continuation_messages(messages: list, partial: str, mode: str) -> list:
+    """Appends the partial reply (and a continue prompt in prompt mode) to a request's messages"""
+    messages = [*messages, {"role": "assistant", "content": partial}]
+    if mode == "prompt":
+        messages.append({"role": "user", "content": CONTINUE_PROMPT})
+    return messages
+
+
+def continuation_options(mode: str) -> dict:
+    """
+    Extra request fields for prefix mode.\n
+    llama.cpp prefills a trailing assistant message on its own, vLLM needs to be told to.
+    """
+    if mode != "prefix":
+        return {}
+    return {
+        "extra_body": {"continue_final_message": True, "add_generation_prompt": False}
+    }
@@ -22,6 +22,7 @@ REPL FLOW:
 CLASSES:
 
     - Config:         User-facing configuration
+    - ClientRegistry: Shared HTTP connection pool
     - SessionManager: Session I/O
     - FileManager:    Attachment I/O
     - UIConstructor:  Interface object builder
@@ -41,23 +42,32 @@ LIBRARIES:
     - keyring:        Safe API key storage
     - pyperclip:      Copying code blocks to the system clipboard
     - trafilatura:    Scraping websites
+
+STARTUP:
+
+    Only what the first prompt needs is imported up front. openai, httpx, keyring,
+    rich.markdown, pylatexenc and the tokenizer load on App's warm-up thread while the
+    user types, anything needed sooner is built on demand.
 """
 
+from __future__ import annotations
+
 import os
 import re
 import sys
+import threading
 import time
+from collections.abc import Iterator
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
-from openai import OpenAI, Stream
-from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
 from rich.console import ConsoleRenderable, Group
-from rich.live import Live
-from rich.markdown import Markdown
 from rich.panel import Panel
 
 from localsage.cli_controller import CLIController
+from localsage.client_registry import ClientRegistry
 from localsage.config import Config
+from localsage.endpoint_pool import EndpointPool
 from localsage.file_manager import FileManager
 from localsage.globals import (
     CONSOLE,
@@ -68,31 +78,212 @@ from localsage.globals import (
     setup_keyring_backend,
     spinner_constructor,
 )
-from localsage.math_sanitizer import sanitize_math_safe
+from localsage.hedging import HedgeStats, hedged_stream
+from localsage.history_render import replay_history
+from localsage.math_sanitizer import load_latex, sanitize_math_safe
+from localsage.model_limits import LimitsCache, discover
+from localsage.render_cache import RENDER_CACHE_DIR, RenderCache
+from localsage.retry import (
+    backoff_delay,
+    continuation_messages,
+    continuation_options,
+    is_retryable,
+)
 from localsage.session_manager import SessionManager
 from localsage.ui import GlobalPanels, UIConstructor
 
+if TYPE_CHECKING:
+    from openai import OpenAI, Stream
+    from openai.types.chat.chat_completion_chunk import ChatCompletionChunk
+    from rich.live import Live
+
+# Health probes must answer quickly or the endpoint counts as down
+PROBE_TIMEOUT = 3.0
+
 
 # <~~API~~>
 class API:
     """API interaction"""
 
-    def __init__(self, config: Config, session: SessionManager):
+    def __init__(
+        self, config: Config, session: SessionManager, registry: ClientRegistry
+    ):
         self.config: Config = config
         self.session: SessionManager = session
+        self.registry: ClientRegistry = registry
 
         active = self.config.active()
-        self.client = OpenAI(base_url=active["endpoint"], api_key=retrieve_key())
+        # Built on first use, see client
+        self._client: OpenAI | None = None
+        self.client_lock = threading.Lock()
         self.model_name = active["name"]
 
-    def fetch_stream(self) -> Stream[ChatCompletionChunk]:
-        """OpenAI API call"""
-        return self.client.chat.completions.create(
-            model=self.config.model_name,
-            messages=self.session.process_history(),
-            stream=True,
+        # Pool profiles, kept per alias so their measurements survive profile switches
+        self.pools: dict[str, EndpointPool] = {}
+        self.pool: EndpointPool | None = None
+        self.hedge_stats = HedgeStats()
+        self.limits_cache = LimitsCache(ttl=self.config.limits_ttl)
+        self.load_pool()
+
+    @property
+    def client(self) -> OpenAI:
+        """The active profile's client. Built on first use, importing openai is slow."""
+        with self.client_lock:
+            if self._client is None:
+                self._client = self.registry.get(
+                    self.config.active()["endpoint"], retrieve_key()
+                )
+            return self._client
+
+    @client.setter
+    def client(self, client: OpenAI):
+        self._client = client
+
+    def load_pool(self):
+        """Activates load balancing if the active profile lists several endpoints"""
+        if self.pool:
+            self.pool.stop()
+        active = self.config.active()
+        endpoints = active.get("endpoints") or []
+        if len(endpoints) < 2:
+            self.pool = None
+            return
+        pool = self.pools.get(active["alias"])
+        if not pool or list(pool.stats) != endpoints:
+            pool = self.pools[active["alias"]] = EndpointPool(endpoints)
+        self.pool = pool
+        self.pool.start_health_checks(self._probe, self.config.pool_health_interval)
+
+    def discover_limits(self) -> threading.Thread | None:
+        """
+        Sets the active profile's context size & output cap, as reported by its endpoint.\n
+        A fresh cache entry is used right away, otherwise the endpoint is asked in the background.
+        """
+        active = self.config.active()
+        endpoint, model = active["endpoint"], active["name"]
+        cached = self.limits_cache.get(endpoint, model)
+        self.config.set_limits(cached)
+        if cached:
+            return None
+
+        def _discover():
+            limits = discover(
+                endpoint, model, self.client.api_key, self.registry.http_client
+            )
+            if not (limits.context_length or limits.tokenizer):
+                return  # Unreachable or silent, ask again next time
+            self.limits_cache.put(endpoint, model, limits)
+            if self.config.active() is active:  # Still the same profile
+                self.config.set_limits(limits)
+                if self.session.tokenizer_spec() == "auto":
+                    self.session.load_tokenizer()
+
+        thread = threading.Thread(target=_discover, daemon=True)
+        thread.start()
+        return thread
+
+    def _probe(self, url: str):
+        """Health check, a cheap /v1/models call"""
+        client = self.registry.get(url, self.client.api_key)
+        client.with_options(timeout=PROBE_TIMEOUT, max_retries=0).models.list()
+
+    def has_failover(self) -> bool:
+        """True if the active pool still has a healthy endpoint to fail over to"""
+        return bool(self.pool) and any(s.healthy for s in self.pool.stats.values())
+
+    def fetch_stream(self, partial: str = "") -> Iterator[ChatCompletionChunk]:
+        """
+        OpenAI API call.\n
+        Pass the partial reply of a dropped stream to have the model continue it.
+        """
+        messages = self.session.process_history()
+        options = {}
+        if partial:
+            messages = continuation_messages(messages, partial, self.config.resume_mode)
+            options = continuation_options(self.config.resume_mode)
+        request = dict(
+            model=self.config.model_name, messages=messages, stream=True, **options
+        )
+        # Chat.stream_response owns the retry policy, the client's own retries are disabled
+        if not self.pool:
+            return self.client.with_options(max_retries=0).chat.completions.create(
+                **request
+            )
+        if self.config.hedge_delay > 0:
+            return self._hedged_stream(request)
+        return self._pooled_stream(request)
+
+    def _hedged_stream(self, request: dict) -> Iterator[ChatCompletionChunk]:
+        """Races the pool's endpoints in ranked order, see localsage.hedging"""
+        targets = []
+        for url in self.pool.ranked():  # pyright: ignore
+            client = self.registry.get(url, self.client.api_key)
+            opener = client.with_options(max_retries=0).chat.completions.create
+            targets.append((url, lambda opener=opener: opener(**request)))
+        return hedged_stream(
+            targets,
+            self.config.hedge_delay,
+            max(1, self.config.hedge_max),
+            self.hedge_stats,
+            self.pool,
         )
 
+    def _pooled_stream(self, request: dict) -> Iterator[ChatCompletionChunk]:
+        """Opens the stream on the best endpoint, failing over down the ranking if it refuses"""
+        pool: EndpointPool = self.pool  # pyright: ignore
+        error: Exception | None = None
+        for url in pool.ranked():
+            client = self.registry.get(url, self.client.api_key)
+            start = time.perf_counter()
+            pool.begin(url)
+            try:
+                stream = client.with_options(max_retries=0).chat.completions.create(
+                    **request
+                )
+            except Exception as e:
+                pool.end(url)
+                if not is_retryable(e):
+                    raise
+                pool.mark_failure(url)
+                error = e
+                continue
+            return self._tracked(pool, url, stream, start)
+        raise error  # pyright: ignore
+
+    def _tracked(
+        self,
+        pool: EndpointPool,
+        url: str,
+        stream: Stream[ChatCompletionChunk],
+        start: float,
+    ) -> Iterator[ChatCompletionChunk]:
+        """Passes a pooled stream through, measuring TTFT and generation rate"""
+        chunks, first = 0, 0.0
+        try:
+            for chunk in stream:
+                if not chunks:
+                    first = time.perf_counter()
+                    pool.record_ttft(url, first - start)
+                chunks += 1
+                yield chunk
+            pool.record_rate(url, chunks, time.perf_counter() - first)
+            pool.mark_success(url)
+        except Exception as e:
+            if is_retryable(e):
+                pool.mark_failure(url)
+            raise
+        finally:
+            pool.end(url)
+            stream.close()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """OpenAI API embeddings call, used by semantic retrieval"""
+        response = self.client.embeddings.create(
+            model=self.config.embedding_model or self.config.model_name,
+            input=texts,
+        )
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
 
 # <~~STATE-OF-TRUTH~~>
 @dataclass
@@ -132,12 +323,16 @@ class Chat:
         # Placeholder for live display object
         self.live: Live | None = None
 
+        # Rendered history messages, created on the first replay
+        self.render_cache: RenderCache | None = None
+
         # Initialization for boolean flags
         self.reasoning_panel_initialized: bool = False
         self.response_panel_initialized: bool = False
         self.count_reasoning: bool = True
         self.count_response: bool = True
         self.cancel_requested: bool = False
+        self.resuming: bool = False
 
         # Rich panels
         self.reasoning_panel: Panel = Panel("")
@@ -181,6 +376,8 @@ class Chat:
 
     def _update_response(self, content: str):
         """Updates response panel content"""
+        from rich.markdown import Markdown
+
         sanitized = sanitize_math_safe(content)
         self.response_panel.renderable = Markdown(
             sanitized,
@@ -207,6 +404,8 @@ class Chat:
 
     def init_rich_live(self):
         """Defines and starts a rich live instance for the main streaming loop."""
+        from rich.live import Live
+
         self.live = Live(
             Group(),
             console=CONSOLE,
@@ -225,6 +424,7 @@ class Chat:
         self.response_panel = Panel("")
         self.count_reasoning = True
         self.count_response = True
+        self.resuming = False
         self.renderables_to_display.clear()
 
     # <~~STREAMING~~>
@@ -239,17 +439,7 @@ class Chat:
                 spinner_constructor("Awaiting response...")
             )
             self._rebuild_layout(force_refresh=True)
-            # Parse incoming chunks, process them based on type, update panels
-            campbells_chunky = True
-            for chunk in self.api.fetch_stream():
-                if campbells_chunky:
-                    self.renderables_to_display.clear()
-                    campbells_chunky = False
-                    self.start_time = time.perf_counter()
-                self.chunk_parse(chunk)
-                self.render_reasoning_panel()
-                self.render_response_panel()
-                self.update_renderables()
+            self.stream_with_retry()
             self.session.turn_duration(self.start_time, time.perf_counter())
             time.sleep(0.02)  # Small timeout before buffers are flushed
             self.buffer_flusher()
@@ -261,14 +451,24 @@ class Chat:
         # Non-quit exception catcher
         except Exception as e:
             log_exception(e, "Error in stream_response()")
-            self.reset_turn_state()
+            self.buffer_flusher()
             if self.live:
                 self.live.stop()
-            self.panel.spawn_error_panel("API ERROR", f"{e}")
-            self.cancel_requested = True
+            # A reply that was cut off is kept, so the work isn't lost. Summaries must be whole.
+            if self.state.full_response_content and not callback:
+                self.session.turn_duration(self.start_time, time.perf_counter())
+                self.panel.spawn_error_panel(
+                    "STREAM INTERRUPTED",
+                    f"{e}\nThe partial response was kept in your history.",
+                )
+            else:
+                self.reset_turn_state()
+                self.panel.spawn_error_panel("API ERROR", f"{e}")
+                self.cancel_requested = True
         finally:
             if self.live:
                 self.live.stop()
+            self.session.injected_context = ""
             if self.cancel_requested:
                 self.session.correct_history()
             elif not self.cancel_requested:
@@ -281,9 +481,62 @@ class Chat:
                     )
                     self.panel.spawn_status_panel()
 
+    def stream_with_retry(self):
+        """
+        Parses incoming chunks, processes them based on type, updates panels.\n
+        Connection failures are retried with backoff. If the stream drops after the response
+        started, the partial response is kept and the model is asked to continue it.
+        """
+        attempt = 0
+        campbells_chunky = True
+        while True:
+            try:
+                for chunk in self.api.fetch_stream(self.state.full_response_content):
+                    if campbells_chunky:
+                        self.renderables_to_display.clear()
+                        campbells_chunky = False
+                        self.start_time = time.perf_counter()
+                    self.chunk_parse(chunk)
+                    self.render_reasoning_panel()
+                    self.render_response_panel()
+                    self.update_renderables()
+                return
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.config.retry_attempts:
+                    raise
+                attempt += 1
+                log_exception(e, f"Stream dropped, retry {attempt}")
+                self.buffer_flusher()
+                # A pool fails over to another endpoint right away
+                delay = (
+                    0.0
+                    if self.api.has_failover()
+                    else backoff_delay(attempt, self.config.retry_backoff, e)
+                )
+                if self.state.full_response_content:
+                    self.resuming = True
+                    status = "Connection lost, resuming"
+                else:  # Nothing worth keeping yet, start the turn over
+                    self.reset_turn_state()
+                    campbells_chunky = True
+                    status = "Connection failed, retrying"
+                spinner = spinner_constructor(
+                    f"{status} in {delay:.1f}s ({attempt}/{self.config.retry_attempts})..."
+                )
+                self.renderables_to_display.append(spinner)
+                self._rebuild_layout(force_refresh=True)
+                time.sleep(delay)
+                self.renderables_to_display.remove(spinner)
+                if campbells_chunky:
+                    self.renderables_to_display.append(
+                        spinner_constructor("Awaiting response...")
+                    )
+                self._rebuild_layout()
+
     def chunk_parse(self, chunk: ChatCompletionChunk):
         """Parses a chunk and places it into the appropriate buffer"""
-        self.state.reasoning = self._extract_reasoning(chunk)
+        # A resumed stream may think again, only its response is appended to the reply
+        self.state.reasoning = None if self.resuming else self._extract_reasoning(chunk)
         self.state.response = self._extract_response(chunk)
         if self.state.reasoning:
             self.state.reasoning_buffer.append(self.state.reasoning)
@@ -357,17 +610,24 @@ class Chat:
             self._rebuild_layout()
             self.response_panel_initialized = True
 
+    def get_render_cache(self) -> RenderCache:
+        """Returns the rendered history cache, opened on first use"""
+        if self.render_cache is None:
+            self.render_cache = RenderCache(
+                max_bytes=self.config.render_cache_size * 1024 * 1024,
+                directory=RENDER_CACHE_DIR if self.config.render_cache_disk else None,
+                max_disk_bytes=self.config.render_cache_disk * 1024 * 1024,
+            )
+        return self.render_cache
+
     def render_history(self):
-        """Renders a scrollable history."""
-        for msg in self.session.history:
-            role = msg.get("role", "unknown")
-            content = (msg.get("content") or "").strip()  # type: ignore | content is guaranteed or null
-            if not content:
-                continue  # Skip non-content entries
-            if role == "user":
-                self.panel.spawn_user_panel(content)
-            elif role == "assistant":
-                self.panel.spawn_assistant_panel(content)
+        """Renders a scrollable history, in worker processes when it's long, unchanged messages from cache."""
+        replay_history(
+            self.session.history,
+            CONSOLE,
+            self.config.rich_code_theme,
+            cache=self.get_render_cache(),
+        )
 
 
 # <~~CONTROLLER~~>
@@ -382,15 +642,21 @@ class App:
         except FileNotFoundError:
             self.config.save()
 
-        # Define all 7 objects
+        # Define all 8 objects
+        self.registry = ClientRegistry(http2=self.config.http2)
         self.session_manager = SessionManager(self.config)
         self.file_manager = FileManager(self.session_manager)
         self.ui = UIConstructor(self.config, self.session_manager)
         self.panel = GlobalPanels(self.session_manager, self.config, self.ui)
         self.commands = CLIController(
-            self.config, self.session_manager, self.file_manager, self.panel, self.ui
+            self.config,
+            self.session_manager,
+            self.file_manager,
+            self.panel,
+            self.ui,
+            self.registry,
         )
-        self.api = API(self.config, self.session_manager)
+        self.api = API(self.config, self.session_manager, self.registry)
 
         self.chat = Chat(
             self.config,
@@ -403,10 +669,39 @@ class App:
 
         # Give CLIController access to Chat for !load and !summary
         self.commands.set_interface(self.chat)
+        # Semantic retrieval embeds through whichever client is active
+        self.file_manager.set_embedder(self.api.embed)
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Loads the heavy parts of the app in the background, while the user types.\n
+        Anything the main thread reaches first is built there instead, behind the same locks.
+        """
+
+        def _warm_up():
+            try:
+                setup_keyring_backend()
+                # Connect to the endpoint and look up its limits (imports openai & httpx)
+                self.registry.warm(self.api.client)
+                self.api.discover_limits()
+                # Server-side tokenizers count over the shared connection pool
+                self.session_manager.load_tokenizer(self.registry.http_client)
+                self.session_manager.used_tokens()
+                # The renderers used by the first reply
+                load_latex()
+                import rich.live
+                import rich.markdown  # noqa: F401
+            except Exception as e:
+                log_exception(e, "Error in warm_up()")
+
+        thread = threading.Thread(target=_warm_up, daemon=True)
+        thread.start()
+        return thread
 
     def run(self):
         """The app runner"""
         self.panel.spawn_intro_panel()
+        self.warm_up()
 
         # Handle piped content
         if not sys.stdin.isatty():
@@ -444,7 +739,13 @@ class App:
                 if isinstance(command_result, tuple):
                     self.api.client = command_result[0]
                     self.api.model_name = command_result[1]
-                elif isinstance(command_result, OpenAI):
+                    self.api.load_pool()
+                    self.api.discover_limits()
+                    self.session_manager.load_tokenizer()
+                # A new API key. Only an imported openai can have built the client.
+                elif "openai" in sys.modules and isinstance(
+                    command_result, sys.modules["openai"].OpenAI
+                ):
                     self.api.client = command_result
                 continue
 
@@ -455,24 +756,23 @@ class App:
                 continue
 
             self.session_manager.append_message("user", user_input)
+            self.session_manager.injected_context = self.file_manager.retrieve(
+                user_input
+            )
             CONSOLE.print()
             # Tell Chat that it is go time
             self.chat.stream_response()
 
         # Save on exit
         self.config.save()
+        self.session_manager.drop_unsaved_index()
 
 
 # <~~MAIN FLOW~~>
 def main():
     try:
         init_logger()
-        setup_keyring_backend()
-        with CONSOLE.status(
-            "[bold medium_orchid]Launching Local Sage...[/bold medium_orchid]",
-            spinner="moon",
-        ):
-            app = App()
+        app = App()
         app.run()
     except (KeyboardInterrupt, EOFError):
         CONSOLE.print("[yellow]✨ Farewell![/yellow]")
@@ -1,16 +1,142 @@
 """Session I/O and history management."""
 
+import bisect
 import json
 import os
 import platform
+import shutil
 import sys
 import textwrap
+import threading
 from datetime import date
-
-import tiktoken
-from openai.types.chat import ChatCompletionMessageParam
-
-from localsage.globals import SESSIONS_DIR, USER_NAME
+from typing import TYPE_CHECKING
+
+from localsage.globals import (
+    FILE_PATTERN,
+    INDEX_DIR,
+    SESSIONS_DIR,
+    SITE_PATTERN,
+    USER_NAME,
+    retrieve_key,
+)
+from localsage.token_counter import (
+    DEFAULT_TOKENIZER,
+    TokenCounter,
+    auto_tokenizer,
+    make_backend,
+)
+
+if TYPE_CHECKING:
+    import httpx
+    from openai.types.chat import ChatCompletionMessageParam
+
+
+def index_dir(session_path: str) -> str:
+    """
+    The retrieval index of a session file, so chunks never leak into another session.\n
+    An unsaved session gets one per process, moved to the session's own when it's saved.
+    """
+    if session_path:
+        name = os.path.splitext(os.path.basename(session_path))[0]
+    else:
+        name = f".unsaved-{os.getpid()}"
+    return os.path.join(INDEX_DIR, name)
+
+
+class AttachmentIndex:
+    """
+    Maps attachments to their position in history.\n
+    Kept in sync by SessionManager, so lookups never rescan the history list.
+    """
+
+    def __init__(self):
+        # Position -> (kind, name). Insertion order always matches history order.
+        self.entries: dict[int, tuple[str, str]] = {}
+        # Name -> positions of the attachments using that name, oldest first
+        self.names: dict[str, list[int]] = {}
+
+    @staticmethod
+    def classify(content) -> tuple[str, str] | None:
+        """Returns (kind, name) if a message is an attachment"""
+        if not isinstance(content, str):
+            return None
+        match = FILE_PATTERN.match(content)
+        if match:
+            return "file", match.group(1)
+        match = SITE_PATTERN.match(content)
+        if match:
+            return "website", match.group(1)
+        return None
+
+    def add(self, index: int, content):
+        """Indexes a message that was appended at the given position"""
+        found = self.classify(content)
+        if found:
+            self.entries[index] = found
+            self.names.setdefault(found[1], []).append(index)
+
+    def remove(self, index: int, count: int = 1):
+        """
+        Drops `count` positions from `index` on, and moves every later entry down by `count`.\n
+        Only entries at or after `index` are visited, those before it are left as they are.
+        """
+        end = index + count
+        # Entries are in position order, so the ones at or after index pop off the end
+        tail = []
+        while self.entries and next(reversed(self.entries)) >= index:
+            tail.append(self.entries.popitem())
+        # Newest first, so each position is the last one left for its name
+        for pos, (_, name) in tail:
+            self._forget(name, pos)
+        for pos, entry in reversed(tail):
+            if pos >= end:
+                self.entries[pos - count] = entry
+                self.names.setdefault(entry[1], []).append(pos - count)
+
+    def replace(self, index: int, content):
+        """Re-indexes a message whose content was swapped in place"""
+        found = self.classify(content)
+        old = self.entries.get(index)
+        if old:
+            self._forget(old[1], index)
+        if found is None:
+            self.entries.pop(index, None)
+            return
+        if old:
+            self.entries[index] = found  # Keeps its place in insertion order
+        else:
+            self.entries[index] = found
+            self.entries = dict(sorted(self.entries.items()))
+        bisect.insort(self.names.setdefault(found[1], []), index)
+
+    def rebuild(self, history: list):
+        """Rebuilds the index from scratch, used when history is replaced"""
+        self.entries = {}
+        self.names = {}
+        for i, msg in enumerate(history):
+            self.add(i, msg.get("content"))
+
+    def clear(self):
+        self.entries = {}
+        self.names = {}
+
+    def find(self, name: str) -> int | None:
+        """Returns the history position of the newest attachment with this name"""
+        positions = self.names.get(name)
+        return positions[-1] if positions else None
+
+    def items(self) -> list[tuple[int, str, str]]:
+        """Returns (position, kind, name) for every attachment, in history order"""
+        return [(i, kind, name) for i, (kind, name) in self.entries.items()]
+
+    def _forget(self, name: str, pos: int):
+        positions = self.names[name]
+        if positions[-1] == pos:
+            positions.pop()
+        else:
+            positions.remove(pos)
+        if not positions:
+            del self.names[name]
 
 
 class SessionManager:
@@ -22,9 +148,37 @@ class SessionManager:
             {"role": "system", "content": self.get_full_system_prompt()}
         ]
         self.active_session: str = ""
-        self.encoder = tiktoken.get_encoding("o200k_base")
+        self.attachments = AttachmentIndex()
+        # Retrieved context for the current turn. Sent to the API, never stored in history.
+        self.injected_context: str = ""
         self.token_cache: list[tuple[int, int] | None] = []
+        # Held while the cache is read or changed, the warm-up thread counts too
+        self.count_lock = threading.RLock()
         self.gen_time: float = 0
+        self.http: "httpx.Client | None" = None
+        self.counter = TokenCounter()
+        self.load_tokenizer()
+        self.drop_unsaved_index()
+
+    def load_tokenizer(self, http: "httpx.Client | None" = None):
+        """Selects the active profile's tokenizer. Cached counts are dropped with the old one."""
+        if http is not None:
+            self.http = http
+        spec = self.tokenizer_spec()
+        if spec == "auto":
+            limits = self.config.limits
+            spec = auto_tokenizer(limits.tokenizer if limits else None)
+        # Only the server backend needs the key, reading the keyring is slow at startup
+        api_key = retrieve_key() if spec.startswith("server") else ""
+        backend = make_backend(spec, self.config.endpoint, api_key, self.http)
+        counter = TokenCounter(backend)
+        with self.count_lock:
+            self.counter, self.token_cache = counter, []
+
+    def tokenizer_spec(self) -> str:
+        """The active profile's tokenizer spec, as set"""
+        spec = self.config.active().get("tokenizer") or self.config.tokenizer
+        return (spec or DEFAULT_TOKENIZER).strip()
 
     def _json_helper(self, file_name: str) -> str:
         """JSON extension helper"""
@@ -37,48 +191,85 @@ class SessionManager:
         """Save the current session to disk"""
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(self.history, f, indent=2)
+        # The retrieval index follows the session to its file name
+        old, new = index_dir(self.active_session), index_dir(filepath)
+        if old != new and os.path.isdir(old):
+            shutil.rmtree(new, ignore_errors=True)
+            shutil.move(old, new)
         self.active_session = filepath
 
     def load_from_disk(self, filepath: str):
         """Load session file from disk"""
         with open(filepath, "r", encoding="utf-8") as f:
             self.history = json.load(f)
+        self.drop_unsaved_index()
+        self.attachments.rebuild(self.history)
         self.active_session = filepath
 
     def delete_file(self, filepath: str):
         """Used to remove a session file"""
         os.remove(filepath)
+        shutil.rmtree(index_dir(filepath), ignore_errors=True)
+
+    def drop_unsaved_index(self):
+        """Deletes the retrieval index of an unsaved session, which nothing can reopen"""
+        if not self.active_session:
+            shutil.rmtree(index_dir(""), ignore_errors=True)
 
     def append_message(self, role: str, content: str):
         """Append content to the conversation history"""
         self.history.append({"role": role, "content": content})  # pyright: ignore
+        self.attachments.add(len(self.history) - 1, content)
 
     def correct_history(self):
         """Corrects history if the API conncetion was interrupted"""
         if self.history and self.history[-1]["role"] == "user":
             _ = self.history.pop()
+            self.attachments.remove(len(self.history))
 
     def remove_history(self, index: int):
         """Removes a history entry via index"""
         # No longer assumes that index is valid
         try:
             self.history.pop(index)
-            if index < len(self.token_cache):
-                self.token_cache.pop(index)
+            with self.count_lock:
+                if index < len(self.token_cache):
+                    self.token_cache.pop(index)
+            self.attachments.remove(index)
             return True
         except IndexError:
             return False
 
+    def replace_message(self, index: int, content: str):
+        """Swaps the content of a history entry in place, keeping its position"""
+        self.history[index]["content"] = content  # pyright: ignore
+        with self.count_lock:
+            if index < len(self.token_cache):
+                self.token_cache[index] = None
+        self.attachments.replace(index, content)
+
+    def message_tokens(self, index: int) -> int:
+        """Returns the token count of a single history entry, cached if possible"""
+        content = str(self.history[index].get("content") or "")
+        cached = self.token_cache[index] if index < len(self.token_cache) else None
+        if cached is not None and cached[0] == hash(content):
+            return cached[1]
+        return self.encode(content)
+
     def reset(self):
         """Reset the current session state"""
+        self.drop_unsaved_index()
         self.history = [{"role": "system", "content": self.get_full_system_prompt()}]
         self.active_session = ""
         self.token_cache = []
+        self.attachments.clear()
 
     def reset_with_summary(self, summary_text: str):
         """Wipes the session and starts fresh with a summary."""
+        self.drop_unsaved_index()
         self.active_session = ""
         self.token_cache = []
+        self.attachments.clear()
         self.history = [
             {"role": "system", "content": self.get_full_system_prompt()},
             {
@@ -95,17 +286,21 @@ class SessionManager:
 
     def count_tokens(self) -> int | tuple[int, float]:
         """Counts and caches tokens."""
+        with self.count_lock:
+            return self._count_tokens(self.counter, self.token_cache)
+
+    def _count_tokens(
+        self, counter: TokenCounter, cache: list[tuple[int, int] | None]
+    ) -> int | tuple[int, float]:
         # Ensure cache length matches history
-        cache: list[tuple[int, int] | None] = self.token_cache
         diff = len(self.history) - len(cache)
         if diff > 0:
             cache.extend([None] * diff)
         elif diff < 0:
             del cache[len(self.history) :]
 
-        # Count tokens, then cache and return the total token count
-        total = 0
-        throughput = 0
+        # Find the stale entries, count them in one batch, then total everything up
+        stale: dict[int, str] = {}
         for i, msg in enumerate(self.history):
             raw_content = msg.get("content") or ""
             if isinstance(raw_content, list):
@@ -114,20 +309,41 @@ class SessionManager:
                 )
             else:
                 text = str(raw_content)
-            text_hash = hash(text)
             cached = cache[i]
-            if cached is None or cached[0] != text_hash:
-                count = self.encode(text)
-                if self.gen_time:
-                    throughput = count / self.gen_time
-                cache[i] = (text_hash, count)
-                total += count
-            else:
-                total += cached[1]
+            if cached is None or cached[0] != hash(text):
+                stale[i] = text
+        throughput = 0
+        total = sum(
+            c[1] for i, c in enumerate(cache) if c is not None and i not in stale
+        )
+        if stale:
+            counts = counter.count_many(list(stale.values()))
+            total += sum(counts)
+            # Estimates from an unreachable backend are recounted next time
+            if counter.last_exact:
+                for (i, text), count in zip(stale.items(), counts):
+                    cache[i] = (hash(text), count)
+            if self.gen_time:  # The newest entry is the response that was just timed
+                throughput = counts[-1] / self.gen_time
         if throughput:
             return total, throughput
         return total
 
+    def used_tokens(self) -> int:
+        """Returns the token count of the whole history, and of the context retrieved for this turn"""
+        tokens = self.count_tokens()
+        if isinstance(tokens, tuple):
+            tokens = tokens[0]
+        return tokens + self.injected_tokens()
+
+    def injected_tokens(self) -> int:
+        """Returns the token count of the retrieved context sent with this turn"""
+        return self.encode(self.injected_context) if self.injected_context else 0
+
+    def context_budget(self) -> int:
+        """Returns the number of tokens that can be added before trimming kicks in"""
+        return max(self.config.prompt_limit - self.used_tokens(), 0)
+
     def count_turns(self) -> int:
         """Calculates and returns the turn number"""
         return sum(1 for m in self.history if m["role"] == "user")
@@ -139,7 +355,7 @@ class SessionManager:
     def encode(self, text: str) -> int:
         """Converts a string to tokens"""
         try:
-            count = len(self.encoder.encode(text))
+            count = self.counter.count(text)
         except Exception:
             count = 0
         return count
@@ -221,21 +437,35 @@ class SessionManager:
             else:
                 processed_history.append(msg.copy())
 
+        # Retrieved chunks ride along with the newest user message only
+        if self.injected_context:
+            for msg in reversed(processed_history):
+                if msg["role"] == "user":
+                    msg["content"] = f"{self.injected_context}\n\n{msg['content']}"
+                    break
+
         return processed_history
 
     def trim_history(self):
         """Prunes oldest messages when the context window is full"""
-        limit = int(self.config.context_length * 0.95)
-        tokens = self.count_tokens()
-        if isinstance(tokens, tuple):
-            tokens = tokens[0]
+        with self.count_lock:
+            self._trim_history()
+
+    def _trim_history(self):
+        limit = self.config.prompt_limit
+        tokens = self.used_tokens()
+
+        # Work out how many of the oldest messages have to go, then drop them in one slice
+        drop = 0
+        while tokens > limit and len(self.history) - drop > 1:
+            # Uncached when the backend was unreachable, then the total used the estimate too
+            tokens -= self.message_tokens(drop + 1)
+            drop += 1
 
-        while tokens > limit and len(self.history) > 1:
-            if len(self.token_cache) > 1:
-                removed_item = self.token_cache.pop(1)
-                if removed_item is not None:
-                    tokens -= removed_item[1]
-            self.history.pop(1)
+        if drop:
+            del self.history[1 : drop + 1]
+            del self.token_cache[1 : drop + 1]
+            self.attachments.remove(1, drop)
 
     def return_assistant_msg(self) -> str | None:
         """Returns the last assistant message detected in history"""
@@ -254,7 +484,7 @@ class SessionManager:
         toks = self.count_tokens()
         current_count = toks[0] if isinstance(toks, tuple) else toks
 
-        if current_count > int(self.config.context_length * 0.95):
+        if current_count > self.config.prompt_limit:
             return False
 
         return True
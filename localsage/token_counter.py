@@ -0,0 +1,233 @@
+"""Pluggable token counting. Picks a tokenizer per profile, with a cheap estimate as the safety net."""
+
+# Tokenizer specs, set per profile with !tokenizer:
+#   tiktoken[:encoding]    → an OpenAI encoding, o200k_base by default
+#   hf:/path/tokenizer.json → a Hugging Face tokenizer, needs the tokenizers package
+#   server                  → the endpoint's own /tokenize (llama.cpp, vLLM)
+#   estimate                → characters / 4, no dependencies at all
+#   auto                    → the model the endpoint reported: its GGUF through server, its
+#                             tokenizer.json through hf, otherwise the default
+# A backend that can't load falls back to the estimate for good. The server backend falls
+# back only while the endpoint is unreachable, estimated counts are never cached.
+
+import glob
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from localsage.globals import log_exception
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_TOKENIZER = "tiktoken:o200k_base"
+
+CHARS_PER_TOKEN = 4
+# Counts kept in the LRU cache, keyed by text
+CACHE_SIZE = 4096
+# Concurrent /tokenize calls per batch
+SERVER_WORKERS = 8
+SERVER_TIMEOUT = 10.0
+# Seconds the server backend stays on the estimate after a failed call
+SERVER_RETRY_AFTER = 30.0
+
+
+def auto_tokenizer(model: str | None) -> str:
+    """
+    The spec "auto" stands for, from the model an endpoint reported (model_limits.py).\n
+    A GGUF path means llama.cpp is running it and can count. A local model directory or a
+    Hugging Face repo in the local hub cache has a tokenizer.json. Anything else gets the default.
+    """
+    if not model:
+        return DEFAULT_TOKENIZER
+    if model.endswith(".gguf"):
+        return "server"
+    local = os.path.join(os.path.expanduser(model), "tokenizer.json")
+    if os.path.isfile(local):
+        return f"hf:{local}"
+    if model.count("/") == 1:
+        hub = os.environ.get("HF_HUB_CACHE") or os.path.join(
+            os.environ.get("HF_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache", "huggingface"),
+            "hub",
+        )
+        repo = f"models--{model.replace('/', '--')}"
+        found = sorted(
+            glob.glob(os.path.join(hub, repo, "snapshots", "*", "tokenizer.json"))
+        )
+        if found:
+            return f"hf:{found[-1]}"
+    return DEFAULT_TOKENIZER
+
+
+class BackendUnavailable(Exception):
+    """A tokenizer backend can't count right now"""
+
+
+def estimate(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class EstimateBackend:
+    name = "estimate"
+
+    def count_many(self, texts: list[str]) -> list[int]:
+        return [estimate(t) for t in texts]
+
+
+class TiktokenBackend:
+    def __init__(self, encoding: str = "o200k_base"):
+        self.name = f"tiktoken:{encoding}"
+        self.encoding_name = encoding
+        self.encoder = None
+
+    def count_many(self, texts: list[str]) -> list[int]:
+        if self.encoder is None:
+            import tiktoken
+
+            # Downloads the encoding on first use, which fails offline
+            self.encoder = tiktoken.get_encoding(self.encoding_name)
+        return [len(ids) for ids in self.encoder.encode_ordinary_batch(texts)]
+
+
+class HFTokenizerBackend:
+    def __init__(self, path: str):
+        self.name = f"hf:{path}"
+        self.path = path
+        self.tokenizer = None
+
+    def count_many(self, texts: list[str]) -> list[int]:
+        if self.tokenizer is None:
+            from tokenizers import Tokenizer
+
+            self.tokenizer = Tokenizer.from_file(self.path)
+        encodings = self.tokenizer.encode_batch(texts, add_special_tokens=False)
+        return [len(e.ids) for e in encodings]
+
+
+class ServerBackend:
+    """
+    The endpoint's /tokenize route, llama.cpp ({"content"} → tokens) or vLLM ({"prompt"} → count).\n
+    A batch goes out as concurrent requests over the shared connection pool.
+    """
+
+    name = "server"
+
+    def __init__(self, endpoint: str, api_key: str, http: "httpx.Client | None" = None):
+        root = endpoint.rstrip("/")
+        self.url = f"{root[:-3] if root.endswith('/v1') else root}/tokenize"
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.http = http
+        self.down_until = 0.0
+
+    def _count(self, text: str) -> int:
+        response = self.http.post(  # pyright: ignore
+            self.url,
+            json={"content": text, "prompt": text, "add_special": False},
+            headers=self.headers,
+            timeout=SERVER_TIMEOUT,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if "count" in data:
+            return int(data["count"])
+        return len(data["tokens"])
+
+    def count_many(self, texts: list[str]) -> list[int]:
+        import httpx
+
+        if time.monotonic() < self.down_until:
+            raise BackendUnavailable(f"{self.url} is unreachable")
+        if self.http is None:
+            self.http = httpx.Client()
+        try:
+            if len(texts) == 1:
+                return [self._count(texts[0])]
+            with ThreadPoolExecutor(min(SERVER_WORKERS, len(texts))) as pool:
+                return list(pool.map(self._count, texts))
+        except (httpx.HTTPError, ValueError, KeyError, TypeError) as e:
+            self.down_until = time.monotonic() + SERVER_RETRY_AFTER
+            raise BackendUnavailable(f"{self.url}: {e}") from e
+
+
+def make_backend(
+    spec: str, endpoint: str = "", api_key: str = "", http: "httpx.Client | None" = None
+):
+    """Builds the backend a tokenizer spec names. Unknown specs get the estimate."""
+    kind, _, arg = spec.strip().partition(":")
+    kind = kind.lower()
+    if kind == "tiktoken":
+        return TiktokenBackend(arg or "o200k_base")
+    if kind == "hf" and arg:
+        return HFTokenizerBackend(arg)
+    if kind == "server" and endpoint:
+        return ServerBackend(endpoint, api_key, http)
+    return EstimateBackend()
+
+
+class TokenCounter:
+    """Counts tokens with one backend, an LRU cache and the estimate as fallback"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or EstimateBackend()
+        self.fallback = False  # True once the backend has failed to load
+        self.cache: OrderedDict[tuple[int, int], int] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # False when the last batch had to be estimated while the backend was unreachable
+        self.last_exact = True
+
+    @property
+    def name(self) -> str:
+        return "estimate (fallback)" if self.fallback else self.backend.name
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: list[str]) -> list[int]:
+        """Counts several texts, sending only the uncached ones to the backend in one batch"""
+        keys = [(len(t), hash(t)) for t in texts]
+        counts: list[int | None] = []
+        with self.lock:
+            for key in keys:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.cache.move_to_end(key)
+                    self.hits += 1
+                counts.append(cached)
+        missing = list(dict.fromkeys(t for t, c in zip(texts, counts) if c is None))
+        self.last_exact = True
+        if not missing:
+            return counts  # pyright: ignore
+        self.misses += len(missing)
+
+        fresh, exact = self._backend_counts(missing)
+        self.last_exact = exact
+        found = dict(zip(missing, fresh))
+        with self.lock:
+            if exact:
+                for text, n in found.items():
+                    self.cache[(len(text), hash(text))] = n
+                while len(self.cache) > CACHE_SIZE:
+                    self.cache.popitem(last=False)
+        return [c if c is not None else found[t] for t, c in zip(texts, counts)]
+
+    def _backend_counts(self, texts: list[str]) -> tuple[list[int], bool]:
+        """Counts from the backend, or estimates. The flag says whether they may be cached."""
+        if self.fallback:
+            return [estimate(t) for t in texts], True
+        try:
+            return self.backend.count_many(texts), True
+        except BackendUnavailable:
+            return [estimate(t) for t in texts], False
+        except Exception as e:
+            log_exception(e, f"Tokenizer {self.backend.name} unavailable")
+            self.fallback = True
+            with self.lock:
+                self.cache.clear()
+            return [estimate(t) for t in texts], True
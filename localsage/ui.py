@@ -2,9 +2,9 @@
 
 import os
 import textwrap
+from typing import TYPE_CHECKING
 
 from rich import box
-from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.text import Text
 
@@ -12,6 +12,39 @@ from localsage import __version__
 from localsage.globals import CONFIG_FILE, CONSOLE, LOG_DIR, SESSIONS_DIR
 from localsage.math_sanitizer import sanitize_math_safe
 
+# rich.markdown pulls in markdown-it & pygments, it's imported by the panels that render it
+if TYPE_CHECKING:
+    from rich.markdown import Markdown
+
+
+# History panels, module-level so render workers can build them without a session
+def user_panel(content: str) -> Panel:
+    return Panel(
+        content,
+        box=box.HORIZONTALS,
+        padding=(0, 0),
+        title=Text("🌐 You", style="bold blue"),
+        title_align="left",
+        border_style="blue",
+        style="default",
+    )
+
+
+def assistant_panel(content: str, code_theme: str) -> Panel:
+    """The Response panel of a finished reply, for a scrollable history"""
+    from rich.markdown import Markdown
+
+    return Panel(
+        Markdown(sanitize_math_safe(content), code_theme=code_theme),
+        title=Text("💬 Response", style="bold green"),
+        title_align="left",
+        border_style="green",
+        style="default",
+        width=None,
+        box=box.HORIZONTALS,
+        padding=(0, 0),
+    )
+
 
 class UIConstructor:
     """Constructs and returns various UI objects"""
@@ -44,31 +77,6 @@ class UIConstructor:
             padding=(0, 0),
         )
 
-    def user_panel_constructor(self, content: str) -> Panel:
-        return Panel(
-            content,
-            box=box.HORIZONTALS,
-            padding=(0, 0),
-            title=Text("🌐 You", style="bold blue"),
-            title_align="left",
-            border_style="blue",
-            style="default",
-        )
-
-    def assistant_panel_constructor(self, content: str) -> Panel:
-        return Panel(
-            Markdown(
-                sanitize_math_safe(content), code_theme=self.config.rich_code_theme
-            ),
-            title=Text("💬 Response", style="bold green"),
-            title_align="left",
-            border_style="green",
-            style="default",
-            width=None,
-            box=box.HORIZONTALS,
-            padding=(0, 0),
-        )
-
     def status_panel_constructor(self, toks=True) -> Panel:
         turns = self.session.count_turns()
         tokens = self.session.count_tokens()
@@ -78,7 +86,7 @@ class UIConstructor:
             throughput = tokens[1]
         else:
             context = tokens
-        context_percentage = round((context / self.config.context_length) * 100, 1)
+        context_percentage = round((context / self.config.effective_context) * 100, 1)
 
         # Colorize context percentage based on context consumption
         context_color: str = "dim"
@@ -134,6 +142,8 @@ class UIConstructor:
         )
 
     def copy_panel_constructor(self, blocks: str) -> Panel:
+        from rich.markdown import Markdown
+
         wrapped = f"### The following code has been copied to your clipboard\n```\n{blocks}\n```"
         return Panel(
             Markdown(wrapped, code_theme=self.config.rich_code_theme),
@@ -144,21 +154,25 @@ class UIConstructor:
             padding=(0, 0),
         )
 
-    def help_chart_constructor(self) -> Markdown:
+    def help_chart_constructor(self) -> "Markdown":
+        from rich.markdown import Markdown
+
         return Markdown(
             textwrap.dedent("""
             | **Profile Management** | *Manage multiple models & API endpoints* |
             | --- | ----------- |
-            | `!profile add` | Add a new model profile. Prompts for alias, model name, and **API endpoint**. |
+            | `!profile add` | Add a new model profile. Prompts for alias, model name, and **API endpoint**. Enter several comma-separated endpoints to create a load-balanced pool. |
             | `!profile remove` | Remove an existing profile. |
             | `!profile list` | List configured profiles. |
             | `!profile switch` | Switch between profiles. |
+            | `!pool` | Show the health, TTFT, generation rate & load of each endpoint in a pool profile. |
+            | `!hedge` | Show hedged request statistics and set the hedge delay. A pool sends the prompt to a backup endpoint when no token arrives in time, and keeps whichever streams first. |
 
             | **Configuration** | *Main configuration commands* |
             | --- | ----------- |
             | `!config` | Display your current configuration settings and default directories. |
             | `!consume` | Toggle Reasoning panel consumption.  |
-            | `!ctx` | Set maximum context length (for CLI functionality). |
+            | `!ctx` | Set maximum context length (for CLI functionality). By default the endpoint's own context size is used when it reports one; `auto` switches back to it. |
             | `!key` | Set an API key, if needed. Your API key is stored in your OS keychain. |
             | `!prompt` | Set a new system prompt. Takes effect on your next session. |
             | `!rate` | Set the current refresh rate (default is 30). Higher refresh rate = higher CPU usage. |
@@ -180,11 +194,15 @@ class UIConstructor:
 
             | **Context Management** | *Manage context & attachments* |
             | --- | ----------- |
-            | `!a` or `!attach` | Attaches a file or directory to the current session. Child directories are not attached. |
-            | `!web` | Scrapes a website, and attaches the contents to the current session. |
+            | `!a` or `!attach` | Attaches a file or directory to the current session. Child directories are not attached. Oversized files are flagged before reading, and can be cut down to their head, tail, or middle, or outlined. |
+            | `!tokenizer` | Set the tokenizer used to count tokens for the active profile: a tiktoken encoding, a local `tokenizer.json`, the server's `/tokenize`, or a quick estimate. |
+            | `!compact` | Set the compaction mode for attached files. `strip` removes comments, license headers & blank-line runs, `outline` keeps only signatures & docstrings. |
+            | `!retrieval` | Set the retrieval mode. `bm25` (keyword) or `semantic` (embeddings) index attachments and web pages, and only send the most relevant chunks each turn. |
+            | `!web` | Scrapes one or more websites (space or comma separated, or a file with one URL per line) concurrently, and attaches the contents to the current session. |
             | `!attachments` | List all current attachments. |
             | `!purge` | Choose a specific attachment and purge it from the session. Recovers context length. |
-            | `!purge all` | Purges all attachments from the current session. |
+            | `!purge all` | Purges all attachments from the current session, and clears the retrieval index. |
+            | `!refresh` | Re-reads attached files that changed on disk, in place. Unchanged files are skipped. |
             | `!cd` | Change the current working directory. |
             | `!cp` | Copy all code blocks from the last response. |
             | | |
@@ -193,7 +211,20 @@ class UIConstructor:
             """)
         )
 
-    def settings_chart_constructor(self) -> Markdown:
+    def context_description(self) -> str:
+        """Context length for the settings chart, with where it came from"""
+        limits = self.config.limits
+        if self.config.effective_context != self.config.context_length and limits:
+            text = f"{self.config.effective_context} (reported by {limits.source})"
+        else:
+            text = f"{self.config.context_length}"
+        if limits and limits.max_output:
+            text += f", {min(limits.max_output, self.config.effective_context // 2)} reserved for output"
+        return text
+
+    def settings_chart_constructor(self) -> "Markdown":
+        from rich.markdown import Markdown
+
         return Markdown(
             textwrap.dedent(f"""
             | **Current Settings** | *Your current persistent settings* |
@@ -204,11 +235,19 @@ class UIConstructor:
             | | |
             | **System Prompt**: | *{self.config.system_prompt}* |
             | | |
-            | **Context Length**: | *{self.config.context_length}* |
+            | **Context Length**: | *{self.context_description()}* |
             | | |
             | **Refresh Rate**: | *{self.config.refresh_rate}* |
             | | |
             | **Markdown Theme**: | *{self.config.rich_code_theme}* |
+            | | |
+            | **Retrieval Mode**: | *{self.config.retrieval_mode}* |
+            | | |
+            | **Compaction**: | *{self.config.compaction}* |
+            | | |
+            | **Tokenizer**: | *{self.session.counter.name}* |
+            | | |
+            | **Stream Retries**: | *{self.config.retry_attempts} ({self.config.retry_backoff}s backoff, resume by {self.config.resume_mode})* |
             - Your configuration file is located at: `{CONFIG_FILE}`
             - Your session files are located at:     `{SESSIONS_DIR}`
             - Your error logs are located at:        `{LOG_DIR}`
@@ -228,7 +267,9 @@ class GlobalPanels:
     def spawn_intro_panel(self):
         """Simple welcome panel, prints on application launch."""
         CONSOLE.print(self.ui.intro_panel_constructor())
-        CONSOLE.print(Markdown("Type `!h` for a list of commands."))
+        CONSOLE.print(
+            Text.assemble("Type ", ("!h", "markdown.code"), " for a list of commands.")
+        )
         CONSOLE.print()
 
     def spawn_status_panel(self, toks=True):
@@ -242,16 +283,6 @@ class GlobalPanels:
         CONSOLE.print(self.ui.error_panel_constructor(error, exception))
         CONSOLE.print()
 
-    def spawn_user_panel(self, content: str):
-        """Spawns the user panel."""
-        CONSOLE.print()
-        CONSOLE.print(self.ui.user_panel_constructor(content))
-        CONSOLE.print()
-
-    def spawn_assistant_panel(self, content: str):
-        """Spawns the Response panel - for a scrollable history."""
-        CONSOLE.print(self.ui.assistant_panel_constructor(content))
-
     def spawn_copy_panel(self, blocks: str):
         CONSOLE.print()
         CONSOLE.print(self.ui.copy_panel_constructor(blocks))
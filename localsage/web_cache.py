@@ -0,0 +1,168 @@
+"""On-disk cache for !web. Fetched bodies & extracted text, keyed by normalized URL."""
+
+# Entries carry their ETag/Last-Modified validators, so stale pages are revalidated
+# with a conditional request instead of being downloaded and extracted again.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from localsage.globals import WEB_CACHE_DIR
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def cache_key(url: str) -> str:
+    """Normalizes a URL (case, default port, fragment) and hashes it into a file-safe key"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    normalized = urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+class WebCache:
+    """
+    Size-capped LRU cache of web pages.\n
+    index.json holds per-entry metadata; bodies and extracted text sit beside it as <key>.body and <key>.txt.
+    """
+
+    def __init__(
+        self,
+        directory: str = WEB_CACHE_DIR,
+        ttl: int = 3600,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries: dict[str, dict] = {}
+        # !web may fetch from several threads at once
+        self.lock = threading.Lock()
+        self.load()
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def get(self, url: str) -> dict | None:
+        """Returns the metadata for a cached URL. Marks it recently used, saved with the next write."""
+        with self.lock:
+            entry = self.entries.get(cache_key(url))
+            if entry is None:
+                return None
+            if not os.path.exists(self._path(entry["key"], "txt")):
+                self._drop(entry["key"])
+                return None
+            entry["accessed"] = time.time()
+            return dict(entry)
+
+    def is_fresh(self, entry: dict) -> bool:
+        """True while an entry is younger than the TTL"""
+        return time.time() - entry["fetched"] < self.ttl
+
+    def validators(self, entry: dict | None) -> dict[str, str]:
+        """Conditional request headers for revalidating an entry"""
+        headers: dict[str, str] = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def text(self, entry: dict) -> str:
+        with open(self._path(entry["key"], "txt"), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def body(self, entry: dict) -> bytes:
+        with open(self._path(entry["key"], "body"), "rb") as f:
+            return f.read()
+
+    def put(
+        self,
+        url: str,
+        body: bytes,
+        text: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ):
+        """Stores a freshly fetched page, then evicts least recently used entries over the cap"""
+        key = cache_key(url)
+        encoded = text.encode("utf-8")
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(key, "body"), "wb") as f:
+                f.write(body)
+            with open(self._path(key, "txt"), "wb") as f:
+                f.write(encoded)
+            now = time.time()
+            self.entries[key] = {
+                "key": key,
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched": now,
+                "accessed": now,
+                "size": len(body) + len(encoded),
+            }
+            self._evict()
+            self._save()
+
+    def touch(self, url: str):
+        """Restarts the TTL of an entry after the server confirmed it unchanged (304)"""
+        with self.lock:
+            entry = self.entries.get(cache_key(url))
+            if entry is None:
+                return
+            entry["fetched"] = entry["accessed"] = time.time()
+            self._save()
+
+    def size(self) -> int:
+        return sum(e["size"] for e in self.entries.values())
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self._drop(key)
+            self._save()
+
+    def _evict(self):
+        """Drops least recently used entries until the cache fits within max_bytes"""
+        total = self.size()
+        for entry in sorted(self.entries.values(), key=lambda e: e["accessed"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            self._drop(entry["key"])
+
+    def _drop(self, key: str):
+        self.entries.pop(key, None)
+        for ext in ("body", "txt"):
+            try:
+                os.remove(self._path(key, ext))
+            except FileNotFoundError:
+                pass
+
+    def _save(self):
+        """Writes index.json atomically, so a crash never leaves it half written"""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.index_path)
+
+    def load(self):
+        """Loads the cache index, if one exists"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
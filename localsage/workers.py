@@ -0,0 +1,29 @@
+"""Worker pools for CPU-bound jobs: !web page extraction and history replay."""
+
+# Workers start from a fresh interpreter, never forked from the app. Fork copies the
+# locks held by the warm-up, health-check and hedge threads, and can deadlock on them.
+# A fresh worker imports only the module its job lives in, so jobs live in light modules
+# and take plain arguments. The cost is startup, a few hundred ms per worker, and an empty
+# in-process cache in each one. Callers only hand processes enough work to pay for that.
+
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def worker_pool(jobs: int, initializer=None) -> Executor:
+    """
+    Up to one worker process per CPU for `jobs` jobs, each set up by `initializer`.\n
+    Threads if processes are unavailable.
+    """
+    workers = max(1, min(jobs, os.cpu_count() or 1))
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+    try:
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=initializer
+        )
+    except (OSError, NotImplementedError):
+        return ThreadPoolExecutor(max_workers=workers, initializer=initializer)
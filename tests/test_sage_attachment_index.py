@@ -0,0 +1,128 @@
+"""
+Tests the AttachmentIndex kept alongside session history.
+
+Focuses on position bookkeeping as messages are appended, removed and trimmed.
+"""
+
+import random
+
+from localsage.session_manager import AttachmentIndex
+
+
+def file_msg(name: str) -> dict:
+    return {"role": "user", "content": f"---\nFile: `{name}`\n```\ndata\n```\n---"}
+
+
+def site_msg(url: str) -> dict:
+    return {"role": "user", "content": f"---\nWebsite: `{url}`\ntext\n---"}
+
+
+def build(history: list[dict]) -> AttachmentIndex:
+    index = AttachmentIndex()
+    index.rebuild(history)
+    return index
+
+
+def test_classifies_files_and_websites():
+    history = [
+        {"role": "system", "content": "sys"},
+        file_msg("a.py"),
+        {"role": "user", "content": "hello"},
+        site_msg("https://example.com"),
+    ]
+    assert build(history).items() == [
+        (1, "file", "a.py"),
+        (3, "website", "https://example.com"),
+    ]
+
+
+def test_ignores_non_string_content():
+    assert AttachmentIndex.classify(None) is None
+    assert AttachmentIndex.classify([{"type": "text", "text": "x"}]) is None
+
+
+def test_remove_shifts_later_positions():
+    history = [{"role": "system", "content": "sys"}]
+    history += [file_msg(n) for n in ("a", "b", "c")]
+    index = build(history)
+    index.remove(2)
+    assert index.items() == [(1, "file", "a"), (2, "file", "c")]
+    assert index.find("c") == 2
+    assert index.find("b") is None
+
+
+def test_remove_range_matches_trimming():
+    history = [{"role": "system", "content": "sys"}]
+    history += [file_msg(n) for n in ("a", "b", "c", "d")]
+    index = build(history)
+    index.remove(1, 2)
+    assert index.items() == [(1, "file", "c"), (2, "file", "d")]
+
+
+def test_find_returns_newest_duplicate():
+    history = [{"role": "system", "content": "sys"}, file_msg("a"), file_msg("a")]
+    index = build(history)
+    assert index.find("a") == 2
+    index.remove(2)
+    assert index.find("a") == 1
+
+
+def test_add_tracks_appended_messages():
+    index = AttachmentIndex()
+    index.add(1, file_msg("a")["content"])
+    index.add(2, "plain message")
+    assert index.items() == [(1, "file", "a")]
+    index.clear()
+    assert index.items() == []
+
+
+def test_replace_keeps_position():
+    history = [{"role": "system", "content": "sys"}, file_msg("a"), file_msg("b")]
+    index = build(history)
+    index.replace(1, file_msg("c")["content"])
+    assert index.items() == [(1, "file", "c"), (2, "file", "b")]
+    assert index.find("a") is None
+    index.replace(1, "no longer an attachment")
+    assert index.items() == [(2, "file", "b")]
+
+
+def test_removing_the_tail_leaves_earlier_entries_alone():
+    history = [{"role": "system", "content": "sys"}]
+    history += [file_msg(n) for n in ("a", "b", "a", "c")]
+    index = build(history)
+    entries, b_positions = index.entries, index.names["b"]
+    index.remove(3, 2)
+    assert index.entries is entries and index.names["b"] is b_positions
+    assert index.items() == [(1, "file", "a"), (2, "file", "b")]
+    assert index.names == {"a": [1], "b": [2]}
+
+
+def test_incremental_updates_match_a_rebuild():
+    rng = random.Random(26)
+    history = [{"role": "system", "content": "sys"}]
+    index = build(history)
+    for _ in range(400):
+        op = rng.random()
+        if op < 0.5 or len(history) < 3:
+            msg = rng.choice(
+                [
+                    file_msg(rng.choice("abc")),
+                    site_msg("x"),
+                    {"role": "user", "content": "hi"},
+                ]
+            )
+            history.append(msg)
+            index.add(len(history) - 1, msg["content"])
+        elif op < 0.8:
+            start = rng.randrange(1, len(history))
+            count = rng.randint(1, len(history) - start)
+            del history[start : start + count]
+            index.remove(start, count)
+        else:
+            pos = rng.randrange(1, len(history))
+            history[pos] = rng.choice(
+                [file_msg(rng.choice("abc")), {"role": "user", "content": "hi"}]
+            )
+            index.replace(pos, history[pos]["content"])
+        expected = build(history)
+        assert index.entries == expected.entries and index.names == expected.names
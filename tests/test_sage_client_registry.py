@@ -0,0 +1,81 @@
+"""
+Tests the shared client registry: per-endpoint caching and connection reuse across profile switches.
+
+Two stand-in endpoints on localhost record which TCP connection served each request.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from localsage.client_registry import ClientRegistry
+
+
+class _Models(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def do_GET(self):
+        self.server.peers.append(self.client_address)  # pyright: ignore
+        body = json.dumps({"object": "list", "data": []}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoints():
+    servers = []
+    for _ in range(2):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Models)
+        server.peers = []  # pyright: ignore
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def test_clients_are_cached_per_endpoint_and_key():
+    registry = ClientRegistry()
+    a = registry.get("http://localhost:8080/v1", "k")
+    assert registry.get("http://localhost:8080/v1/", "k") is a
+    assert registry.get("http://localhost:8080/v1", "other") is not a
+    b = registry.get("http://localhost:9090/v1", "k")
+    assert b is not a
+    # Every client rides on the same transport
+    assert a._client is b._client is registry.http_client
+
+
+def test_http2_falls_back_without_h2(monkeypatch):
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+    assert ClientRegistry(http2=True).http2 is False
+
+
+def test_connections_survive_profile_switches(endpoints):
+    registry = ClientRegistry()
+    first, second = endpoints
+    a = registry.get(_url(first), "k")
+    registry.warm(a).join(5)
+    registry.get(_url(second), "k").models.list()
+    # Switching back finds the connection opened by the warm-up
+    registry.get(_url(first), "k").models.list()
+    assert len(first.peers) == 2 and first.peers[0] == first.peers[1]
+
+
+def test_warm_ignores_unreachable_endpoints():
+    registry = ClientRegistry()
+    thread = registry.warm(registry.get("http://127.0.0.1:9/v1", "k"))
+    thread.join(10)
+    assert not thread.is_alive()
@@ -0,0 +1,130 @@
+"""
+Tests compactor.py comment stripping, outlining and skip rules.
+"""
+
+import ast
+
+import pytest
+
+from localsage import compactor
+from localsage.compactor import compact, is_minified
+
+PYTHON = '''#!/usr/bin/env python3
+# Copyright (c) 2024 Someone. MIT License.
+"""Module docstring."""
+
+import os  # Needed for paths
+from typing import Any
+
+LIMIT = 10  # Max items
+url = "http://example.com/#anchor"
+
+
+@decorator
+def helper(a: int,
+           b: int) -> int:
+    """Adds things."""
+    # Implementation detail
+    total = a + b
+
+
+    return total
+
+
+class Thing(Base):
+    """A thing."""
+
+    size: int = 3
+
+    def method(self) -> None:
+        print("# not a comment")
+'''
+
+
+def test_off_is_verbatim():
+    assert compact(PYTHON, "a.py", "off") == PYTHON
+
+
+def test_strip_python_removes_comments_only():
+    out = compact(PYTHON, "a.py", "strip")
+    assert "Copyright" not in out and "Needed for paths" not in out
+    assert "Implementation detail" not in out
+    assert '"http://example.com/#anchor"' in out
+    assert 'print("# not a comment")' in out
+    assert '"""Adds things."""' in out
+    assert "\n\n\n" not in out
+    ast.parse(out)  # Still valid Python
+
+
+def test_outline_python_keeps_structure():
+    out = compact(PYTHON, "a.py", "outline")
+    assert '"""Module docstring."""' in out
+    assert "import os" in out and "LIMIT = 10" in out
+    assert "@decorator\ndef helper(a: int,\n           b: int) -> int:" in out
+    assert '"""Adds things."""\n    ...' in out
+    assert "class Thing(Base):" in out and "size: int = 3" in out
+    assert "def method(self) -> None:\n        ..." in out
+    assert "total = a + b" not in out and "print(" not in out
+    ast.parse(out)
+
+
+def test_outline_falls_back_to_strip_on_syntax_errors():
+    broken = "def f(:\n    # note\n    pass\n"
+    assert compact(broken, "a.py", "outline") == "def f(:\n    pass"
+
+
+@pytest.mark.parametrize(
+    "name, source, expected",
+    [
+        (
+            "a.js",
+            "/* License: MIT */\nconst u = 'http://x//y'; // note\nlet s = `a /* b */`;\n",
+            "const u = 'http://x//y';\nlet s = `a /* b */`;",
+        ),
+        (
+            "m.c",
+            "int x; /* multi\nline */ int y;\n// gone\nint z;\n",
+            "int x;\n int y;\nint z;",
+        ),
+        ("run.sh", 'echo ${#arr} "# kept" # gone\n# gone\n', 'echo ${#arr} "# kept"'),
+        ("q.sql", "SELECT '--x' -- gone\nFROM t;\n", "SELECT '--x'\nFROM t;"),
+        ("Dockerfile", "# base\nFROM python:3.12\n", "FROM python:3.12"),
+        ("notes.txt", "a  \n\n\n\nb\n", "a\n\nb"),
+    ],
+)
+def test_strip_by_language(name, source, expected):
+    assert compact(source, name, "strip") == expected
+
+
+def test_outline_generic_keeps_declarations():
+    source = (
+        "import { x } from 'y';\n\n"
+        "/** Adds. */\n"
+        "export function add(a, b) {\n  const c = a + b;\n  return c;\n}\n\n"
+        "class Foo {\n  bar() {\n    return 1;\n  }\n}\n"
+    )
+    out = compact(source, "a.ts", "outline")
+    assert "import { x } from 'y';" in out
+    assert "/** Adds. */\nexport function add(a, b) {\n  ..." in out
+    assert "class Foo {" in out
+    assert "return c" not in out
+
+
+def test_outline_skips_the_comment_strip(monkeypatch):
+    def unused(*args):
+        raise AssertionError("outlined text was stripped first")
+
+    monkeypatch.setattr(compactor, "strip_comments", unused)
+    assert "function f" in compact(
+        "// c\nfunction f() {\n  x();\n}\n", "a.js", "outline"
+    )
+
+
+def test_lockfiles_and_minified_bundles_are_skipped():
+    assert compact("{}\n" * 500, "package-lock.json", "strip").startswith(
+        "[Lockfile omitted"
+    )
+    bundle = "var a=1;" * 1000
+    assert is_minified(bundle)
+    assert compact(bundle, "app.min.js", "outline").startswith("[Minified file omitted")
+    assert not is_minified(PYTHON * 20)
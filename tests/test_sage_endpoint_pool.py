@@ -0,0 +1,180 @@
+"""
+Tests pool profiles: endpoint ranking, cooldowns, health checks and failover in API.fetch_stream.
+
+Failover runs against a stand-in streaming server and a port nothing listens on.
+"""
+
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from localsage.client_registry import ClientRegistry
+from localsage.config import Config
+from localsage.endpoint_pool import EndpointPool
+from localsage.sage import API
+
+A, B, C = "http://a/v1", "http://b/v1", "http://c/v1"
+
+# 1. EndpointPool
+
+
+def test_unmeasured_endpoints_are_tried_first_then_fastest():
+    pool = EndpointPool([A, B, C])
+    pool.record_ttft(A, 2.0)
+    pool.record_ttft(B, 0.5)
+    assert pool.ranked() == [C, B, A]
+    pool.record_ttft(C, 1.0)
+    assert pool.select() == B
+
+
+def test_least_loaded_wins_over_fastest():
+    pool = EndpointPool([A, B])
+    pool.record_ttft(A, 0.1)
+    pool.record_ttft(B, 1.0)
+    pool.begin(A)
+    assert pool.select() == B
+    pool.end(A)
+    assert pool.select() == A
+    assert pool.stats[A].requests == 1 and pool.stats[A].in_flight == 0
+
+
+def test_ewma_smooths_measurements():
+    pool = EndpointPool([A])
+    pool.record_ttft(A, 1.0)
+    pool.record_ttft(A, 2.0)
+    assert pool.stats[A].ttft == pytest.approx(1.3)
+    pool.record_rate(A, 101, 2.0)
+    assert pool.stats[A].rate == pytest.approx(50.5)
+    pool.record_rate(A, 1, 2.0)  # A single chunk says nothing about the rate
+    assert pool.stats[A].rate == pytest.approx(50.5)
+
+
+def test_failures_cool_down_and_health_checks_restore():
+    pool = EndpointPool([A, B])
+    pool.mark_failure(A)
+    assert not pool.stats[A].healthy and pool.ranked() == [B, A]
+    first = pool.stats[A].down_until
+    pool.mark_failure(A)
+    assert pool.stats[A].down_until > first  # Longer after each consecutive failure
+
+    def probe(url):
+        if url == B:
+            raise ConnectionError
+
+    pool.check(probe)
+    assert pool.stats[A].healthy and pool.stats[A].failures == 0
+    assert pool.stats[A].latency is not None
+    assert pool.ranked() == [A, B]
+
+
+def test_background_health_checks_stop():
+    pool = EndpointPool([A, B])
+    probed = threading.Event()
+    pool.start_health_checks(lambda url: probed.set(), interval=0.01)
+    assert probed.wait(5)
+    checker = pool._checker
+    pool.stop()
+    checker.join(5)  # pyright: ignore
+    assert not checker.is_alive()  # pyright: ignore
+
+
+# 2. Failover
+
+
+class _Completions(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for token in ("Hello", " there"):
+            chunk = {
+                "id": "x",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "m",
+                "choices": [{"index": 0, "delta": {"content": token}}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def live_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Completions)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def dead_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def _api(endpoints, monkeypatch) -> API:
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    config = Config()
+    config.models = [
+        {
+            "alias": "pool",
+            "name": "m",
+            "endpoint": endpoints[0],
+            "endpoints": endpoints,
+            "api_key": "stored",
+        }
+    ]
+    config.active_model = "pool"
+    config.pool_health_interval = 0
+    session = SimpleNamespace(
+        process_history=lambda: [{"role": "user", "content": "hi"}]
+    )
+    return API(config, session, ClientRegistry())  # pyright: ignore
+
+
+def test_fetch_stream_fails_over_and_measures(live_url, dead_url, monkeypatch):
+    api = _api([dead_url, live_url], monkeypatch)
+    assert api.pool and api.pool.ranked() == [dead_url, live_url]
+    text = "".join(c.choices[0].delta.content or "" for c in api.fetch_stream())
+    assert text == "Hello there"
+    dead, live = api.pool.stats[dead_url], api.pool.stats[live_url]
+    assert not dead.healthy and dead.in_flight == 0
+    assert live.healthy and live.ttft is not None and live.in_flight == 0
+    assert api.has_failover()
+    # The dead endpoint stays out of rotation
+    assert api.pool.select() == live_url
+
+
+def test_all_endpoints_down_raises(dead_url, monkeypatch):
+    api = _api([dead_url, dead_url.replace("/v1", "/v2")], monkeypatch)
+    with pytest.raises(openai.APIConnectionError):
+        list(api.fetch_stream())
+    assert not api.has_failover()
+
+
+def test_single_endpoint_profiles_have_no_pool(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    config = Config()
+    api = API(config, SimpleNamespace(), ClientRegistry())  # pyright: ignore
+    assert api.pool is None and not api.has_failover()
+
+
+def test_hedged_fetch_stream_races_the_pool(live_url, dead_url, monkeypatch):
+    api = _api([dead_url, live_url], monkeypatch)
+    api.config.hedge_delay = 5.0
+    text = "".join(c.choices[0].delta.content or "" for c in api.fetch_stream())
+    assert text == "Hello there"
+    assert api.hedge_stats.races == 1 and api.hedge_stats.backup_wins == 1
+    assert all(s.in_flight == 0 for s in api.pool.stats.values())  # pyright: ignore
@@ -0,0 +1,56 @@
+"""
+Tests estimator.py per-extension token estimates and their calibration.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from localsage.estimator import BYTES_PER_TOKEN, TokenEstimator
+from localsage.file_manager import FileManager
+
+
+@pytest.fixture
+def estimator(tmp_path):
+    return TokenEstimator(str(tmp_path / "calibration.json"))
+
+
+def test_keys_and_defaults(estimator):
+    assert estimator.key("src/App.TSX") == ".tsx"
+    assert estimator.key("Makefile") == "makefile"
+    assert estimator.ratio("notes.unknownext") == BYTES_PER_TOKEN
+    assert estimator.estimate("data.json", 3000) == 1000
+
+
+def test_first_sample_replaces_the_default(estimator):
+    estimator.observe("a.py", 10_000, 5_000)
+    assert estimator.ratio("b.py") == pytest.approx(2.0)
+
+
+def test_ewma_converges_and_ignores_tiny_files(estimator):
+    for _ in range(20):
+        estimator.observe("a.go", 9_000, 3_000)
+    estimator.observe("a.go", 10_000, 10_000)
+    # One outlier only moves the ratio by alpha
+    assert 2.0 < estimator.ratio("a.go") < 3.0
+    before = estimator.ratio("a.go")
+    estimator.observe("tiny.go", 10, 100)
+    assert estimator.ratio("a.go") == before
+
+
+def test_calibration_persists(estimator, tmp_path):
+    estimator.observe("a.md", 8_000, 2_000)
+    estimator.save()
+    reloaded = TokenEstimator(str(tmp_path / "calibration.json"))
+    assert reloaded.ratio("b.md") == pytest.approx(4.0)
+    assert reloaded.samples == {".md": 1}
+
+
+def test_estimate_tokens_for_a_directory(estimator, tmp_path):
+    (tmp_path / "a.json").write_text("x" * 3000)
+    (tmp_path / "b.txt").write_text("x" * 4200)
+    (tmp_path / ".hidden").write_text("x" * 9999)
+    fm = FileManager(SimpleNamespace(config=SimpleNamespace()))
+    fm.estimator = estimator
+    assert fm.estimate_tokens(str(tmp_path)) == 1000 + 1000
+    assert fm.estimate_tokens(str(tmp_path / "a.json")) == 1000
@@ -0,0 +1,128 @@
+"""
+Tests file_reader.py binary sniffing, single-pass decoding and partial reads.
+"""
+
+import pytest
+
+from localsage.file_reader import (
+    FallbackDecoder,
+    is_binary,
+    looks_binary,
+    read_partial,
+    read_text,
+)
+
+# 1. Binary sniffing
+
+
+@pytest.mark.parametrize(
+    "sample",
+    [
+        b"\x7fELF\x02\x01\x01" + b"\x00" * 32,
+        b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n",
+        b"\x89PNG\r\n\x1a\n....",
+        b"SQLite format 3\x00",
+        b"plain header\x00then NUL bytes",
+        bytes(range(1, 32)) * 10,
+    ],
+)
+def test_detects_binary(sample):
+    assert looks_binary(sample)
+
+
+@pytest.mark.parametrize(
+    "sample",
+    [
+        b"",
+        b"def main():\n\treturn 0\n",
+        "café — naïve".encode(),
+        "café".encode("latin-1"),
+        "﻿hello".encode("utf-16"),
+        b"\x1b[31mred log line\x1b[0m\n",
+    ],
+)
+def test_detects_text(sample):
+    assert not looks_binary(sample)
+
+
+def test_is_binary_without_extension(tmp_path):
+    blob = tmp_path / "dump"
+    blob.write_bytes(b"\x7fELF" + bytes(range(256)) * 64)
+    text = tmp_path / "notes"
+    text.write_text("just some notes\n" * 1000)
+    assert is_binary(str(blob))
+    assert not is_binary(str(text))
+
+
+# 2. Decoding
+
+
+def test_read_text_utf8_across_chunks(tmp_path):
+    content = "é中\U0001f600" * 500
+    path = tmp_path / "utf8.txt"
+    path.write_text(content, encoding="utf-8")
+    # A tiny chunk size splits multi-byte characters between reads
+    assert read_text(str(path), chunk_size=7) == content
+
+
+def test_read_text_falls_back_to_latin1(tmp_path):
+    path = tmp_path / "mixed.txt"
+    path.write_bytes("ok é ".encode() + b"caf\xe9")
+    assert read_text(str(path), chunk_size=3) == "ok é café"
+
+
+def test_read_text_strips_utf8_bom(tmp_path):
+    path = tmp_path / "bom.txt"
+    path.write_bytes(b"\xef\xbb\xbfhello")
+    assert read_text(str(path)) == "hello"
+
+
+def test_fallback_decoder_flags_switch():
+    decoder = FallbackDecoder()
+    assert decoder.decode(b"abc") == "abc"
+    assert not decoder.fallback
+    assert decoder.decode(b"\xff", final=True) == "ÿ"
+    assert decoder.fallback
+
+
+# 3. Partial reads
+
+
+def make_log(tmp_path, lines: int = 2000):
+    path = tmp_path / "big.log"
+    path.write_text("".join(f"line {i:05d}\n" for i in range(lines)))
+    return path
+
+
+def test_read_partial_returns_small_files_whole(tmp_path):
+    path = make_log(tmp_path, lines=10)
+    assert read_partial(str(path), 10_000) == path.read_text()
+
+
+@pytest.mark.parametrize("strategy", ["head", "tail", "middle"])
+def test_read_partial_respects_byte_budget(tmp_path, strategy):
+    path = make_log(tmp_path)
+    result = read_partial(str(path), 1000, strategy)
+    assert "bytes elided" in result
+    # Every kept line is whole, cuts only happen on line breaks
+    kept = [ln for ln in result.splitlines() if ln.startswith("line")]
+    assert kept and all(len(ln) == 10 for ln in kept)
+    assert sum(len(ln) + 1 for ln in kept) <= 1000
+
+
+def test_read_partial_strategies_pick_the_right_end(tmp_path):
+    path = make_log(tmp_path)
+    head = read_partial(str(path), 500, "head")
+    tail = read_partial(str(path), 500, "tail")
+    middle = read_partial(str(path), 500, "middle")
+    assert head.startswith("line 00000") and "line 01999" not in head
+    assert tail.rstrip().endswith("line 01999") and "line 00000" not in tail
+    assert middle.startswith("line 00000") and middle.rstrip().endswith("line 01999")
+
+
+def test_read_partial_never_splits_characters(tmp_path):
+    path = tmp_path / "wide.txt"
+    path.write_text("é" * 5000)  # No line breaks to cut on
+    for strategy in ("head", "tail", "middle"):
+        result = read_partial(str(path), 777, strategy)
+        assert "�" not in result and "Ã" not in result
@@ -0,0 +1,126 @@
+"""
+Tests hedged requests: backups after the delay, first token wins, losers are cancelled and counted.
+
+Endpoints are scripted stand-in streams, so races are deterministic and fast.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from localsage.endpoint_pool import EndpointPool
+from localsage.hedging import HedgeStats, has_token, hedged_stream
+
+A, B, C = "http://a/v1", "http://b/v1", "http://c/v1"
+
+
+def _chunk(content=None):
+    delta = SimpleNamespace(content=content, reasoning_content=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class _Stream:
+    """Waits `wait` seconds before its first token, then yields `tokens`. close() cancels it."""
+
+    def __init__(self, wait: float, tokens: list[str], error: Exception | None = None):
+        self.wait = wait
+        self.tokens = tokens
+        self.error = error
+        self.closed = threading.Event()
+        self.opened = False
+
+    def open(self):
+        self.opened = True
+        if self.error:
+            raise self.error
+        return self
+
+    def __iter__(self):
+        yield _chunk()  # Role-only preamble, sent before any token
+        if self.closed.wait(self.wait):
+            raise httpx.ReadError("closed")
+        for token in self.tokens:
+            yield _chunk(token)
+
+    def close(self):
+        self.closed.set()
+
+
+def _race(streams: dict, delay: float, hedge_max: int = 2, pool=None):
+    stats = HedgeStats()
+    targets = [(url, stream.open) for url, stream in streams.items()]
+    chunks = list(hedged_stream(targets, delay, hedge_max, stats, pool))
+    text = "".join(c.choices[0].delta.content or "" for c in chunks)
+    return text, stats
+
+
+def test_has_token():
+    assert not has_token(_chunk())
+    assert not has_token(SimpleNamespace(choices=[]))
+    assert has_token(_chunk("x"))
+
+
+def test_fast_first_endpoint_is_never_hedged():
+    fast, backup = _Stream(0, ["Hi", "!"]), _Stream(0, ["no"])
+    text, stats = _race({A: fast, B: backup}, delay=1.0)
+    assert text == "Hi!"
+    assert not backup.opened
+    assert (stats.races, stats.hedged, stats.primary_wins) == (1, 0, 1)
+    assert stats.wasted_requests == 0
+
+
+def test_slow_first_endpoint_loses_to_a_backup():
+    slow, fast = _Stream(5, ["late"]), _Stream(0, ["Hello"])
+    start = time.perf_counter()
+    text, stats = _race({A: slow, B: fast}, delay=0.05)
+    assert time.perf_counter() - start < 2
+    assert text == "Hello"
+    assert slow.closed.is_set()  # Cancelled
+    assert (stats.hedged, stats.primary_wins, stats.backup_wins) == (1, 0, 1)
+    assert stats.wasted_requests == 1 and stats.wasted_chunks == 1
+    assert stats.wasted_seconds > 0
+    assert len(stats.ttfts) == 1 and stats.percentile(0.95) == stats.ttfts[0]
+
+
+def test_hedge_max_limits_concurrent_racers():
+    slow = {url: _Stream(0.5, [url[-4]]) for url in (A, B, C)}
+    text, _ = _race(slow, delay=0.01, hedge_max=2)
+    assert not slow[C].opened
+    assert text in ("a", "b")
+
+
+def test_failed_endpoint_fails_over_without_waiting():
+    refused = openai.APIConnectionError(
+        request=httpx.Request("POST", "http://a/v1/chat/completions")
+    )
+    pool = EndpointPool([A, B])
+    start = time.perf_counter()
+    text, stats = _race(
+        {A: _Stream(0, [], error=refused), B: _Stream(0, ["ok"])}, 30, pool=pool
+    )
+    assert time.perf_counter() - start < 2
+    assert text == "ok" and stats.backup_wins == 1 and stats.hedged == 0
+    assert not pool.stats[A].healthy and pool.stats[B].healthy
+    assert pool.stats[B].ttft is not None
+    assert all(s.in_flight == 0 for s in pool.stats.values())
+
+
+def test_all_endpoints_failing_raises():
+    refused = openai.APIConnectionError(
+        request=httpx.Request("POST", "http://a/v1/chat/completions")
+    )
+    streams = {A: _Stream(0, [], error=refused), B: _Stream(0, [], error=refused)}
+    with pytest.raises(openai.APIConnectionError):
+        _race(streams, 30)
+
+
+def test_fatal_errors_are_not_raced():
+    bad = ValueError("bad request")
+    backup = _Stream(0, ["no"])
+    with pytest.raises(ValueError):
+        _race({A: _Stream(0, [], error=bad), B: backup}, 30)
+    assert not backup.opened
@@ -0,0 +1,77 @@
+"""
+Tests history replay: worker processes must print exactly what rendering in place does, in order.
+"""
+
+import io
+
+from rich.console import Console
+
+from localsage import history_render
+from localsage.history_render import replay_history
+from tools._fixtures import build_payload
+
+
+def _console() -> Console:
+    return Console(
+        file=io.StringIO(), force_terminal=True, color_system="truecolor", width=90
+    )
+
+
+def _history(turns: int) -> list[dict]:
+    history = [{"role": "system", "content": "Be brief."}]
+    for i in range(turns):
+        history.append(
+            {"role": "user", "content": f"Question {i} about [bold]x[/bold]"}
+        )
+        history.append(
+            {"role": "assistant", "content": build_payload("mixed", 1500, i)}
+        )
+    history.append({"role": "assistant", "content": "   "})  # Skipped, no content
+    return history
+
+
+def _replay(history: list[dict], **kwargs) -> str:
+    console = _console()
+    replay_history(history, console, "monokai", **kwargs)
+    return console.file.getvalue()  # pyright: ignore
+
+
+def test_workers_print_what_rendering_in_place_does():
+    history = _history(12)
+    serial = _replay(history, workers=1)
+    assert "Question 11" in serial and "\x1b[" in serial
+    assert _replay(history, workers=3) == serial
+
+
+def test_short_histories_render_in_place(monkeypatch):
+    monkeypatch.setattr(history_render.os, "cpu_count", lambda: 8)
+    messages = history_render.history_messages(_history(2))
+    assert [role for role, _ in messages] == ["user", "assistant"] * 2
+    assert history_render.replay_workers(messages) == 1
+    long = [("assistant", "x" * history_render.PARALLEL_MIN_CHARS)] * 3
+    assert history_render.replay_workers(long) == 3
+
+
+def test_batches_keep_the_order():
+    messages = [("assistant", str(i) * (i + 1)) for i in range(30)]
+    indexes = list(range(0, 30, 2))
+    batches = history_render._batches(indexes, messages, 6)
+    assert [i for batch in batches for i in batch] == indexes
+    assert 4 <= len(batches) <= 7
+
+
+def test_failed_workers_fall_back_to_rendering_in_place(monkeypatch):
+    class Broken:
+        def map(self, fn, batches, *args):
+            yield fn(next(iter(batches)), *(next(arg) for arg in args))
+            raise OSError("worker died")
+
+        def shutdown(self, **kwargs):
+            pass
+
+    history = _history(6)
+    serial = _replay(history, workers=1)
+    monkeypatch.setattr(
+        history_render, "worker_pool", lambda workers, initializer=None: Broken()
+    )
+    assert _replay(history, workers=4) == serial
@@ -0,0 +1,87 @@
+"""
+Tests html_cleaner.py, the streaming pre-cleaner and page extraction used by !web.
+"""
+
+import re
+import time
+
+import pytest
+
+from localsage.html_cleaner import clean_html, extract_text
+from localsage.workers import worker_pool
+
+pytest.importorskip("lxml")
+
+
+def text_of(html: str) -> str:
+    """Visible text, whitespace-normalized"""
+    from lxml import etree
+
+    tree = etree.HTML(html)
+    return " ".join(" ".join(tree.itertext()).split()) if tree is not None else ""
+
+
+def test_drops_noise_elements_and_comments():
+    page = (
+        "<html><head><style>p{color:red}</style><script>var a = 1;</script></head>"
+        "<body><!-- nav --><p>Keep me</p><svg><path d='M0'/><text>icon</text></svg>"
+        "<form><input name=q><button>Search</button></form>"
+        "<noscript>Enable JS</noscript><iframe src=ad></iframe><p>And me</p></body></html>"
+    )
+    cleaned = clean_html(page)
+    assert text_of(cleaned) == "Keep me And me"
+    assert "<!--" not in cleaned and "<script" not in cleaned
+
+
+def test_keeps_markup_and_escapes():
+    cleaned = clean_html(
+        '<p class="x">a &amp; b &lt;tag&gt;<br>c <a href="/q?a=1&amp;b=2">link</a></p>'
+    )
+    assert '<p class="x">a &amp; b &lt;tag&gt;<br>c ' in cleaned
+    assert '<a href="/q?a=1&amp;b=2">link</a>' in cleaned
+    assert "</br>" not in cleaned
+
+
+def test_script_text_is_not_parsed_as_markup():
+    cleaned = clean_html('<script>document.write("</form><p>x")</script><p>real</p>')
+    assert text_of(cleaned) == "real"
+
+
+def test_nested_svg_is_dropped_whole():
+    cleaned = clean_html("<svg><svg><g/></svg><text>inner</text></svg><p>after</p>")
+    assert text_of(cleaned) == "after"
+
+
+def test_matches_regex_scrubbing_on_well_formed_pages():
+    tags = r"<(script|style|svg|noscript|iframe|form)\b[^>]*>([\s\S]*?)<\/\1>"
+    page = "".join(
+        f"<div><h2>Section {i}</h2><!-- x --><p>Body {i} &amp; more.</p>"
+        f"<script>track({i})</script><svg><use href='#i{i}'/></svg></div>"
+        for i in range(200)
+    )
+    legacy = re.sub(r"<!--[\s\S]*?-->", "", re.sub(tags, "", page, flags=re.I))
+    assert text_of(clean_html(page)) == text_of(legacy)
+
+
+def test_unclosed_noise_tags_stay_linear():
+    # The old backreference regexes rescanned the whole page for every unclosed tag
+    page = "<p>start</p>" + "<iframe src=x>" * 5000 + "<p>text</p>" * 20000
+    start = time.perf_counter()
+    clean_html(page)
+    assert time.perf_counter() - start < 2.0
+
+
+def test_empty_input():
+    assert clean_html("") == ""
+    assert clean_html("   \n") == ""
+
+
+def test_extraction_runs_in_a_fresh_worker():
+    page = b"<html><body><script>x()</script><p>Readable text here.</p></body></html>"
+    with worker_pool(1) as pool:
+        text = pool.submit(extract_text, page, True).result(timeout=60)
+        assert "Readable text here." in text and "x()" not in text
+        assert (
+            pool.submit(extract_text, b"# Raw notes", False).result() == "# Raw notes"
+        )
+        assert pool._mp_context.get_start_method() != "fork"  # pyright: ignore
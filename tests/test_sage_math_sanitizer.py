@@ -4,9 +4,14 @@ Tests sage_math_sanitizer.py in it's entirety.
 Focuses on core functionality, quirks, and odd output combinations.
 """
 
+import functools
+import random
+
 import pytest
 
+from localsage import math_sanitizer
 from localsage.math_sanitizer import sanitize_math_safe
+from tools._fixtures import build_payload, fuzz_text, legacy_sanitize
 
 # 1. Normalization & Pre-filtering Tests
 
@@ -172,3 +177,202 @@ Orphan command: \\frac{1}{2}
     assert "a → b" in result  # Math converted
     assert "---" in result  # Separator preserved
     assert "1/2" in result  # Orphan converted
+
+
+# 7. Fast Path (must match pylatexenc exactly)
+
+
+def _fragment(rng: random.Random, depth: int = 0) -> str:
+    """Builds a random fragment from table commands, arguments, groups and plain text"""
+    parts = []
+    for _ in range(rng.randint(1, 6)):
+        roll = rng.random()
+        if roll < 0.35:
+            spacing = rng.choice(["", " ", "  ", "\n", "\n\n", "{}", "é"])
+            parts.append(
+                "\\" + rng.choice(list(math_sanitizer._FAST_SYMBOLS)) + spacing
+            )
+        elif roll < 0.65 or depth > 2:
+            parts.append(rng.choice("xy2+-=^_ \t\n()<',.!?*/|[]é;:"))
+        elif roll < 0.75:
+            parts.append("{" + _fragment(rng, depth + 1) + "}")
+        elif roll < 0.85:
+            num, den = _fragment(rng, depth + 1), _fragment(rng, depth + 1)
+            parts.append(f"\\frac{{{num}}}{rng.choice(['', ' ', chr(10)])}{{{den}}}")
+        else:
+            command = rng.choice(["sqrt", *sorted(math_sanitizer._FAST_TEXT)])
+            parts.append(
+                f"\\{command}{rng.choice(['', ' '])}{{{_fragment(rng, depth + 1)}}}"
+            )
+    return "".join(parts)
+
+
+def test_fast_symbols_match_pylatexenc():
+    """Every table entry, in the contexts that change how pylatexenc reads it."""
+    full = math_sanitizer.load_latex()
+    for name in math_sanitizer._FAST_SYMBOLS:
+        for fragment in (
+            f"\\{name}",
+            f"a\\{name} b",
+            f"{{\\{name}}}^2",
+            f"\\{name}{{}}x",
+        ):
+            assert math_sanitizer._fast_latex(fragment) == full(fragment), fragment
+
+
+def test_fast_path_matches_pylatexenc():
+    """Seeded differential run, every fragment the fast path accepts must agree."""
+    full = math_sanitizer.load_latex()
+    rng = random.Random(45)
+    accepted = 0
+    for _ in range(3000):
+        fragment = _fragment(rng)
+        fast = math_sanitizer._fast_latex(fragment)
+        if fast is not None:
+            accepted += 1
+            assert fast == full(fragment), repr(fragment)
+    assert accepted > 500  # The generator must keep exercising the fast path
+
+
+@pytest.mark.parametrize(
+    "fragment",
+    [
+        "\\sqrt[3]{x}",  # Optional argument
+        "\\frac12",  # Unbraced arguments
+        "\\frac{a}",  # Missing argument
+        "\\mathbb{R}",  # Styled letters
+        "\\neg p",  # Not in the table
+        "\\alpha\\\\ b",  # Line break
+        "a -- b",  # Ligature
+        "''x''",  # Ligature
+        "a & b",  # Alignment
+        "50% off",  # Comment
+        "a~b",  # Tie
+        "{a",  # Unbalanced
+        "a}",
+        "\\alpha\n\n\\beta",  # Paragraph break after a command
+        "\\",
+    ],
+)
+def test_fast_path_bails(fragment):
+    assert math_sanitizer._fast_latex(fragment) is None
+
+
+def test_fast_path_never_builds_the_parser(monkeypatch):
+    """Common fragments convert without pylatexenc, anything else still reaches it."""
+
+    def unavailable():
+        raise RuntimeError("pylatexenc was needed")
+
+    math_sanitizer._convert_safe.cache_clear()
+    monkeypatch.setattr(math_sanitizer, "_L2T", None)
+    monkeypatch.setattr(math_sanitizer, "load_latex", unavailable)
+    text = "$\\alpha \\leq \\frac{1}{2}$ and \\sqrt{2\\pi}"
+    assert sanitize_math_safe(text) == "α≤1/2 and √(2π)"
+    assert (
+        sanitize_math_safe("$\\mathbb{R}$") == "\\mathbb{R}"
+    )  # Fallback returns the fragment
+    math_sanitizer._convert_safe.cache_clear()  # Drop the fallback result
+
+
+# 8. Fragment Cache
+
+
+def test_fragments_are_converted_once():
+    """Redrawing the same text, or a longer prefix of it, reuses converted fragments."""
+    math_sanitizer._convert_safe.cache_clear()
+    text = "Let $\\alpha$ and $\\frac{1}{2}$ then \\(x \\leq y\\)"
+    first = sanitize_math_safe(text)
+    assert math_sanitizer.fragment_cache_stats()["misses"] == 3
+    assert sanitize_math_safe(text) == first
+    assert sanitize_math_safe(text + " and $\\beta$").startswith(first)
+    stats = math_sanitizer.fragment_cache_stats()
+    assert stats["hits"] == 6 and stats["misses"] == 4 and stats["size"] == 4
+    assert stats["hit_rate"] == 0.6
+
+
+# 9. Single-Pass Scanner
+
+UNITS = [
+    "Let $x$ be real.",
+    "The price is $5 and $10.",
+    "Run `echo $HOME` first.",
+    "```bash\necho $PATH\nls\n```",
+    "---",
+    "***",
+    "$$\n\\sum_{k=1}^{n} k = \\frac{n(n+1)}{2}\n$$",
+    "\\[\n\\int_0^1 x^2 \\, dx = \\frac{1}{3}\n\\]",
+    "Inline \\(a^2 + b^2 = c^2\\) holds.",
+    "So \\alpha \\to \\beta and p \\implies q.",
+    "Use \\frac{1}{2} or \\sqrt{x}.",
+    "We have $\\mathbb{R}^n$ and $\\left(x\\right)$.",
+    "Set `a_b` and `x^2`.",
+    "$\\text{rate} = \\frac{\\Delta y}{\\Delta x}$",
+    "Tom &amp; Jerry &lt;3",
+    "“Quoted” text’s fine…",
+    "- item $x_1$\n- item $x_2$",
+    "| a | $b$ |\n|---|---|\n| 1 | $\\pi$ |",
+    "> quote with \\(\\epsilon\\)",
+    "See $f(x) = x^2$, e.g. `f(2)`.",
+    "**Bold** and _italic_ with $a_i$",
+]
+
+
+@pytest.fixture
+def legacy():
+    """The multi-pass pipeline, minus its placeholder bug."""
+    return functools.partial(legacy_sanitize, placeholder="fixed")
+
+
+def test_scanner_matches_the_pipeline_while_streaming(legacy):
+    for kind in ("plain", "markdown", "code", "latex", "mixed"):
+        text = build_payload(kind, 3000, seed=47)
+        for end in range(1, len(text) + 1, 5):
+            assert sanitize_math_safe(text[:end]) == legacy(text[:end]), (kind, end)
+
+
+def test_scanner_matches_the_pipeline_on_mixed_replies(legacy):
+    rng = random.Random(47)
+    for _ in range(150):
+        units = rng.choices(UNITS, k=rng.randint(2, 10))
+        text = "".join(unit + rng.choice([" ", "\n", "\n\n"]) for unit in units)
+        for end in range(1, len(text) + 1, 7):
+            assert sanitize_math_safe(text[:end]) == legacy(text[:end]), text[:end]
+
+
+def test_currency_before_inline_code_is_kept():
+    text = "It costs $5, run `make`"
+    assert sanitize_math_safe(text) == text
+    assert legacy_sanitize(text) == "It costs 5, run `make`"
+
+
+# Where the scanner and the old pipeline part ways: (text, scanner, old pipeline)
+DIVERGENCES = [
+    # Code inside math is kept verbatim, the old placeholders leaked out
+    ("$`2`2$", "`2`2", "CODEBLOCK02"),
+    ("$`_`2$", "`_`2", "CODEBLOCK02"),
+    ("\\\\(``````\\)", "\\``````", "0"),
+    ("``````$``````\\`$`$", "`````````````$`", "````````````{`$`"),
+    # Empty $$ runs are dropped whole
+    ("$$$$$$\\($\\)$", "", "\\("),
+    # Whitespace after a dropped $ stays
+    ("``````$$`\n`\n$", "```````\n`\n", "```````\n`"),
+    ("$`$`$$$`$` $", "`$``$` ", "`$``$`"),
+]
+
+
+@pytest.mark.parametrize("text, scanner, pipeline", DIVERGENCES)
+def test_known_divergences_from_the_pipeline(text, scanner, pipeline, legacy):
+    assert sanitize_math_safe(text) == scanner
+    assert legacy(text) == pipeline
+
+
+# 10. Broken Markup
+
+
+def test_fuzzed_streams_never_raise():
+    """Every prefix a stream renders sanitizes, however broken the markup."""
+    for case in range(100):
+        text = fuzz_text(case, 240)
+        for end in range(1, len(text) + 1, 3):
+            assert isinstance(sanitize_math_safe(text[:end]), str)
@@ -0,0 +1,90 @@
+"""
+Tests Chat end to end against the bundled mock server: reasoning fields, dropped streams and refusals.
+
+Output goes to an in-memory terminal, so the full rendering path runs.
+"""
+
+import io
+
+import pytest
+from openai import OpenAI
+from rich.console import Console
+
+from localsage import sage, ui
+from localsage.client_registry import ClientRegistry
+from localsage.config import Config
+from localsage.file_manager import FileManager
+from localsage.session_manager import SessionManager
+from tools._fixtures import build_payload
+from tools.mock_server import MockOptions, MockServer
+
+
+@pytest.fixture
+def chat_for(monkeypatch):
+    console = Console(file=io.StringIO(), force_terminal=True, width=100, height=30)
+    for module in (sage, ui):
+        monkeypatch.setattr(module, "CONSOLE", console)
+    servers = []
+
+    def build(options: MockOptions) -> tuple[sage.Chat, MockServer]:
+        server = MockServer(options).start()
+        servers.append(server)
+        config = Config()
+        config.models[0].update(endpoint=server.url, tokenizer="estimate")
+        config.retry_backoff = 0.01
+        config.reasoning_panel_consume = False
+        session = SessionManager(config)
+        interface = ui.UIConstructor(config, session)
+        panel = ui.GlobalPanels(session, config, interface)
+        api = sage.API(config, session, ClientRegistry())
+        chat = sage.Chat(config, session, FileManager(session), interface, panel, api)
+        session.append_message("user", "Hello")
+        return chat, server
+
+    yield build
+    for server in servers:
+        server.stop()
+
+
+def test_payloads_are_deterministic():
+    for kind in ("plain", "markdown", "code", "latex", "mixed"):
+        text = build_payload(kind, 500, seed=3)
+        assert len(text) == 500 and text == build_payload(kind, 500, seed=3)
+    assert "$$" in build_payload("latex", 500) and "```" in build_payload("code", 500)
+
+
+@pytest.mark.parametrize("field", ["reasoning_content", "reasoning", "thinking"])
+def test_stream_with_reasoning(chat_for, field):
+    chat, server = chat_for(
+        MockOptions(tokens=120, reasoning=20, reasoning_field=field)
+    )
+    chat.stream_response()
+    assert chat.state.full_response_content == server.text
+    assert len(chat.state.full_reasoning_content) == 20 * 4
+    assert chat.session.history[-1]["content"].endswith(server.text.strip())  # pyright: ignore
+
+
+def test_dropped_stream_is_resumed(chat_for):
+    chat, server = chat_for(
+        MockOptions(tokens=300, drop_rate=0.5, drop_after=40, seed=9)
+    )
+    chat.stream_response()
+    assert server.stats["dropped"] == 1 and server.stats["requests"] == 2
+    assert chat.state.full_response_content == server.text
+
+
+def test_refused_requests_are_retried(chat_for):
+    chat, server = chat_for(MockOptions(tokens=50, fail_rate=0.5, seed=1))
+    chat.stream_response()
+    assert server.stats["refused"] >= 1
+    assert chat.state.full_response_content == server.text
+
+
+def test_side_routes():
+    with MockServer(MockOptions(context_length=4096)) as server:
+        client = OpenAI(base_url=server.url, api_key="k", max_retries=0)
+        assert client.models.list().data[0].id == "mock"
+        vectors = client.embeddings.create(model="m", input=["a b", "a b", "c"]).data
+        assert vectors[0].embedding == vectors[1].embedding != vectors[2].embedding
+        reply = client.chat.completions.create(model="mock", messages=[])
+        assert reply.choices[0].message.content == server.text
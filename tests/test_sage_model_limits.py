@@ -0,0 +1,196 @@
+"""
+Tests model limit discovery: parsing server metadata, the per-endpoint cache and the effective context.
+
+Discovery runs against stand-in llama.cpp and vLLM servers on localhost.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from localsage import config as config_module
+from localsage.config import Config
+from localsage.model_limits import (
+    LimitsCache,
+    ModelLimits,
+    discover,
+    parse_models,
+    parse_props,
+    server_root,
+)
+
+LLAMA_PROPS = {
+    "default_generation_settings": {"n_ctx": 32768, "params": {"n_predict": -1}},
+    "model_path": "/models/Qwen3-8B-Q4_K_M.gguf",
+    "total_slots": 1,
+}
+LLAMA_MODELS = {
+    "object": "list",
+    "data": [{"id": "qwen3", "meta": {"n_ctx_train": 40960, "n_vocab": 151936}}],
+}
+VLLM_MODELS = {
+    "object": "list",
+    "data": [
+        {"id": "other", "max_model_len": 4096},
+        {"id": "served", "root": "Qwen/Qwen3-8B", "max_model_len": 16384},
+    ],
+}
+
+# 1. Parsing
+
+
+def test_server_root():
+    assert server_root("http://host:8080/v1") == "http://host:8080"
+    assert server_root("http://host:8080/v1/") == "http://host:8080"
+    assert server_root("http://host/api") == "http://host/api"
+
+
+def test_parse_props_prefers_the_running_context():
+    limits = parse_props(LLAMA_PROPS)
+    assert limits.context_length == 32768 and limits.source == "props"
+    assert limits.max_output is None  # n_predict -1 means unlimited
+    assert limits.tokenizer == "/models/Qwen3-8B-Q4_K_M.gguf"
+
+
+def test_parse_models_variants():
+    llama = parse_models(LLAMA_MODELS, "qwen3")
+    assert llama.context_length == 40960 and llama.tokenizer == "qwen3"
+    # Another model's entry is never used
+    assert parse_models(LLAMA_MODELS, "anything").context_length is None
+    vllm = parse_models(VLLM_MODELS, "served")
+    assert vllm.context_length == 16384 and vllm.tokenizer == "Qwen/Qwen3-8B"
+    router = parse_models(
+        {
+            "data": [
+                {
+                    "id": "org/model",
+                    "context_length": 200000,
+                    "top_provider": {"max_completion_tokens": 8192},
+                }
+            ]
+        },
+        "org/model",
+    )
+    assert router.context_length == 200000 and router.max_output == 8192
+    assert parse_models({"data": []}, "m").context_length is None
+
+
+# 2. Discovery
+
+
+def _server(routes: dict):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = routes.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(routes: dict) -> str:
+        server = _server(routes)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_discover_llama_cpp(serve):
+    url = serve({"/props": LLAMA_PROPS, "/v1/models": LLAMA_MODELS})
+    with httpx.Client() as http:
+        limits = discover(url, "qwen3", "k", http)
+    # /props wins over the trained context from /v1/models
+    assert limits.context_length == 32768 and limits.source == "props"
+    assert limits.tokenizer == "/models/Qwen3-8B-Q4_K_M.gguf"
+
+
+def test_discover_without_props(serve):
+    url = serve({"/v1/models": VLLM_MODELS})
+    with httpx.Client() as http:
+        limits = discover(url, "served", "k", http)
+    assert limits.context_length == 16384 and limits.source == "models"
+
+
+def test_discover_unreachable():
+    with httpx.Client() as http:
+        limits = discover("http://127.0.0.1:9/v1", "m", "k", http)
+    assert limits.context_length is None and limits.tokenizer is None
+
+
+# 3. Cache & config
+
+
+def test_cache_ttl_and_persistence(tmp_path):
+    path = str(tmp_path / "limits.json")
+    cache = LimitsCache(path, ttl=60)
+    cache.put("http://a/v1/", "m", ModelLimits(context_length=8192, source="props"))
+    reloaded = LimitsCache(path, ttl=60)
+    assert reloaded.get("http://a/v1", "m").context_length == 8192  # pyright: ignore
+    assert reloaded.get("http://a/v1", "other") is None
+    reloaded.entries[LimitsCache.key("http://a/v1", "m")]["fetched"] = time.time() - 61
+    assert reloaded.get("http://a/v1", "m") is None
+
+
+def test_effective_context_and_runtime_state_is_not_saved(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_module, "CONFIG_FILE", str(tmp_path / "settings.json"))
+    config = Config()
+    config.context_length = 100000
+    assert config.effective_context == 100000
+    config.set_limits(ModelLimits(context_length=32768, source="props"))
+    assert config.effective_context == 32768
+    config.auto_context = False
+    assert config.effective_context == 100000
+    config.save()
+    saved = json.loads((tmp_path / "settings.json").read_text())
+    assert "_limits" not in saved and saved["auto_context"] is False
+
+
+def test_older_configs_keep_their_context_length(tmp_path, monkeypatch):
+    path = tmp_path / "settings.json"
+    monkeypatch.setattr(config_module, "CONFIG_FILE", str(path))
+    path.write_text(json.dumps({"context_length": 8192}))
+    config = Config()
+    config.load()
+    config.set_limits(ModelLimits(context_length=32768, source="props"))
+    assert config.auto_context is False and config.effective_context == 8192
+
+    path.unlink()
+    config = Config()
+    config.load()
+    config.set_limits(ModelLimits(context_length=32768, source="props"))
+    assert config.auto_context is True and config.effective_context == 32768
+
+
+def test_the_reply_is_reserved_from_the_prompt_limit():
+    config = Config()
+    config.context_length = 100000
+    assert config.prompt_limit == 95000
+    config.set_limits(ModelLimits(context_length=100000, max_output=20000))
+    assert config.prompt_limit == 76000
+    # A reply as long as the window reserves half of it
+    config.set_limits(ModelLimits(context_length=100000, max_output=100000))
+    assert config.prompt_limit == 47500
@@ -0,0 +1,132 @@
+"""
+Tests the rendered history cache: unchanged messages are never rendered twice, and cached output is identical.
+
+The disk cache runs in a temp dir.
+"""
+
+import io
+import os
+from importlib.metadata import version
+
+from rich.console import Console
+
+from localsage import __version__, history_render, render_cache
+from localsage.history_render import replay_history
+from localsage.render_cache import RenderCache, render_key
+from tools._fixtures import build_payload
+
+# 1. RenderCache
+
+
+def test_keys_change_with_everything_the_output_depends_on():
+    key = render_key("assistant", "Hi", 90, "monokai", "truecolor", True)
+    assert key == render_key("assistant", "Hi", 90, "monokai", "truecolor", True)
+    assert (
+        len(
+            {
+                key,
+                render_key("user", "Hi", 90, "monokai", "truecolor", True),
+                render_key("assistant", "Hi!", 90, "monokai", "truecolor", True),
+                render_key("assistant", "Hi", 91, "monokai", "truecolor", True),
+                render_key("assistant", "Hi", 90, "dracula", "truecolor", True),
+                render_key("assistant", "Hi", 90, "monokai", "256", True),
+                render_key("assistant", "Hi", 90, "monokai", "truecolor", False),
+            }
+        )
+        == 7
+    )
+
+
+def test_keys_change_when_localsage_or_rich_is_upgraded(monkeypatch):
+    assert render_cache.renderer_version() == (
+        f"localsage {__version__}, rich {version('rich')}"
+    )
+    key = render_key("assistant", "Hi", 90, "monokai", "truecolor", True)
+    monkeypatch.setattr(render_cache, "renderer_version", lambda: "localsage 9.9.9")
+    assert key != render_key("assistant", "Hi", 90, "monokai", "truecolor", True)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+    assert cache.size == 8
+    cache.put("huge", "x" * 11)
+    assert cache.get("huge") is None and cache.size == 8
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 2
+
+
+def test_disk_entries_survive_a_restart_and_are_capped(tmp_path):
+    cache = RenderCache(directory=str(tmp_path), max_disk_bytes=10)
+    cache.put("a", "\x1b[1maa\r\n")
+    assert RenderCache(directory=str(tmp_path)).get("a") == "\x1b[1maa\r\n"
+    cache.put("b", "bbbbbbb")
+    assert sorted(os.listdir(tmp_path)) == ["b.ansi"]
+    assert RenderCache(directory=str(tmp_path)).get("a") is None
+
+
+# 2. Cached replay
+
+
+def _replay(history: list[dict], cache=None, width: int = 90, theme="monokai") -> str:
+    console = Console(
+        file=io.StringIO(), force_terminal=True, color_system="truecolor", width=width
+    )
+    replay_history(history, console, theme, workers=1, cache=cache)
+    return console.file.getvalue()  # pyright: ignore
+
+
+def _history(turns: int) -> list[dict]:
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i}"})
+        history.append({"role": "assistant", "content": build_payload("mixed", 800, i)})
+    return history
+
+
+def _count_renders(monkeypatch) -> list[int]:
+    rendered = []
+    render_batch = history_render.render_batch
+
+    def counting(messages, *args):
+        rendered.append(len(messages))
+        return render_batch(messages, *args)
+
+    monkeypatch.setattr(history_render, "render_batch", counting)
+    return rendered
+
+
+def test_unchanged_messages_are_never_rendered_twice(monkeypatch):
+    history, cache = _history(4), RenderCache()
+    uncached = _replay(history)
+    rendered = _count_renders(monkeypatch)
+    assert _replay(history, cache) == uncached
+    assert sum(rendered) == 8
+    assert _replay(history, cache) == uncached
+    assert sum(rendered) == 8 and cache.stats()["hits"] == 8
+
+    history[3]["content"] += " Edited."
+    history.append({"role": "user", "content": "One more"})
+    _replay(history, cache)
+    assert sum(rendered) == 10
+
+
+def test_width_and_theme_changes_render_again(monkeypatch):
+    history, cache = _history(2), RenderCache()
+    _replay(history, cache)
+    rendered = _count_renders(monkeypatch)
+    assert _replay(history, cache, width=60) == _replay(history, width=60)
+    assert _replay(history, cache, theme="dracula") == _replay(history, theme="dracula")
+    assert sum(rendered) == 4 * 4
+
+
+def test_disk_cache_replays_identically_after_a_restart(tmp_path, monkeypatch):
+    history = _history(3)
+    expected = _replay(history, RenderCache(directory=str(tmp_path)))
+    rendered = _count_renders(monkeypatch)
+    assert _replay(history, RenderCache(directory=str(tmp_path))) == expected
+    assert rendered == []
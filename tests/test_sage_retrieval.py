@@ -0,0 +1,255 @@
+"""
+Tests retrieval.py chunking, the BM25 index and the semantic vector index.
+
+The semantic tests run against a stand-in embeddings server on localhost.
+"""
+
+import base64
+import json
+import os
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import ClassVar
+
+import pytest
+
+from localsage import session_manager
+from localsage.config import Config
+from localsage.retrieval import chunk_text, format_context, tokenize
+from localsage.session_manager import SessionManager
+
+np = pytest.importorskip("numpy")
+
+from localsage.file_manager import FileManager  # noqa: E402
+from localsage.retrieval import BM25Index, VectorIndex  # noqa: E402
+
+# 1. Chunking & tokenizing
+
+
+def test_chunks_are_line_aligned_and_bounded():
+    text = "".join(f"line number {i}\n" for i in range(1000))
+    chunks = chunk_text(text, size=300)
+    assert len(chunks) > 1
+    assert all(len(c) <= 300 for c in chunks)
+    assert all(c.endswith("\n") for c in chunks)
+
+
+def test_chunks_overlap_and_cover_everything():
+    text = "".join(f"line number {i}\n" for i in range(1000))
+    chunks = chunk_text(text, size=300)
+    assert "line number 999\n" in chunks[-1]
+    # The tail of one chunk is repeated at the start of the next
+    last_line = chunks[0].splitlines(keepends=True)[-1]
+    assert last_line in chunks[1]
+    assert not chunks[0].startswith(chunks[1][:50])
+
+
+def test_huge_lines_are_split():
+    chunks = chunk_text("x" * 1000, size=300)
+    assert "".join(chunks) == "x" * 1000
+
+
+def test_tokenize_splits_snake_case():
+    assert tokenize("Call process_file()") == [
+        "call",
+        "process_file",
+        "process",
+        "file",
+    ]
+
+
+# 2. BM25
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = BM25Index(directory=str(tmp_path))
+    idx.add("cats.md", "Cats purr and sleep all day.\n" * 3)
+    idx.add("dogs.md", "Dogs bark at the mailman.\n" * 3)
+    idx.add("birds.md", "Birds sing in the morning. Some birds bark? No.\n")
+    return idx
+
+
+def test_search_ranks_relevant_chunks_first(index):
+    hits = index.search("why do dogs bark", k=2)
+    assert hits[0][1]["source"] == "dogs.md"
+    assert hits[0][0] >= hits[-1][0]
+    assert index.search("submarine") == []
+
+
+def test_add_replaces_existing_source(index):
+    index.add("dogs.md", "Dogs fetch sticks.\n")
+    assert index.sources() == ["cats.md", "birds.md", "dogs.md"]
+    assert index.search("mailman") == []
+    assert index.search("sticks")[0][1]["source"] == "dogs.md"
+
+
+def test_index_persists(index, tmp_path):
+    index.save()
+    reloaded = BM25Index(directory=str(tmp_path))
+    assert reloaded.sources() == index.sources()
+    assert reloaded.search("purr")[0][1]["source"] == "cats.md"
+
+
+def test_format_context_respects_budget(index):
+    hits = index.search("dogs cats birds", k=3)
+    encode = len  # One token per character keeps the arithmetic obvious
+    full = format_context(hits, 10_000, encode)
+    assert full.startswith("[RETRIEVED CONTEXT]") and "dogs.md" in full
+    small = format_context(hits, 40, encode)
+    assert small.count("Source:") < full.count("Source:")
+    assert format_context(hits, 1, encode) == ""
+
+
+# 3. Semantic
+
+DIM = 64
+
+
+class EmbeddingsHandler(BaseHTTPRequestHandler):
+    """Stand-in /v1/embeddings endpoint. Hashes words into a small bag-of-words vector."""
+
+    inputs: ClassVar[list[str]] = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        type(self).inputs.extend(texts)
+        data = []
+        for i, text in enumerate(texts):
+            vec = np.zeros(DIM, dtype=np.float32)
+            for word in tokenize(text):
+                vec[zlib.crc32(word.encode()) % DIM] += 1.0
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vec.tobytes()).decode()
+            else:
+                embedding = vec.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        payload = json.dumps(
+            {"object": "list", "data": data, "model": body["model"], "usage": {}}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def embed():
+    from openai import OpenAI
+
+    server = HTTPServer(("127.0.0.1", 0), EmbeddingsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="x"
+    )
+
+    def _embed(texts):
+        response = client.embeddings.create(model="stand-in", input=texts)
+        return [d.embedding for d in response.data]
+
+    yield _embed
+    server.shutdown()
+
+
+@pytest.fixture
+def vectors(tmp_path, embed):
+    EmbeddingsHandler.inputs.clear()
+    idx = VectorIndex(embed, "stand-in", directory=str(tmp_path))
+    idx.add("cats.md", "Cats purr and sleep all day.\n")
+    idx.add("dogs.md", "Dogs bark at the mailman.\n")
+    return idx
+
+
+def test_semantic_search_ranks_by_similarity(vectors):
+    hits = vectors.search("the dogs bark", k=1)
+    assert len(hits) == 1
+    assert hits[0][1]["source"] == "dogs.md"
+
+
+def test_unchanged_chunks_are_not_re_embedded(vectors):
+    before = len(EmbeddingsHandler.inputs)
+    vectors.add("dogs.md", "Dogs bark at the mailman.\n")
+    vectors.add("copy.md", "Cats purr and sleep all day.\n")
+    assert len(EmbeddingsHandler.inputs) == before
+
+
+def test_a_failed_embedding_keeps_the_previous_version(vectors):
+    embed = vectors.embed
+
+    def down(texts):
+        raise ConnectionError("embeddings endpoint is down")
+
+    vectors.embed = down
+    with pytest.raises(ConnectionError):
+        vectors.add("dogs.md", "Dogs fetch sticks in the park.\n")
+    vectors.embed = embed
+    assert vectors.sources() == ["cats.md", "dogs.md"]
+    assert vectors.search("mailman", k=1)[0][1]["source"] == "dogs.md"
+
+
+def test_vectors_persist_and_grow(vectors, tmp_path, embed):
+    text = "".join(f"fact number {i} about topic{i}\n" for i in range(3000))
+    vectors.add("facts.txt", text)
+    vectors.save()
+    reloaded = VectorIndex(embed, "stand-in", directory=str(tmp_path))
+    assert reloaded.sources() == ["cats.md", "dogs.md", "facts.txt"]
+    assert reloaded.search("purr sleep", k=1)[0][1]["source"] == "cats.md"
+    # A different embedding model starts from scratch
+    assert VectorIndex(embed, "other", directory=str(tmp_path)).sources() == []
+
+
+def test_save_compacts_unreferenced_vectors(vectors):
+    vectors.add("big.txt", "".join(f"line {i}\n" for i in range(2000)))
+    vectors.remove("big.txt")
+    vectors.save()
+    assert vectors.count == 2
+    assert vectors.search("mailman", k=1)[0][1]["source"] == "dogs.md"
+
+
+# 4. Sessions
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "INDEX_DIR", str(tmp_path / "index"))
+    config = Config()
+    config.retrieval_mode = "bm25"
+    config.models[0]["tokenizer"] = "estimate"
+    return SessionManager(config)
+
+
+def test_each_session_retrieves_from_its_own_index(session, tmp_path):
+    files = FileManager(session)
+    (tmp_path / "cats.md").write_text("Cats purr and sleep all day.\n")
+    assert files.index_path(str(tmp_path / "cats.md"))
+    assert "purr" in files.retrieve("do cats purr")
+    session.save_to_disk(str(tmp_path / "pets.json"))
+    assert "purr" in files.retrieve("do cats purr")  # Moved with the session
+
+    session.reset()
+    assert files.retrieve("do cats purr") == ""
+    session.load_from_disk(str(tmp_path / "pets.json"))
+    assert "purr" in files.retrieve("do cats purr")
+    session.delete_file(str(tmp_path / "pets.json"))
+    assert not os.path.exists(session_manager.index_dir(str(tmp_path / "pets.json")))
+
+
+def test_retrieved_context_counts_against_the_context(session):
+    session.config.context_length = 1000
+    for i in range(6):
+        session.append_message("user", f"message {i} " + "x" * 400)
+    session.trim_history()
+    kept = len(session.history)
+    before = session.used_tokens()
+    session.injected_context = "y" * 1600
+    assert session.used_tokens() == before + 400
+    assert session.context_budget() == 0
+    session.trim_history()
+    assert len(session.history) < kept
+    assert session.used_tokens() <= 950
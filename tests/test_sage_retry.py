@@ -0,0 +1,177 @@
+"""
+Tests stream resilience: the retry policy, and Chat resuming a reply after a mid-stream drop.
+
+Chat runs against a scripted stand-in API, so no server is needed.
+"""
+
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from rich.panel import Panel
+
+from localsage.retry import (
+    CONTINUE_PROMPT,
+    MAX_BACKOFF,
+    backoff_delay,
+    continuation_messages,
+    continuation_options,
+    is_retryable,
+)
+from localsage.sage import Chat
+
+_REQUEST = httpx.Request("POST", "http://localhost:8080/v1/chat/completions")
+
+
+def _status_error(code: int, headers: dict | None = None) -> openai.APIStatusError:
+    response = httpx.Response(code, request=_REQUEST, headers=headers)
+    return openai.APIStatusError("boom", response=response, body=None)
+
+
+# 1. Policy
+
+
+def test_is_retryable():
+    assert is_retryable(openai.APIConnectionError(request=_REQUEST))
+    assert is_retryable(openai.APITimeoutError(request=_REQUEST))
+    assert is_retryable(httpx.RemoteProtocolError("peer closed connection"))
+    assert is_retryable(httpx.ReadError("reset"))
+    assert is_retryable(_status_error(503))
+    assert is_retryable(_status_error(429))
+    assert not is_retryable(_status_error(400))
+    assert not is_retryable(_status_error(401))
+    assert not is_retryable(ValueError("bad chunk"))
+
+
+def test_backoff_grows_with_jitter_and_caps():
+    for attempt in range(1, 4):
+        step = 2.0 * 2 ** (attempt - 1)
+        delays = [backoff_delay(attempt, 2.0) for _ in range(50)]
+        assert all(step / 2 <= d <= step for d in delays)
+        assert len(set(delays)) > 1
+    assert backoff_delay(20, 2.0) <= MAX_BACKOFF
+
+
+def test_backoff_honors_retry_after():
+    e = _status_error(503, {"Retry-After": "7"})
+    assert backoff_delay(1, 0.1, e) == 7
+    assert backoff_delay(1, 0.1, _status_error(503, {"Retry-After": "soon"})) <= 0.1
+
+
+def test_continuation_messages():
+    history = [{"role": "user", "content": "Write a poem"}]
+    prefix = continuation_messages(history, "Roses are", "prefix")
+    assert prefix[-1] == {"role": "assistant", "content": "Roses are"}
+    assert history == [{"role": "user", "content": "Write a poem"}]
+    prompt = continuation_messages(history, "Roses are", "prompt")
+    assert prompt[-2]["role"] == "assistant"
+    assert prompt[-1] == {"role": "user", "content": CONTINUE_PROMPT}
+    assert continuation_options("prefix")["extra_body"]["continue_final_message"]
+    assert continuation_options("prompt") == {}
+
+
+# 2. Chat
+
+
+def _chunk(content=None, reasoning=None):
+    delta = SimpleNamespace(content=content, reasoning_content=reasoning)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class _ScriptedAPI:
+    """Plays one script per request. A script ending in an exception drops the stream there."""
+
+    def __init__(self, *scripts):
+        self.scripts = list(scripts)
+        self.partials: list[str] = []
+
+    def has_failover(self):
+        return False
+
+    def fetch_stream(self, partial: str = ""):
+        self.partials.append(partial)
+        for item in self.scripts.pop(0):
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def _chat(api, attempts=3):
+    session = SimpleNamespace(
+        history=[{"role": "user", "content": "hi"}],
+        injected_context="",
+        trim_history=lambda: None,
+        turn_duration=lambda start, end: None,
+        correct_history=lambda: session.history.pop(),
+        history_wrapper=lambda response, reasoning="": session.history.append(
+            {"role": "assistant", "content": response, "reasoning": reasoning}
+        ),
+    )
+    config = SimpleNamespace(
+        refresh_rate=30,
+        rich_code_theme="monokai",
+        reasoning_panel_consume=False,
+        retry_attempts=attempts,
+        retry_backoff=0.0,
+    )
+    ui = SimpleNamespace(
+        response_panel_constructor=lambda: Panel(""),
+        reasoning_panel_constructor=lambda: Panel(""),
+    )
+    errors = []
+    panel = SimpleNamespace(
+        spawn_status_panel=lambda: None,
+        spawn_error_panel=lambda title, msg: errors.append(title),
+    )
+    chat = Chat(config, session, None, ui, panel, api)  # pyright: ignore
+    return chat, session, errors
+
+
+def test_mid_stream_drop_resumes_from_partial():
+    drop = httpx.RemoteProtocolError("peer closed connection")
+    api = _ScriptedAPI(
+        [_chunk(reasoning="hmm"), _chunk("Roses "), _chunk("are "), drop],
+        [_chunk(reasoning="again?"), _chunk("red.")],
+    )
+    chat, session, errors = _chat(api)
+    chat.stream_response()
+    assert api.partials == ["", "Roses are "]
+    assert session.history[-1]["content"] == "Roses are red."
+    assert session.history[-1]["reasoning"] == "hmm"
+    assert not errors
+
+
+def test_failure_before_any_text_restarts_the_turn():
+    refused = openai.APIConnectionError(request=_REQUEST)
+    api = _ScriptedAPI(
+        [refused], [_chunk(reasoning="half a thought"), refused], [_chunk("Hello")]
+    )
+    chat, session, _ = _chat(api)
+    chat.stream_response()
+    assert api.partials == ["", "", ""]
+    assert session.history[-1]["content"] == "Hello"
+    assert session.history[-1]["reasoning"] == ""
+
+
+def test_exhausted_retries_keep_the_partial_reply():
+    drop = httpx.ReadError("reset")
+    api = _ScriptedAPI([_chunk("Half a "), drop], [drop])
+    chat, session, errors = _chat(api, attempts=1)
+    chat.stream_response()
+    assert errors == ["STREAM INTERRUPTED"]
+    assert session.history[-1] == {
+        "role": "assistant",
+        "content": "Half a ",
+        "reasoning": "",
+    }
+
+
+@pytest.mark.parametrize("error", [_status_error(400), ValueError("bad chunk")])
+def test_fatal_errors_are_not_retried(error):
+    api = _ScriptedAPI([error], [_chunk("never")])
+    chat, session, errors = _chat(api)
+    chat.stream_response()
+    assert api.partials == [""]
+    assert errors == ["API ERROR"]
+    assert session.history == []
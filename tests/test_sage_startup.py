@@ -0,0 +1,79 @@
+"""
+Tests the cold start: the first prompt must not wait on heavy imports, and must appear within budget.
+
+Each check runs in a fresh interpreter, with the app's data directory pointed at a temp dir.
+The deferred imports are always checked, they stand for the budget on any machine. The
+wall-clock check depends on the machine, set LOCALSAGE_TIMING=1 to run it.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Seconds from the first import to the intro panel, interpreter startup excluded
+STARTUP_BUDGET = 0.3
+
+# Loaded by the warm-up thread or on first use, never before the first prompt
+DEFERRED = (
+    "openai",
+    "httpx",
+    "keyring",
+    "rich.markdown",
+    "rich.live",
+    "pygments",
+    "pylatexenc",
+    "tiktoken",
+    "tokenizers",
+    "pyperclip",
+    "numpy",
+    "trafilatura",
+)
+
+IMPORT = """
+import json, sys
+import localsage.sage
+print(json.dumps({"loaded": [m for m in DEFERRED if m in sys.modules]}))
+"""
+
+STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+from localsage.sage import App
+app = App()
+app.panel.spawn_intro_panel()
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in DEFERRED if m in sys.modules]}))
+"""
+
+
+def _start(tmp_path, script: str = STARTUP) -> dict:
+    env = {**os.environ, "XDG_DATA_HOME": str(tmp_path), "COLUMNS": "80"}
+    result = subprocess.run(
+        [sys.executable, "-c", f"DEFERRED = {DEFERRED!r}\n{script}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=60,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_importing_the_app_loads_nothing_heavy(tmp_path):
+    assert _start(tmp_path, IMPORT)["loaded"] == []
+
+
+def test_heavy_modules_are_deferred(tmp_path):
+    assert _start(tmp_path)["loaded"] == []
+
+
+@pytest.mark.skipif(
+    not os.environ.get("LOCALSAGE_TIMING"), reason="set LOCALSAGE_TIMING=1 to run"
+)
+def test_first_prompt_is_within_budget(tmp_path):
+    _start(tmp_path)  # Settle the filesystem cache
+    best = min(_start(tmp_path)["elapsed"] for _ in range(3))
+    assert best < STARTUP_BUDGET, f"Startup took {best * 1000:.0f} ms"
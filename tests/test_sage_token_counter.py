@@ -0,0 +1,227 @@
+"""
+Tests the tokenizer registry: backend selection, caching, server /tokenize batches and fallbacks.
+
+The server backend runs against a stand-in llama.cpp /tokenize on localhost.
+"""
+
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from localsage import session_manager
+from localsage.config import Config
+from localsage.model_limits import ModelLimits
+from localsage.session_manager import SessionManager
+from localsage.token_counter import (
+    DEFAULT_TOKENIZER,
+    EstimateBackend,
+    HFTokenizerBackend,
+    ServerBackend,
+    TiktokenBackend,
+    TokenCounter,
+    auto_tokenizer,
+    estimate,
+    make_backend,
+)
+
+
+class _Words:
+    """Counts whitespace-separated words, and remembers every batch it was asked for"""
+
+    name = "words"
+
+    def __init__(self):
+        self.batches: list[list[str]] = []
+
+    def count_many(self, texts):
+        self.batches.append(list(texts))
+        return [len(t.split()) for t in texts]
+
+
+class _Broken:
+    name = "broken"
+
+    def count_many(self, texts):
+        raise RuntimeError("encoding download failed")
+
+
+# 1. TokenCounter
+
+
+def test_make_backend():
+    assert isinstance(make_backend("tiktoken"), TiktokenBackend)
+    assert make_backend("tiktoken:cl100k_base").name == "tiktoken:cl100k_base"
+    assert isinstance(make_backend("hf:/x/tokenizer.json"), HFTokenizerBackend)
+    assert isinstance(make_backend("server", "http://h:8080/v1"), ServerBackend)
+    assert make_backend("server", "http://h:8080/v1").url == "http://h:8080/tokenize"
+    assert isinstance(make_backend("estimate"), EstimateBackend)
+    assert isinstance(make_backend("nonsense"), EstimateBackend)
+
+
+def test_counts_are_cached_and_batched():
+    backend = _Words()
+    counter = TokenCounter(backend)
+    assert counter.count_many(["a b", "c d e", "a b"]) == [2, 3, 2]
+    assert backend.batches == [["a b", "c d e"]]  # One batch, duplicates counted once
+    assert counter.count_many(["c d e", "f"]) == [3, 1]
+    assert backend.batches[-1] == ["f"]
+    assert counter.hits == 1 and counter.misses == 3
+
+
+def test_failed_backend_falls_back_to_the_estimate_for_good():
+    counter = TokenCounter(_Broken())
+    assert counter.count("x" * 40) == estimate("x" * 40) == 10
+    assert counter.fallback and counter.name == "estimate (fallback)"
+    assert counter.count("y" * 8) == 2
+
+
+def test_missing_tokenizers_package_or_file_falls_back(tmp_path):
+    counter = TokenCounter(HFTokenizerBackend(str(tmp_path / "tokenizer.json")))
+    assert counter.count("abcd" * 5) == 5
+    assert counter.fallback
+
+
+# 2. Server /tokenize
+
+
+class _Tokenize(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.calls += 1  # pyright: ignore
+        tokens = list(range(len(body["content"].split())))
+        data = json.dumps({"tokens": tokens}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def tokenize_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Tokenize)
+    server.calls = 0  # pyright: ignore
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_server_backend_counts_a_batch(tokenize_server):
+    url = f"http://127.0.0.1:{tokenize_server.server_address[1]}/v1"
+    counter = TokenCounter(make_backend("server", url, "k"))
+    texts = [" ".join(["w"] * n) for n in range(1, 21)]
+    assert counter.count_many(texts) == list(range(1, 21))
+    assert tokenize_server.calls == 20
+    assert counter.count_many(texts) == list(range(1, 21))
+    assert tokenize_server.calls == 20  # All cached
+
+
+def test_unreachable_server_estimates_without_caching():
+    counter = TokenCounter(make_backend("server", "http://127.0.0.1:9/v1", "k"))
+    assert counter.count("abcdefgh") == 2
+    assert not counter.last_exact and not counter.fallback
+    assert counter.name == "server" and not counter.cache
+
+
+def test_auto_picks_the_reported_models_tokenizer(tmp_path, monkeypatch):
+    monkeypatch.setenv("HF_HUB_CACHE", str(tmp_path / "hub"))
+    assert auto_tokenizer(None) == DEFAULT_TOKENIZER
+    assert auto_tokenizer("/models/Qwen3-8B-Q4_K_M.gguf") == "server"
+    local = tmp_path / "qwen"
+    local.mkdir()
+    (local / "tokenizer.json").write_text("{}")
+    assert auto_tokenizer(str(local)) == f"hf:{local / 'tokenizer.json'}"
+    assert auto_tokenizer("Qwen/Qwen3-8B") == DEFAULT_TOKENIZER
+    snapshot = tmp_path / "hub" / "models--Qwen--Qwen3-8B" / "snapshots" / "abc"
+    snapshot.mkdir(parents=True)
+    (snapshot / "tokenizer.json").write_text("{}")
+    assert auto_tokenizer("Qwen/Qwen3-8B") == f"hf:{snapshot / 'tokenizer.json'}"
+    assert auto_tokenizer("gpt-4o") == DEFAULT_TOKENIZER
+
+
+# 3. SessionManager
+
+
+def test_session_manager_uses_the_profile_tokenizer():
+    config = Config()
+    config.models[0]["tokenizer"] = "estimate"
+    session = SessionManager(config)
+    assert session.counter.name == "estimate"
+    session.append_message("user", "x" * 400)
+    total = session.used_tokens()
+    assert total == estimate(session.history[0]["content"]) + 100  # pyright: ignore
+    assert all(entry is not None for entry in session.token_cache)
+
+
+def test_session_manager_resolves_auto_from_the_discovered_model():
+    config = Config()
+    config.models[0]["tokenizer"] = "auto"
+    session = SessionManager(config)
+    assert session.counter.name == DEFAULT_TOKENIZER
+    config.set_limits(ModelLimits(tokenizer="/models/Qwen3-8B-Q4_K_M.gguf"))
+    session.load_tokenizer()
+    assert session.counter.name == "server"
+
+
+def test_session_manager_recounts_estimates_from_an_unreachable_server():
+    config = Config()
+    config.models[0]["endpoint"] = "http://127.0.0.1:9/v1"
+    config.models[0]["tokenizer"] = "server"
+    session = SessionManager(config)
+    session.append_message("user", "x" * 400)
+    assert session.used_tokens() > 100
+    assert all(entry is None for entry in session.token_cache)
+
+
+def test_swapping_the_tokenizer_while_counting(monkeypatch):
+    class _SlowWords(_Words):
+        def count_many(self, texts):
+            time.sleep(0.001)
+            return super().count_many(texts)
+
+    monkeypatch.setattr(session_manager, "make_backend", lambda *args: _SlowWords())
+    session = SessionManager(Config())
+    errors, done = [], threading.Event()
+
+    def warm_up():
+        try:
+            while not done.is_set():
+                session.load_tokenizer()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=warm_up)
+    thread.start()
+    words = len(str(session.history[0]["content"]).split())
+    try:
+        for i in range(200):
+            session.append_message("user", f"message {i}")
+            words += 2
+            assert session.count_tokens() == words
+    finally:
+        done.set()
+        thread.join()
+    assert errors == []
+    assert session.count_tokens() == words
+
+
+def test_trimming_with_an_unreachable_server_drops_only_what_it_must():
+    config = Config()
+    config.models[0]["endpoint"] = "http://127.0.0.1:9/v1"
+    config.models[0]["tokenizer"] = "server"
+    session = SessionManager(config)
+    for i in range(10):
+        session.append_message("user", f"{i}" * 400)  # 100 tokens by the estimate
+    system = estimate(str(session.history[0]["content"]))
+    config.context_length = math.ceil((system + 450) / 0.95)
+    session.trim_history()
+    assert all(entry is None for entry in session.token_cache)
+    assert [m["content"][0] for m in session.history[1:]] == ["6", "7", "8", "9"]
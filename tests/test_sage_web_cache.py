@@ -0,0 +1,270 @@
+"""
+Tests !web fetching: the page cache, conditional revalidation and concurrent downloads.
+
+Revalidation and concurrent fetching run against stand-in HTTP servers on localhost.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import ClassVar
+
+import pytest
+
+from localsage import file_manager
+from localsage.file_manager import FileManager
+from localsage.html_cleaner import FetchError
+from localsage.web_cache import WebCache, cache_key
+
+# 1. WebCache
+
+
+def test_cache_key_normalizes_urls():
+    assert cache_key("HTTPS://Example.com:443/a#top") == cache_key(
+        "https://example.com/a"
+    )
+    assert cache_key("https://example.com") == cache_key("https://example.com/")
+    assert cache_key("https://example.com/a?x=1") != cache_key("https://example.com/a")
+
+
+def test_put_get_and_persist(tmp_path):
+    cache = WebCache(str(tmp_path))
+    cache.put("https://example.com/a", b"<p>hi</p>", "hi", etag='"v1"')
+    entry = cache.get("https://example.com/a")
+    assert entry and cache.text(entry) == "hi" and cache.body(entry) == b"<p>hi</p>"
+    assert cache.validators(entry) == {"If-None-Match": '"v1"'}
+    reloaded = WebCache(str(tmp_path))
+    assert reloaded.get("https://example.com/a")["etag"] == '"v1"'
+
+
+def test_ttl(tmp_path):
+    cache = WebCache(str(tmp_path), ttl=60)
+    cache.put("https://example.com/a", b"x", "x")
+    entry = cache.get("https://example.com/a")
+    assert cache.is_fresh(entry)
+    entry["fetched"] = time.time() - 61
+    assert not cache.is_fresh(entry)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = WebCache(str(tmp_path), max_bytes=250)
+    for name in ("a", "b", "c"):
+        cache.put(f"https://example.com/{name}", b"x" * 50, "y" * 50)
+        time.sleep(0.01)
+    assert cache.get("https://example.com/a") is None
+    # Touching b makes c the oldest
+    assert cache.get("https://example.com/b")
+    time.sleep(0.01)
+    cache.put("https://example.com/d", b"x" * 50, "y" * 50)
+    assert cache.get("https://example.com/c") is None
+    assert cache.get("https://example.com/b") and cache.get("https://example.com/d")
+    assert cache.size() <= 250
+    assert len(list(tmp_path.glob("*.txt"))) == 2
+
+
+def test_lookups_never_rewrite_the_index(tmp_path, monkeypatch):
+    cache = WebCache(str(tmp_path), max_bytes=250)
+    cache.put("https://example.com/a", b"x" * 50, "y" * 50)
+    time.sleep(0.01)
+    cache.put("https://example.com/b", b"x" * 50, "y" * 50)
+    saves = []
+    monkeypatch.setattr(cache, "_save", lambda: saves.append(1))
+    assert cache.get("https://example.com/a") and saves == []
+    monkeypatch.undo()
+    # The lookup still counts, and is saved with the next write
+    cache.put("https://example.com/c", b"x" * 50, "y" * 50)
+    reloaded = WebCache(str(tmp_path))
+    assert reloaded.get("https://example.com/b") is None
+    assert reloaded.get("https://example.com/a")
+
+
+# 2. Conditional revalidation through FileManager
+
+
+class DocsHandler(BaseHTTPRequestHandler):
+    """Serves one text file with an ETag, answering 304 when it is unchanged."""
+
+    hits: ClassVar[list[int]] = []
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            type(self).hits.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        type(self).hits.append(200)
+        payload = b"# Notes\nCached content.\n"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/markdown")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    DocsHandler.hits.clear()
+    httpd = HTTPServer(("127.0.0.1", 0), DocsHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/notes.md"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def manager(tmp_path):
+    config = SimpleNamespace(web_cache_ttl=3600, web_cache_size=1)
+    fm = FileManager(SimpleNamespace(config=config))
+    fm.web_cache = WebCache(str(tmp_path), ttl=3600)
+    return fm
+
+
+def test_fresh_pages_skip_the_network(server, manager):
+    assert "Cached content." in manager.fetch_website(server)
+    assert "Cached content." in manager.fetch_website(server)
+    assert DocsHandler.hits == [200]
+
+
+def test_stale_pages_are_revalidated(server, manager):
+    manager.fetch_website(server)
+    manager.web_cache.ttl = 0
+    assert "Cached content." in manager.fetch_website(server)
+    assert DocsHandler.hits == [200, 304]
+
+
+def test_stale_pages_are_served_offline(manager):
+    offline = "http://127.0.0.1:9/notes.md"  # Nothing listens on the discard port
+    manager.web_cache.put(offline, b"old", "Old content.")
+    manager.web_cache.ttl = 0
+    assert manager.fetch_website(offline) == "Old content."
+    with pytest.raises(FetchError, match="Could not reach"):
+        manager.fetch_website("http://127.0.0.1:9/other.md")
+    [(_, error)] = manager.fetch_websites(["http://127.0.0.1:9/other.md"])
+    assert isinstance(error, FetchError)
+
+
+def test_bugs_are_raised_not_reported_as_failed_pages(server, manager, monkeypatch):
+    def broken(body, is_html):
+        raise KeyError("bug")
+
+    monkeypatch.setattr(file_manager, "extract_text", broken)
+    with pytest.raises(KeyError):
+        manager.fetch_websites([server])
+
+
+class RedirectHandler(BaseHTTPRequestHandler):
+    """/hop/N redirects to /hop/N-1, /hop/0 is the page."""
+
+    def do_GET(self):
+        hops = int(self.path.rsplit("/", 1)[-1])
+        if hops:
+            self.send_response(302)
+            self.send_header("Location", f"/hop/{hops - 1}")
+            self.end_headers()
+            return
+        payload = b"Arrived."
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_redirect_chains_are_followed(manager):
+    httpd = HTTPServer(("127.0.0.1", 0), RedirectHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    root = f"http://127.0.0.1:{httpd.server_address[1]}"
+    try:
+        assert manager.fetch_website(f"{root}/hop/5") == "Arrived."
+        with pytest.raises(FetchError):
+            manager.fetch_website(f"{root}/hop/6")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+# 3. Concurrent multi-URL fetching
+
+DELAY = 0.3
+
+
+class SlowPagesHandler(BaseHTTPRequestHandler):
+    """Every page takes DELAY seconds, /quick none and /slow five times that. /missing returns 404."""
+
+    def do_GET(self):
+        time.sleep({"/quick": 0, "/slow": 5 * DELAY}.get(self.path, DELAY))
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        name = self.path.strip("/")
+        payload = f"<html><body><p>Content of {name}.</p></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SlowPagesHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_websites_runs_concurrently_in_order(slow_server, manager, monkeypatch):
+    monkeypatch.setattr(file_manager, "worker_pool", ThreadPoolExecutor)
+    file_manager.extract_text(
+        b"<p>Imports trafilatura before the clock starts.</p>", True
+    )
+    urls = [f"{slow_server}/page{i}" for i in range(8)] + [f"{slow_server}/missing"]
+    seen = []
+    start = time.perf_counter()
+    results = manager.fetch_websites(urls, lambda url, _: seen.append(url))
+    elapsed = time.perf_counter() - start
+    # Serially this would take 9 * DELAY
+    assert elapsed < 5 * DELAY
+    assert [u for u, _ in results] == urls
+    assert all(f"Content of page{i}" in results[i][1] for i in range(8))
+    assert isinstance(results[-1][1], Exception)
+    assert sorted(seen) == sorted(urls)
+
+
+def test_pages_are_reported_as_they_finish(slow_server, manager, monkeypatch):
+    # Threads, so worker startup doesn't count against the timing
+    monkeypatch.setattr(file_manager, "worker_pool", ThreadPoolExecutor)
+    urls = [f"{slow_server}/quick", f"{slow_server}/slow"]
+    start, reported = time.perf_counter(), {}
+    manager.fetch_websites(
+        urls, lambda url, _: reported.setdefault(url, time.perf_counter() - start)
+    )
+    # Extracted while the slow page is still downloading
+    assert reported[urls[0]] < 5 * DELAY < reported[urls[1]]
+
+
+def test_parse_urls(tmp_path, manager):
+    listing = tmp_path / "urls.txt"
+    listing.write_text(
+        "# docs\nhttps://a.dev\n\nhttps://b.dev  # second\nhttps://a.dev\n"
+    )
+    assert manager.parse_urls(str(listing)) == ["https://a.dev", "https://b.dev"]
+    assert manager.parse_urls("https://a.dev, https://b.dev https://c.dev") == [
+        "https://a.dev",
+        "https://b.dev",
+        "https://c.dev",
+    ]
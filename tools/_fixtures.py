@@ -0,0 +1,244 @@
+"""
+Inputs shared by the tests and the benchmarks: mock replies, fuzzed markup, and the old math sanitizer.
+
+The old multi-pass sanitizer is the baseline the single-pass scanner is checked and timed against.
+"""
+
+import html
+import random
+import re
+
+from localsage import math_sanitizer
+
+PAYLOADS = ("plain", "markdown", "code", "latex", "mixed")
+
+WORDS = (
+    "stream token render panel model buffer latency context window prompt reply "
+    "session terminal frame cache vector server client chunk budget history"
+).split()
+
+
+# <~~PAYLOADS~~>
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _markdown(rng: random.Random) -> str:
+    rows = "\n".join(
+        f"| {rng.choice(WORDS)} | {rng.randint(1, 999)} | **{rng.choice(WORDS)}** |"
+        for _ in range(4)
+    )
+    return (
+        f"## {_sentence(rng, 4)[:-1]}\n\n{_sentence(rng)} *{rng.choice(WORDS)}* "
+        f"and `{rng.choice(WORDS)}`.\n\n"
+        + "".join(f"- {_sentence(rng, 6)}\n" for _ in range(3))
+        + f"\n> {_sentence(rng)}\n\n| name | value | note |\n|---|---|---|\n{rows}\n\n"
+    )
+
+
+def _code(rng: random.Random) -> str:
+    name = rng.choice(WORDS)
+    body = "".join(
+        f"    {rng.choice(WORDS)} = {name}.{rng.choice(WORDS)}({rng.randint(0, 99)})\n"
+        for _ in range(6)
+    )
+    return (
+        f"{_sentence(rng)}\n\n```python\ndef {name}_{rng.randint(0, 99)}({name}):\n"
+        f"{body}    return {name}\n```\n\n"
+    )
+
+
+def _latex(rng: random.Random) -> str:
+    a, b = rng.choice("xyzt"), rng.choice("abnk")
+    return (
+        f"{_sentence(rng, 8)} Let $\\alpha_{b} = \\frac{{{a}^2}}{{\\sqrt{{{b} + 1}}}}$ "
+        f"and \\({a} \\leq \\beta\\).\n\n"
+        f"$$\n\\sum_{{{b}=1}}^{{\\infty}} \\frac{{1}}{{{b}^2}} = \\frac{{\\pi^2}}{{6}}\n$$\n\n"
+        f"\\[\n\\begin{{aligned}}\n{a} &= \\int_0^1 e^{{-{a}^2}} \\, d{a} \\\\\n"
+        f"&\\approx {rng.random():.4f}\n\\end{{aligned}}\n\\]\n\n"
+    )
+
+
+def build_payload(kind: str, length: int, seed: int = 0) -> str:
+    """Deterministic reply text of exactly `length` characters"""
+    rng = random.Random(f"{kind}:{seed}")
+    makers = {
+        "plain": lambda r: _sentence(r) + " ",
+        "markdown": _markdown,
+        "code": _code,
+        "latex": _latex,
+        "mixed": lambda r: r.choice((_markdown, _code, _latex))(r),
+    }
+    make = makers[kind]
+    parts, size = [], 0
+    while size < length:
+        part = make(rng)
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)[:length]
+
+
+# <~~FUZZ~~>
+# Tokens the fuzzer strings together: delimiters, code, commands and the text between
+FUZZ_TOKENS = (
+    "$",
+    "$$",
+    "\\(",
+    "\\)",
+    "\\[",
+    "\\]",
+    "`",
+    "```",
+    "\\",
+    "\\frac{",
+    "\\alpha",
+    "\\to",
+    "_",
+    "^",
+    "{",
+    "}",
+    "\n",
+    "---",
+    " ",
+    "x",
+    "12",
+    "&amp;",
+    "&",
+    "“",
+    "\u200b",
+)
+
+
+def fuzz_text(seed: int, chars: int) -> str:
+    """A seeded mix of a few fuzz tokens. A longer text starts with the shorter one."""
+    rng = random.Random(seed)
+    tokens = rng.sample(FUZZ_TOKENS, rng.randint(2, 6))
+    weights = [rng.random() for _ in tokens]
+    parts, size = [], 0
+    while size < chars:
+        parts.append(rng.choices(tokens, weights)[0])
+        size += len(parts[-1])
+    return "".join(parts)[:chars]
+
+
+# <~~LEGACY SANITIZER~~>
+# The multi-pass sanitizer the scanner replaced, kept as it was apart from the placeholder choice.
+# Conversion, the logic table and the orphan regex are shared with the scanner.
+
+LEGACY_DELIMS = (
+    re.compile(r"\$(.+?)\$", re.DOTALL),
+    re.compile(r"\\\((.+?)\\\)", re.DOTALL),
+    re.compile(r"\\\[(.+?)\\\]", re.DOTALL),
+)
+LEGACY_DOLLAR_LEADING = re.compile(r"(?m)(?<![`$])\$(?=(?:[^$\n]*[\^_\\])[^$\n]*$)")
+LEGACY_DOLLAR_TRAILING = re.compile(r"(?m)(?<!\$)\$(?=\s*$)")
+# Code placeholder format and the pattern that restores it. "{CODEBLOCK_0}" is the
+# original. Its underscore made the dollar cleanup read code as math, "fixed" has none.
+LEGACY_PLACEHOLDERS = {
+    "original": (
+        "{{CODEBLOCK_{}}}",
+        re.compile(r"(?:\{CODEBLOCK_(\d+)\}|CODEBLOCK_(\d+))"),
+    ),
+    "fixed": ("{{CODEBLOCK{}}}", re.compile(r"(?:\{CODEBLOCK(\d+)\}|CODEBLOCK(\d+))")),
+}
+LEGACY_MDSEP_TOKEN_FMT = "⟦MDSEP_{i}⟧"
+LEGACY_MDSEP_ANY_RE = re.compile(r"(?:\{MDSEP_(\d+)\}|⟦MDSEP_(\d+)⟧|MDSEP_(\d+))")
+
+
+def legacy_normalize(text: str) -> str:
+    if not text:
+        return text
+    text = text.translate(math_sanitizer._UNICODE_FIXES)
+    if "&" in text:
+        text = html.unescape(text)
+    text = text.translate(
+        {
+            ord("“"): '"',
+            ord("”"): '"',
+            ord("„"): '"',
+            ord("‟"): '"',
+            ord("‘"): "'",
+            ord("’"): "'",
+            ord("‚"): "'",
+            ord("‛"): "'",
+        }
+    )
+    return re.sub(r"[\u200b-\u200f\u202a-\u202e\u2060]", "", text)
+
+
+def legacy_sanitize(text: str, placeholder: str = "original") -> str:
+    """The original sanitize_math_safe(): separators and code swapped for placeholders, then ten passes"""
+    ms = math_sanitizer
+    codeph_fmt, codeph_any_re = LEGACY_PLACEHOLDERS[placeholder]
+    text = legacy_normalize(text)
+    if ("\\" not in text) and ("$" not in text):
+        return text
+
+    seps: list[str] = []
+
+    def _sep_repl(m: re.Match[str]) -> str:
+        seps.append(m.group(0))
+        return LEGACY_MDSEP_TOKEN_FMT.format(i=len(seps) - 1)
+
+    text = ms._SEPARATOR_RE.sub(_sep_repl, text)
+
+    code_spans: list[str] = []
+
+    def _code_preserve(m: re.Match[str]) -> str:
+        code_spans.append(m.group(0))
+        return codeph_fmt.format(len(code_spans) - 1)
+
+    text = ms._CODE_BLOCKS.sub(_code_preserve, text)
+
+    if "\\" in text:
+        text = ms._RE_LOGIC_OPS.sub(
+            lambda m: ms._LOGIC_OPS.get(m.group(0)[1:], m.group(0)), text
+        )
+
+    if "$" in text or "\\" in text:
+        for pat in LEGACY_DELIMS:
+            text = pat.sub(
+                lambda m: (
+                    m.group(0)
+                    if "MDSEP_" in m.group(1)
+                    else (
+                        ms._convert_safe(m.group(1))
+                        if ms._balanced(m.group(1))
+                        else m.group(0)
+                    )
+                ),
+                text,
+            )
+        text = ms._ORPHAN.sub(
+            lambda m: (
+                ms._convert_safe(m.group(0)) if ms._balanced(m.group(0)) else m.group(0)
+            ),
+            text,
+        )
+
+    text = LEGACY_DOLLAR_LEADING.sub("", text)
+    text = LEGACY_DOLLAR_TRAILING.sub("", text)
+
+    if code_spans:
+
+        def _restore_codeph(m: re.Match[str]) -> str:
+            for g in (1, 2):
+                if m.group(g) is not None:
+                    idx = int(m.group(g))
+                    return code_spans[idx] if 0 <= idx < len(code_spans) else m.group(0)
+            return m.group(0)
+
+        text = codeph_any_re.sub(_restore_codeph, text)
+
+    if seps:
+
+        def _restore(m: re.Match[str]) -> str:
+            for g in (1, 2, 3):
+                if m.group(g) is not None:
+                    idx = int(m.group(g))
+                    return seps[idx] if 0 <= idx < len(seps) else m.group(0)
+            return m.group(0)
+
+        text = LEGACY_MDSEP_ANY_RE.sub(_restore, text)
+    return text
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmarks math sanitizing on math-heavy transcripts: the fragment cache, and the scanner against the multi-pass pipeline.
+
+Documentation is located in TOOLS.md
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+from localsage import math_sanitizer
+from tools._fixtures import build_payload, legacy_sanitize
+
+CACHED = math_sanitizer._convert_safe
+UNCACHED = CACHED.__wrapped__
+
+
+def load_corpus(args: argparse.Namespace) -> dict[str, str]:
+    if args.corpus:
+        transcripts = {}
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*"))):
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    transcripts[os.path.basename(path)] = f.read()
+        return transcripts
+    return {
+        f"{kind}-{args.chars // 1000}k": build_payload(kind, args.chars, args.seed)
+        for kind in ("latex", "mixed", "markdown")
+    }
+
+
+def live(sanitize, text: str, step: int) -> float:
+    """Sanitizes every prefix a stream would render, one per `step` characters, in ms"""
+    start = time.perf_counter()
+    for end in range(step, len(text) + step, step):
+        sanitize(text[:end])
+    return (time.perf_counter() - start) * 1000
+
+
+def replay(sanitize, text: str, repeat: int) -> float:
+    """Sanitizes the whole transcript `repeat` times, like redrawn history, in ms"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        sanitize(text)
+    return (time.perf_counter() - start) * 1000
+
+
+def timed(fn, sanitize, converter, *args) -> tuple[float, dict]:
+    """Runs fn with the given converter from a cold cache, returns ms and cache stats"""
+    math_sanitizer._convert_safe = converter
+    CACHED.cache_clear()
+    try:
+        elapsed = fn(sanitize, *args)
+    finally:
+        math_sanitizer._convert_safe = CACHED
+    return elapsed, math_sanitizer.fragment_cache_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("corpus", nargs="?", help="Directory of saved transcripts")
+    parser.add_argument("--chars", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--step", type=int, default=200, help="Characters streamed between frames"
+    )
+    parser.add_argument(
+        "--replays", type=int, default=20, help="Full redraws of each transcript"
+    )
+    args = parser.parse_args()
+
+    transcripts = load_corpus(args)
+    if not transcripts:
+        sys.exit(f"No transcripts found in {args.corpus}")
+    math_sanitizer.load_latex()  # Built by the warm-up in the app, not billed here
+
+    scanner = math_sanitizer.sanitize_math_safe
+    print(
+        f"{'transcript':<20} {'run':<7} {'uncached ms':>12} {'legacy ms':>10} "
+        f"{'scanner ms':>11} {'cache':>7} {'scan':>7} {'hit rate':>9}"
+    )
+    cache_ratios, scan_ratios = [], []
+    for name, text in transcripts.items():
+        for run, fn, arg in (
+            ("live", live, args.step),
+            ("replay", replay, args.replays),
+        ):
+            uncached, _ = timed(fn, scanner, UNCACHED, text, arg)
+            legacy, _ = timed(fn, legacy_sanitize, CACHED, text, arg)
+            new, stats = timed(fn, scanner, CACHED, text, arg)
+            cache_ratios.append(uncached / new if new else float("inf"))
+            scan_ratios.append(legacy / new if new else float("inf"))
+            print(
+                f"{name[:20]:<20} {run:<7} {uncached:>12.1f} {legacy:>10.1f} "
+                f"{new:>11.1f} {cache_ratios[-1]:>6.2f}x {scan_ratios[-1]:>6.2f}x "
+                f"{stats['hit_rate']:>8.1%}"
+            )
+    print(
+        f"\nGeometric mean speedup: {statistics.geometric_mean(cache_ratios):.2f}x "
+        f"from the cache, {statistics.geometric_mean(scan_ratios):.2f}x from the scanner"
+    )
+
+
+if __name__ == "__main__":
+    main()
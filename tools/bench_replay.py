@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmarks !load history replay, rendered in place against worker processes and a warm render cache.
+
+Documentation is located in TOOLS.md
+"""
+
+import argparse
+import io
+import os
+import time
+
+from rich.console import Console
+
+from localsage import history_render, math_sanitizer
+from localsage.render_cache import RenderCache
+from tools._fixtures import build_payload
+
+
+def build_history(turns: int, chars: int, payload: str, seed: int) -> list[dict]:
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i}, explain it again"})
+        history.append(
+            {"role": "assistant", "content": build_payload(payload, chars, seed + i)}
+        )
+    return history
+
+
+def timed_replay(
+    history: list[dict], workers: int, width: int, cache: RenderCache | None = None
+) -> tuple[float, str]:
+    """Replays from a cold fragment cache, returns seconds and the printed output"""
+    console = Console(
+        file=io.StringIO(), force_terminal=True, color_system="truecolor", width=width
+    )
+    math_sanitizer._convert_safe.cache_clear()
+    start = time.perf_counter()
+    history_render.replay_history(
+        history, console, "monokai", workers=workers, cache=cache
+    )
+    return time.perf_counter() - start, console.file.getvalue()  # pyright: ignore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument(
+        "--chars", type=int, default=5000, help="Characters per assistant reply"
+    )
+    parser.add_argument("--payload", default="mixed")
+    parser.add_argument("--width", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        help="Worker counts to try, 1 renders in place (default: 1, 2, 4, ... up to the CPU count)",
+    )
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    counts = args.workers or sorted(
+        {1, cpus, *(n for n in (2, 4, 8, 16, 32) if n < cpus)}
+    )
+    history = build_history(args.turns, args.chars, args.payload, args.seed)
+    math_sanitizer.load_latex()  # Built by the warm-up in the app, not billed here
+
+    print(
+        f"{args.turns} turns of {args.chars}-char {args.payload} replies, "
+        f"{args.width} columns, {cpus} CPUs\n"
+    )
+    print(f"{'workers':>7} {'seconds':>9} {'speedup':>8}")
+    serial, expected = timed_replay(history, 1, args.width)
+    print(f"{1:>7} {serial:>9.2f} {1:>7.2f}x")
+    for workers in counts:
+        if workers == 1:
+            continue
+        elapsed, output = timed_replay(history, workers, args.width)
+        same = "" if output == expected else "  output differs!"
+        print(f"{workers:>7} {elapsed:>9.2f} {serial / elapsed:>7.2f}x{same}")
+
+    # Filled by one replay, then timed on a second, as when a session is loaded again
+    cache = RenderCache()
+    timed_replay(history, 1, args.width, cache)
+    elapsed, output = timed_replay(history, 1, args.width, cache)
+    same = "" if output == expected else "  output differs!"
+    print(f"{'cached':>7} {elapsed:>9.2f} {serial / elapsed:>7.2f}x{same}")
+
+
+if __name__ == "__main__":
+    main()
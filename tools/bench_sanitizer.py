@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the math sanitizer per character on realistic and pathological replies, and fuzzes it for runaway scans.
+
+Documentation is located in TOOLS.md
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from functools import partial
+
+from localsage import math_sanitizer
+from tools._fixtures import WORDS, build_payload, fuzz_text
+
+# Inputs are timed at one size and GROWTH times that. Linear work grows by
+# GROWTH and quadratic by its square, past MAX_GROWTH is a runaway scan.
+GROWTH = 4
+MAX_GROWTH = 10.0
+RESOLUTION = 1e-4  # Seconds, shorter runs are too noisy to compare
+RECHECK = 0.25  # Seconds, a jump in a slower run is a runaway without measuring again
+
+
+# <~~CORPUS~~>
+def _table(rng: random.Random) -> str:
+    rows = "\n".join(
+        f"| `{rng.choice(WORDS)}_{i}` | ${rng.randint(1, 99)}.{rng.randint(0, 99):02} "
+        f"| $O(n^{rng.randint(1, 3)})$ | \\(\\frac{{{i}}}{{{rng.randint(2, 9)}}}\\) |"
+        for i in range(8)
+    )
+    return f"| name | price | cost | share |\n|---|---|---|---|\n{rows}\n\n"
+
+
+def _answer(rng: random.Random) -> str:
+    word = rng.choice(WORDS)
+    return (
+        f"Set `${word.upper()}_HOME` first, then run the script:\n\n```bash\n"
+        f'export {word.upper()}_HOME="$HOME/.{word}"\n'
+        f'for f in "$@"; do grep -E "\\\\b{word}\\\\d+" "$f" | sed "s/\\\\$/\\\\\\\\/"; done\n'
+        f"echo $((1 + {rng.randint(0, 9)}))\n```\n\n"
+        f"On Windows the path is `C:\\Users\\{word}\\AppData`, and the regex "
+        f"`^\\$[0-9]+\\.\\d{{2}}$` matches prices like $4.99.\n\n"
+    )
+
+
+def _repeat(unit: str):
+    return lambda chars, seed: (unit * (chars // len(unit) + 1))[:chars]
+
+
+def _grown(make):
+    def build(chars: int, seed: int) -> str:
+        rng = random.Random(seed)
+        parts, size = [], 0
+        while size < chars:
+            parts.append(make(rng))
+            size += len(parts[-1])
+        return "".join(parts)[:chars]
+
+    return build
+
+
+# Name -> builder of `chars` characters for a seed. Realistic replies mix their
+# parts at random, so only the pathological ones, a unit repeated, are timed for growth.
+REALISTIC = {
+    "code answer": _grown(_answer),
+    "dense latex": lambda chars, seed: build_payload("latex", chars, seed),
+    "tables": _grown(_table),
+    "mixed": lambda chars, seed: build_payload("mixed", chars, seed),
+}
+PATHOLOGICAL = {
+    "unbalanced $": _repeat("$a_1 "),
+    "$ run": _repeat("$"),
+    "backslashes": _repeat("\\"),
+    "unclosed \\(": _repeat("\\(x "),
+    "unclosed \\[": _repeat("\\[x\n"),
+    "closers in code": _repeat("\\( `\\)` "),
+    "code in math": _repeat("$x `a` "),
+    "open braces": _repeat("\\frac{"),
+    "backticks": _repeat("`"),
+    "unclosed fence": lambda chars, seed: "```\n" + _repeat("`a` $x ")(chars - 4, seed),
+    "rules in math": _repeat("$a\n---\n"),
+    "delimiter soup": _repeat("$\\(\\[`"),
+    "entities": _repeat("&amp;&lt;&#8217;"),
+}
+CORPUS = {**REALISTIC, **PATHOLOGICAL}
+
+
+# <~~TIMING~~>
+def cold(text: str) -> str:
+    """Sanitizes from an empty fragment cache, the first frame a reply is seen in"""
+    math_sanitizer._convert_safe.cache_clear()
+    return math_sanitizer.sanitize_math_safe(text)
+
+
+def best(fn, text: str, repeat: int = 3) -> float:
+    """Fastest of `repeat` runs, in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _ratio(fn, make, chars: int) -> tuple[float, float]:
+    small = best(fn, make(chars))
+    large = best(fn, make(chars * GROWTH))
+    return large / max(small, RESOLUTION / GROWTH), large
+
+
+def growth(fn, make, chars: int) -> float:
+    """
+    How much longer fn takes when make(chars) grows GROWTH times.\n
+    A jump past MAX_GROWTH is measured again one size up, as a costly stretch of
+    input can land in the larger text only. A runaway scan grows at both sizes.
+    """
+    ratio, large = _ratio(fn, make, chars)
+    if ratio > MAX_GROWTH and large < RECHECK:
+        ratio = min(ratio, _ratio(fn, make, chars * GROWTH)[0])
+    return ratio
+
+
+def measure(text: str, repeat: int) -> dict:
+    """ns/char for normalizing and for cold and warm sanitizing, and the worst run"""
+
+    def runs(fn) -> list[float]:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(text)
+            times.append(time.perf_counter() - start)
+        return times
+
+    normalize = runs(math_sanitizer._normalize_pre)
+    first = runs(cold)
+    warm = runs(math_sanitizer.sanitize_math_safe)
+    per_char = 1e9 / max(len(text), 1)
+    return {
+        "chars": len(text),
+        "normalize_ns": statistics.median(normalize) * per_char,
+        "cold_ns": statistics.median(first) * per_char,
+        "warm_ns": statistics.median(warm) * per_char,
+        "worst_ms": max(first) * 1000,
+    }
+
+
+def fuzz(cases: int, chars: int, seed: int) -> tuple[list[tuple[int, float]], float]:
+    """Growth of every case whose cost is runaway, and the worst growth seen"""
+    runaway, worst = [], 0.0
+    for case in range(seed, seed + cases):
+        ratio = growth(cold, partial(fuzz_text, case), chars)
+        worst = max(worst, ratio)
+        if ratio > MAX_GROWTH:
+            runaway.append((case, ratio))
+    return runaway, worst
+
+
+# <~~REPORT~~>
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.realpath(__file__)),
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(result: dict, baseline_path: str, tolerance: float) -> list[str]:
+    """Prints each input against the baseline, returns the ones that regressed"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nAgainst {baseline_path} ({baseline.get('commit', '?')}):")
+    if baseline.get("settings") != result["settings"]:
+        print("  Settings differ from the baseline, the numbers may not be comparable")
+    regressed = []
+    for name, row in result["corpus"].items():
+        old = baseline["corpus"].get(name, {}).get("cold_ns")
+        if not old:
+            continue
+        change = (row["cold_ns"] - old) / old
+        verdict = "same"
+        if change > tolerance:
+            verdict = "worse"
+            regressed.append(name)
+        elif change < -tolerance:
+            verdict = "better"
+        print(
+            f"  {name:<16} {old:>9.0f} → {row['cold_ns']:>9.0f} ns/char  {change:+7.1%}  {verdict}"
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chars", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--fuzz", type=int, default=200, help="Fuzz cases, 0 skips")
+    parser.add_argument(
+        "--fuzz-chars", type=int, default=4000, help="Smaller size of each fuzz case"
+    )
+    parser.add_argument("--json", help="Write the results to a file")
+    parser.add_argument("--baseline", help="Compare against an earlier --json file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Slowdown against the baseline that fails the run",
+    )
+    args = parser.parse_args()
+    math_sanitizer.load_latex()  # Built by the warm-up in the app, not billed here
+
+    print(
+        f"{'input':<16} {'chars':>7} {'normalize':>10} {'cold':>9} {'warm':>9} "
+        f"{'worst ms':>9} {'growth':>7}"
+    )
+    corpus, failed = {}, []
+    for name, make in CORPUS.items():
+        row = measure(make(args.chars, args.seed), args.repeat)
+        row["growth"], shown, flag = None, "-", ""
+        if name in PATHOLOGICAL:
+            row["growth"] = growth(
+                cold, partial(make, seed=args.seed), args.chars // GROWTH
+            )
+            shown = f"{row['growth']:.1f}x"
+            if row["growth"] > MAX_GROWTH:
+                flag = "  runaway"
+                failed.append(name)
+        corpus[name] = row
+        print(
+            f"{name:<16} {row['chars']:>7} {row['normalize_ns']:>10.0f} "
+            f"{row['cold_ns']:>9.0f} {row['warm_ns']:>9.0f} {row['worst_ms']:>9.2f} "
+            f"{shown:>7}{flag}"
+        )
+    print("(ns/char, growth is the cost of 4x the input)")
+
+    result = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {
+            k: v
+            for k, v in vars(args).items()
+            if k not in ("json", "baseline", "tolerance")
+        },
+        "corpus": corpus,
+    }
+    if args.fuzz:
+        runaway, worst = fuzz(args.fuzz, args.fuzz_chars, args.seed)
+        result["fuzz"] = {"worst_growth": worst, "runaway": runaway}
+        print(
+            f"\nFuzzed {args.fuzz} inputs of {args.fuzz_chars} and "
+            f"{args.fuzz_chars * GROWTH} characters, worst growth {worst:.1f}x"
+        )
+        for case, ratio in runaway:
+            sample = fuzz_text(case, 60)
+            print(f"  Runaway: fuzz_text({case}, n) grows {ratio:.1f}x  {sample!r}")
+            failed.append(f"fuzz {case}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        failed += compare(result, args.baseline, args.tolerance)
+    if failed:
+        sys.exit(f"\nFailed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
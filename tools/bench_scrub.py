@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the !web HTML pre-cleaner against the regex scrubbing it replaced.
+
+Documentation is located in TOOLS.md
+"""
+
+import argparse
+import glob
+import os
+import re
+import statistics
+import sys
+import time
+
+from localsage.html_cleaner import clean_html
+
+
+def regex_scrub(content: str) -> str:
+    """The original scrub_content() regexes, kept verbatim as the baseline"""
+    tags_to_nuke = r"<(script|style|svg|noscript|iframe|form)\b[^>]*>([\s\S]*?)<\/\1>"
+    comments = r"<!--[\s\S]*?-->"
+    content = re.sub(tags_to_nuke, "", content, flags=re.IGNORECASE)
+    content = re.sub(comments, "", content, flags=re.IGNORECASE)
+    return content.strip()
+
+
+def synthetic_corpus() -> dict[str, str]:
+    """Stand-in pages for when no saved corpus is given"""
+    article = "".join(
+        f"<p>Paragraph {i} with a <a href='/x{i}'>link</a> &amp; text.</p>\n<!-- c{i} -->\n"
+        for i in range(5000)
+    )
+    sprite = (
+        "<svg><defs>"
+        + "".join(
+            f'<symbol id="i{i}"><path d="M{i} 0L{i} 10Z"/></symbol>'
+            for i in range(20000)
+        )
+        + "</defs></svg>"
+    )
+    return {
+        "article": f"<html><body><article>{article}</article></body></html>",
+        "svg-sprites": f"<html><head><style>{'a{color:red}' * 5000}</style>"
+        f"<script>{'var x=1;' * 20000}</script></head>"
+        f"<body>{sprite}<article>{article}</article></body></html>",
+        "unclosed-forms": "<html><body>"
+        + "<form action=x>" * 2000
+        + article
+        + "</body></html>",
+    }
+
+
+def load_corpus(directory: str) -> dict[str, str]:
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.htm*"))):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def best_of(fn, page: str, repeat: int, limit: float) -> float | None:
+    """Fastest of `repeat` runs in ms, or None if one run exceeds `limit` seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(page)
+        elapsed = time.perf_counter() - start
+        times.append(elapsed * 1000)
+        if elapsed > limit:
+            break
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("corpus", nargs="?", help="Directory of saved .html pages")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument(
+        "--limit", type=float, default=10.0, help="Stop repeating past N seconds"
+    )
+    parser.add_argument(
+        "--extract",
+        action="store_true",
+        help="Time cleaning plus trafilatura.extract, as !web runs it",
+    )
+    args = parser.parse_args()
+
+    old_fn, new_fn = regex_scrub, clean_html
+    if args.extract:
+        import trafilatura
+
+        def end_to_end(clean):
+            return lambda page: trafilatura.extract(
+                clean(page), include_comments=False, deduplicate=True
+            )
+
+        old_fn, new_fn = end_to_end(regex_scrub), end_to_end(clean_html)
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not pages:
+        sys.exit(f"No .html pages found in {args.corpus}")
+
+    print(
+        f"{'page':<32} {'size':>9} {'regex ms':>10} {'cleaner ms':>11} {'speedup':>8}"
+    )
+    ratios = []
+    for name, page in pages.items():
+        old = best_of(old_fn, page, args.repeat, args.limit)
+        new = best_of(new_fn, page, args.repeat, args.limit)
+        ratio = old / new if new else float("inf")
+        ratios.append(ratio)
+        print(
+            f"{name[:32]:<32} {len(page) / 1024:>7.0f}KB {old:>10.1f} {new:>11.1f} {ratio:>7.2f}x"
+        )
+    print(f"\nGeometric mean speedup: {statistics.geometric_mean(ratios):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
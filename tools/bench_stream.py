@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Benchmarks how fast Chat.stream_response consumes and renders a streamed reply.
+
+Documentation is located in TOOLS.md
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from rich.console import Console
+
+from localsage import cli_controller, sage, ui
+from localsage import globals as sage_globals
+from localsage.client_registry import ClientRegistry
+from localsage.config import Config
+from localsage.file_manager import FileManager
+from localsage.session_manager import SessionManager
+from tools.mock_server import add_arguments, options_from
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Metrics compared against a baseline, and whether higher is better
+METRICS = {
+    "tokens_per_sec": True,
+    "ttft_ms": False,
+    "cpu_ms_per_1k": False,
+    "frame_p50_ms": False,
+    "frame_p95_ms": False,
+    "frame_max_ms": False,
+    "update_p95_ms": False,
+    "bytes_per_token": False,
+}
+
+
+class Sink:
+    """Terminal stand-in that only counts what would have been written"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text: str) -> int:
+        self.bytes += len(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return True
+
+
+class TimedChat(sage.Chat):
+    """Chat that records chunk arrivals, panel updates and Live repaints"""
+
+    def reset_timers(self):
+        self.chunks = 0
+        self.first_chunk = 0.0
+        self.last_chunk = 0.0
+        self.frames: list[float] = []
+        self.updates: list[float] = []
+
+    def init_rich_live(self):
+        super().init_rich_live()
+        refresh = self.live.refresh  # pyright: ignore
+
+        # Live repaints from its own thread too, so the instance attribute catches every frame
+        def timed_refresh():
+            start = time.perf_counter()
+            refresh()
+            self.frames.append(time.perf_counter() - start)
+
+        self.live.refresh = timed_refresh  # pyright: ignore
+
+    def chunk_parse(self, chunk):
+        now = time.perf_counter()
+        if not self.chunks:
+            self.first_chunk = now
+        self.last_chunk = now
+        self.chunks += 1
+        super().chunk_parse(chunk)
+
+    def _update_response(self, content: str):
+        start = time.perf_counter()
+        super()._update_response(content)
+        self.updates.append(time.perf_counter() - start)
+
+
+def headless_console(width: int, height: int) -> tuple[Console, Sink]:
+    """Swaps the shared console for a fixed-size terminal that discards its output"""
+    sink = Sink()
+    console = Console(
+        file=sink,  # pyright: ignore
+        force_terminal=True,
+        color_system="truecolor",
+        width=width,
+        height=height,
+        legacy_windows=False,
+    )
+    for module in (sage_globals, sage, ui, cli_controller):
+        module.CONSOLE = console  # pyright: ignore
+    return console, sink
+
+
+def build_chat(url: str, args: argparse.Namespace) -> TimedChat:
+    """Wires the pieces together like App does, minus the config file and keyring"""
+    config = Config()
+    config.models[0].update(endpoint=url, name=args.model, tokenizer="estimate")
+    config.refresh_rate = args.refresh_rate
+    config.retry_backoff = 0.05
+    config.auto_context = False
+    config.context_length = 10**9  # Never trim the benchmark turn
+    registry = ClientRegistry()
+    session = SessionManager(config)
+    file_manager = FileManager(session)
+    interface = ui.UIConstructor(config, session)
+    panel = ui.GlobalPanels(session, config, interface)
+    api = sage.API(config, session, registry)
+    return TimedChat(config, session, file_manager, interface, panel, api)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_once(chat: TimedChat, sink: Sink) -> dict:
+    chat.session.reset()
+    chat.session.append_message("user", "Benchmark")
+    chat.reset_turn_state()
+    chat.reset_timers()
+    sink.bytes = 0
+    cpu, start = time.process_time(), time.perf_counter()
+    chat.stream_response()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - start
+    tokens = chat.chunks
+    streaming = chat.last_chunk - chat.first_chunk
+    return {
+        "tokens": tokens,
+        "wall_s": wall,
+        "tokens_per_sec": tokens / streaming if streaming > 0 else 0.0,
+        "ttft_ms": (chat.first_chunk - start) * 1000 if tokens else 0.0,
+        "cpu_ms_per_1k": cpu * 1000 / tokens * 1000 if tokens else 0.0,
+        "frames": len(chat.frames),
+        "frame_p50_ms": percentile(chat.frames, 0.5) * 1000,
+        "frame_p95_ms": percentile(chat.frames, 0.95) * 1000,
+        "frame_max_ms": max(chat.frames, default=0.0) * 1000,
+        "update_p95_ms": percentile(chat.updates, 0.95) * 1000,
+        "bytes_per_token": sink.bytes / tokens if tokens else 0.0,
+        "complete": not chat.cancel_requested,
+    }
+
+
+def raw_ceiling(chat: TimedChat) -> float:
+    """Chunks/sec the client reads with no rendering at all, the transport's ceiling"""
+    chat.session.reset()
+    chat.session.append_message("user", "Benchmark")
+    chunks, first = 0, 0.0
+    try:
+        for _ in chat.api.fetch_stream():
+            if not chunks:
+                first = time.perf_counter()
+            chunks += 1
+    except Exception:
+        return 0.0  # An injected failure, the rendered runs retry it
+    elapsed = time.perf_counter() - first
+    return chunks / elapsed if elapsed > 0 else 0.0
+
+
+def start_server(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    """Runs the mock server in its own process, so its CPU isn't billed to the client"""
+    flags = ["--port", "0"]
+    for name, value in vars(options_from(args)).items():
+        flags += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "tools.mock_server", *flags],
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=ROOT,
+    )
+    line = process.stdout.readline()  # pyright: ignore
+    if "listening on" not in line:
+        process.kill()
+        sys.exit(f"Mock server failed to start: {line}")
+    return process, line.rsplit(" ", 1)[-1].strip()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=ROOT,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(result: dict, baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nAgainst {baseline_path} ({baseline.get('commit', '?')}):")
+    if baseline.get("settings") != result["settings"]:
+        print("  Settings differ from the baseline, the numbers may not be comparable")
+    for metric, higher_is_better in METRICS.items():
+        old, new = baseline["median"].get(metric), result["median"][metric]
+        if not old:
+            continue
+        change = (new - old) / old * 100
+        better = change > 0 if higher_is_better else change < 0
+        verdict = "same" if abs(change) < 1 else "better" if better else "worse"
+        print(f"  {metric:<16} {old:>10.2f} → {new:>10.2f}  {change:+6.1f}%  {verdict}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Use a running server instead of the mock")
+    parser.add_argument("-r", "--runs", type=int, default=3)
+    parser.add_argument("--width", type=int, default=120)
+    parser.add_argument("--height", type=int, default=40)
+    parser.add_argument("--refresh-rate", type=int, default=Config().refresh_rate)
+    parser.add_argument("--json", help="Write the results to a file")
+    parser.add_argument("--baseline", help="Compare against an earlier --json file")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_server(args)
+    try:
+        _, sink = headless_console(args.width, args.height)
+        chat = build_chat(url, args)
+        ceiling = raw_ceiling(chat)
+        runs = [run_once(chat, sink) for _ in range(args.runs)]
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    median = {
+        metric: statistics.median(run[metric] for run in runs)
+        for metric in (*METRICS, "frames", "wall_s")
+    }
+    result = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {
+            k: v for k, v in vars(args).items() if k not in ("json", "baseline")
+        },
+        "raw_tokens_per_sec": ceiling,
+        "median": median,
+        "runs": runs,
+    }
+
+    print(
+        f"{args.payload} payload, {args.tokens} × {args.chunk_size}-char chunks, "
+        f"{args.width}×{args.height} terminal at {args.refresh_rate} fps\n"
+    )
+    print(f"{'':<16} {'median':>10} {'best':>10} {'worst':>10}")
+    for metric, higher_is_better in METRICS.items():
+        values = [run[metric] for run in runs]
+        best, worst = (max, min) if higher_is_better else (min, max)
+        print(
+            f"{metric:<16} {median[metric]:>10.2f} {best(values):>10.2f} {worst(values):>10.2f}"
+        )
+    print(f"\nTransport ceiling (no rendering): {ceiling:.0f} tokens/sec")
+    if not all(run["complete"] for run in runs):
+        print("Some runs did not complete, see the log for the stream errors")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        compare(result, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
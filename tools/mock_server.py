@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Stand-in OpenAI-compatible server that streams canned replies at a configurable rate.
+
+Documentation is located in TOOLS.md
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tools._fixtures import PAYLOADS, build_payload
+
+REASONING_FIELDS = ("reasoning_content", "reasoning", "thinking")
+EMBEDDING_DIM = 64
+
+
+@dataclass
+class MockOptions:
+    """What the server streams, and how it misbehaves"""
+
+    model: str = "mock"
+    context_length: int = 32768
+    tokens: int = 2000  # Chunks in the reply
+    chunk_size: int = 4  # Characters per chunk
+    rate: float = 0.0  # Chunks per second, 0 = as fast as possible
+    ttft: float = 0.0  # Seconds before the first chunk
+    payload: str = "mixed"
+    reasoning: int = 0  # Reasoning chunks sent before the reply
+    reasoning_field: str = "reasoning_content"
+    fail_rate: float = 0.0  # Share of requests refused with fail_status
+    fail_status: int = 503
+    drop_rate: float = 0.0  # Share of streams cut off after drop_after chunks
+    drop_after: int = 50
+    seed: int = 0
+
+
+def chunked(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def embed(text: str) -> list[float]:
+    """Hashed bag of words, so texts sharing words land close together"""
+    vector = [0.0] * EMBEDDING_DIM
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=4).digest()
+        vector[int.from_bytes(digest, "little") % EMBEDDING_DIM] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+# <~~SERVER~~>
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, body: dict, status: int = 200, headers: dict | None = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def do_GET(self):
+        options = self.server.options
+        if self.path.rstrip("/") in ("/v1/models", "/models"):
+            self._json(
+                {
+                    "object": "list",
+                    "data": [
+                        {
+                            "id": options.model,
+                            "object": "model",
+                            "owned_by": "mock",
+                            "max_model_len": options.context_length,
+                        }
+                    ],
+                }
+            )
+        elif self.path == "/props":
+            self._json(
+                {
+                    "default_generation_settings": {
+                        "n_ctx": options.context_length,
+                        "params": {"n_predict": -1},
+                    },
+                    "model_path": f"/models/{options.model}.gguf",
+                }
+            )
+        elif self.path == "/health":
+            self._json({"status": "ok"})
+        else:
+            self._json({"error": {"message": f"{self.path} not found"}}, 404)
+
+    def do_POST(self):
+        body = self._body()
+        path = self.path.rstrip("/")
+        if path == "/tokenize":
+            text = body.get("content") or body.get("prompt") or ""
+            self._json({"tokens": list(range(math.ceil(len(text) / 4)))})
+        elif path == "/v1/embeddings":
+            texts = body.get("input") or []
+            texts = [texts] if isinstance(texts, str) else texts
+            self._json(
+                {
+                    "object": "list",
+                    "model": body.get("model", ""),
+                    "data": [
+                        {"object": "embedding", "index": i, "embedding": embed(t)}
+                        for i, t in enumerate(texts)
+                    ],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                }
+            )
+        elif path == "/v1/chat/completions":
+            self._chat(body)
+        else:
+            self._json({"error": {"message": f"{self.path} not found"}}, 404)
+
+    # <~~CHAT COMPLETIONS~~>
+    def _chat(self, body: dict):
+        server, options = self.server, self.server.options
+        with server.lock:
+            server.stats["requests"] += 1
+            refuse = server.rng.random() < options.fail_rate
+            drop = server.rng.random() < options.drop_rate
+        if refuse:
+            with server.lock:
+                server.stats["refused"] += 1
+            self._json(
+                {"error": {"message": "Injected failure", "type": "server_error"}},
+                options.fail_status,
+                {"Retry-After": "0"},
+            )
+            return
+
+        reasoning, reply = server.reply(body.get("messages") or [])
+        if not body.get("stream"):
+            self._complete(reasoning, reply)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        deltas = [{"role": "assistant", "content": ""}]
+        deltas += [{options.reasoning_field: piece} for piece in reasoning]
+        deltas += [{"content": piece} for piece in reply]
+        if options.ttft:
+            time.sleep(options.ttft)
+        start = time.perf_counter()
+        try:
+            for i, delta in enumerate(deltas):
+                if drop and i >= options.drop_after:
+                    with server.lock:
+                        server.stats["dropped"] += 1
+                    self.close_connection = True
+                    return  # The chunked body is never terminated, clients see a broken stream
+                if options.rate:
+                    wait = start + i / options.rate - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                self._event(self._chunk(delta, None))
+            self._event(self._chunk({}, "stop"))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage = self._chunk({}, None)
+                usage["choices"] = []
+                usage["usage"] = {
+                    "prompt_tokens": 0,
+                    "completion_tokens": len(deltas) - 1,
+                    "total_tokens": len(deltas) - 1,
+                }
+                self._event(usage)
+            self._event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            with server.lock:
+                server.stats["completed"] += 1
+        except (BrokenPipeError, ConnectionResetError):
+            with server.lock:
+                server.stats["cancelled"] += 1
+            self.close_connection = True
+
+    def _chunk(self, delta: dict, finish: str | None) -> dict:
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": self.server.options.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+
+    def _event(self, data: dict | str):
+        payload = data if isinstance(data, str) else json.dumps(data)
+        event = f"data: {payload}\n\n".encode()
+        self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+        self.wfile.flush()
+
+    def _complete(self, reasoning: list[str], reply: list[str]):
+        message = {"role": "assistant", "content": "".join(reply)}
+        if reasoning:
+            message[self.server.options.reasoning_field] = "".join(reasoning)
+        with self.server.lock:
+            self.server.stats["completed"] += 1
+        self._json(
+            {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": self.server.options.model,
+                "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": 0,
+                    "completion_tokens": len(reply),
+                    "total_tokens": len(reply),
+                },
+            }
+        )
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], options: MockOptions):
+        super().__init__(address, MockHandler)
+        self.options = options
+        self.lock = threading.Lock()
+        self.rng = random.Random(options.seed)
+        self.stats = dict.fromkeys(
+            ("requests", "refused", "dropped", "cancelled", "completed"), 0
+        )
+        text = build_payload(
+            options.payload, options.tokens * options.chunk_size, options.seed
+        )
+        self.text = text
+        self.reasoning = chunked(
+            build_payload(
+                "plain", options.reasoning * options.chunk_size, options.seed
+            ),
+            options.chunk_size,
+        )
+
+    def reply(self, messages: list) -> tuple[list[str], list[str]]:
+        """
+        Reasoning & reply chunks for a request.\n
+        A request carrying part of the reply (a resumed stream) gets only the remainder.
+        """
+        for message in messages[-2:]:
+            partial = (
+                message.get("content") if message.get("role") == "assistant" else ""
+            )
+            if (
+                partial
+                and len(partial) < len(self.text)
+                and self.text.startswith(partial)
+            ):
+                return [], chunked(self.text[len(partial) :], self.options.chunk_size)
+        return self.reasoning, chunked(self.text, self.options.chunk_size)
+
+
+class MockServer:
+    """Runs the mock server on a background thread. Usable as a context manager."""
+
+    def __init__(
+        self, options: MockOptions | None = None, host: str = "127.0.0.1", port: int = 0
+    ):
+        self.httpd = MockHTTPServer((host, port), options or MockOptions())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def stats(self) -> dict:
+        return self.httpd.stats
+
+    @property
+    def text(self) -> str:
+        return self.httpd.text
+
+    def start(self) -> "MockServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """The server's options as flags, shared with bench_stream.py"""
+    defaults = MockOptions()
+    parser.add_argument("--model", default=defaults.model)
+    parser.add_argument("--context-length", type=int, default=defaults.context_length)
+    parser.add_argument(
+        "--tokens", type=int, default=defaults.tokens, help="Chunks per reply"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=defaults.chunk_size, help="Chars per chunk"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=defaults.rate, help="Chunks/sec, 0 = unthrottled"
+    )
+    parser.add_argument("--ttft", type=float, default=defaults.ttft)
+    parser.add_argument("--payload", choices=PAYLOADS, default=defaults.payload)
+    parser.add_argument(
+        "--reasoning", type=int, default=defaults.reasoning, help="Reasoning chunks"
+    )
+    parser.add_argument(
+        "--reasoning-field", choices=REASONING_FIELDS, default=defaults.reasoning_field
+    )
+    parser.add_argument("--fail-rate", type=float, default=defaults.fail_rate)
+    parser.add_argument("--fail-status", type=int, default=defaults.fail_status)
+    parser.add_argument("--drop-rate", type=float, default=defaults.drop_rate)
+    parser.add_argument("--drop-after", type=int, default=defaults.drop_after)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def options_from(args: argparse.Namespace) -> MockOptions:
+    return MockOptions(
+        **{k: getattr(args, k) for k in MockOptions.__dataclass_fields__}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="0 picks a free port")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockServer(options_from(args), args.host, args.port)
+    # bench_stream.py reads this line to find the port
+    print(f"Mock server listening on {server.url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()